@@ -8,8 +8,12 @@
   - предоставляет нейтральный логический анализ
 """
 
-import re
 from agents.base_agent import BaseAgent
+from agents.markers import (
+    CONFLICT_MARKERS, CONFLICT_RULES, CONSEQUENCE_MARKERS, STAKEHOLDER_BY_FORM, STAKEHOLDER_MARKERS,
+)
+from agents.situation import prepare
+from utils.marker_matcher import MarkerHits
 
 
 class AnalystAgent(BaseAgent):
@@ -21,43 +25,25 @@ class AnalystAgent(BaseAgent):
             description="Структурирует описание ситуации, выделяет участников, конфликты и последствия."
         )
 
-        # Маркеры для анализа
-        self._stakeholder_markers = [
-            "я", "мы", "он", "она", "они", "коллега", "друг", "родители", "мать",
-            "отец", "брат", "сестра", "начальник", "руководитель", "клиент",
-            "сотрудник", "партнёр", "сосед", "ребёнок", "семья", "муж", "жена",
-            "врач", "пациент", "учитель", "ученик", "продавец", "покупатель",
-            "компания", "организация", "общество", "государство", "человек",
-        ]
-
-        self._conflict_markers = [
-            "но", "однако", "хотя", "несмотря", "вопреки", "конфликт", "дилемма",
-            "противоречие", "проблема", "сложность", "трудность", "выбор",
-            "с одной стороны", "с другой стороны", "между", "или", "либо",
-            "не знаю", "сомневаюсь", "не уверен", "как быть", "что делать",
-            "правильно ли", "стоит ли", "допустимо ли", "можно ли",
-            "обман", "ложь", "скрыть", "промолчать", "предать", "украсть",
-            "навредить", "нарушить", "простить", "наказать",
-        ]
-
-        self._consequence_markers = [
-            "последствия", "результат", "итог", "повлечёт", "приведёт",
-            "к чему", "что будет", "если", "пострадает", "выиграет",
-            "потеряет", "рискует", "угрожает", "навредит", "поможет",
-            "изменит", "улучшит", "ухудшит", "разрушит", "спасёт",
-        ]
+        # Маркеры для анализа (поиск — общим автоматом, см. agents.markers)
+        self._stakeholder_markers = STAKEHOLDER_MARKERS
+        self._conflict_markers = CONFLICT_MARKERS
+        self._consequence_markers = CONSEQUENCE_MARKERS
 
     def process(self, input_data: dict) -> dict:
         """Анализ ситуации."""
         situation = input_data.get("situation", "")
         self.log("Получена ситуация для анализа", situation)
 
+        # Вхождения маркеров из общего разбора ситуации (см. agents.situation)
+        hits = prepare(input_data).marker_hits
+
         # 1. Выделить участников
-        stakeholders = self._extract_stakeholders(situation)
+        stakeholders = self._extract_stakeholders(hits)
         self.log("Извлечены участники", output_data=stakeholders)
 
         # 2. Определить конфликты
-        conflicts = self._identify_conflicts(situation)
+        conflicts = self._identify_conflicts(hits)
         self.log("Определены конфликтные элементы", output_data=conflicts)
 
         # 3. Моделировать последствия
@@ -78,16 +64,13 @@ class AnalystAgent(BaseAgent):
         self.log("Анализ завершён", output_data=result)
         return result
 
-    def _extract_stakeholders(self, text: str) -> list[dict]:
+    def _extract_stakeholders(self, hits: MarkerHits) -> list[dict]:
         """Выделить участников и их роли."""
-        text_lower = text.lower()
+        mentioned = {STAKEHOLDER_BY_FORM[form] for form in hits.markers("stakeholder")}
         found = []
-        seen = set()
 
         for marker in self._stakeholder_markers:
-            pattern = r'\b' + re.escape(marker) + r'\b'
-            if re.search(pattern, text_lower) and marker not in seen:
-                seen.add(marker)
+            if marker in mentioned:
                 role = self._classify_stakeholder_role(marker)
                 found.append({
                     "name": marker.capitalize(),
@@ -122,54 +105,10 @@ class AnalystAgent(BaseAgent):
             return "Профессиональная роль"
         return "Участник ситуации"
 
-    def _identify_conflicts(self, text: str) -> list[dict]:
+    def _identify_conflicts(self, hits: MarkerHits) -> list[dict]:
         """Выявить конфликтные элементы."""
-        text_lower = text.lower()
-        conflicts = []
-
-        found_markers = [m for m in self._conflict_markers if m in text_lower]
-
-        if any(m in text_lower for m in ["но", "однако", "хотя", "несмотря"]):
-            conflicts.append({
-                "type": "Внутреннее противоречие",
-                "description": "В ситуации присутствует противопоставление — указание на конфликт между двумя позициями или действиями.",
-                "severity": "Средний"
-            })
-
-        if any(m in text_lower for m in ["выбор", "дилемма", "или", "либо"]):
-            conflicts.append({
-                "type": "Дилемма выбора",
-                "description": "Ситуация требует выбора между несколькими вариантами действий.",
-                "severity": "Высокий"
-            })
-
-        if any(m in text_lower for m in ["обман", "ложь", "скрыть", "промолчать"]):
-            conflicts.append({
-                "type": "Конфликт честности",
-                "description": "Ситуация связана с вопросами правдивости, сокрытия информации или обмана.",
-                "severity": "Высокий"
-            })
-
-        if any(m in text_lower for m in ["навредить", "пострадает", "нарушить"]):
-            conflicts.append({
-                "type": "Конфликт вреда",
-                "description": "Ситуация может привести к причинению вреда одной или нескольким сторонам.",
-                "severity": "Высокий"
-            })
-
-        if any(m in text_lower for m in ["простить", "наказать"]):
-            conflicts.append({
-                "type": "Конфликт справедливости",
-                "description": "Ситуация связана с выбором между прощением и наказанием.",
-                "severity": "Средний"
-            })
-
-        if any(m in text_lower for m in ["не знаю", "сомневаюсь", "не уверен", "как быть"]):
-            conflicts.append({
-                "type": "Моральная неопределённость",
-                "description": "Автор ситуации выражает неуверенность в правильности возможных действий.",
-                "severity": "Средний"
-            })
+        conflicts = [dict(conflict) for category, _, conflict in CONFLICT_RULES
+                     if hits.has(category)]
 
         if not conflicts:
             conflicts.append({
@@ -2,13 +2,22 @@
 Базовый абстрактный класс для всех агентов системы.
 """
 
+import functools
 from abc import ABC, abstractmethod
 from utils.logger import get_logger
+from utils.profiling import span
 
 
 class BaseAgent(ABC):
     """Базовый агент с логированием и стандартным интерфейсом."""
 
+    def __init_subclass__(cls, **kwargs):
+        """Замерять process() каждого агента как этап профиля (по имени класса)."""
+        super().__init_subclass__(**kwargs)
+        process = cls.__dict__.get("process")
+        if process is not None:
+            cls.process = _profiled(process, cls.__name__)
+
     def __init__(self, name: str, description: str):
         self.name = name
         self.description = description
@@ -39,3 +48,11 @@ class BaseAgent(ABC):
             "result": data,
             "disclaimer": "Данный анализ не является окончательным суждением. Решение остаётся за вами.",
         }
+
+
+def _profiled(process, stage: str):
+    @functools.wraps(process)
+    def wrapper(self, input_data: dict) -> dict:
+        with span(stage):
+            return process(self, input_data)
+    return wrapper
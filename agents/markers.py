@@ -0,0 +1,162 @@
+"""
+Словари маркеров агентов и общий автомат для их поиска.
+
+Все маркеры (участники, конфликты, последствия, группы правил
+Аналитика и Рефлексии) компилируются в один MarkerMatcher: текст
+ситуации просматривается один раз, а агенты читают готовые вхождения
+по категориям.
+
+Участники сопоставляются целыми словами по выверенной таблице
+словоформ (STAKEHOLDER_FORMS: «коллеге», «родителям» → «коллега»,
+«родители»): основы стеммера здесь путают слова («брать» → «брат»,
+«жениться» → «жен»). Остальные маркеры — как подстроки.
+"""
+
+from utils.marker_matcher import MarkerHits, MarkerMatcher
+
+STAKEHOLDER_MARKERS = [
+    "я", "мы", "он", "она", "они", "коллега", "друг", "родители", "мать",
+    "отец", "брат", "сестра", "начальник", "руководитель", "клиент",
+    "сотрудник", "партнёр", "сосед", "ребёнок", "семья", "муж", "жена",
+    "врач", "пациент", "учитель", "ученик", "продавец", "покупатель",
+    "компания", "организация", "общество", "государство", "человек",
+]
+
+CONFLICT_MARKERS = [
+    "но", "однако", "хотя", "несмотря", "вопреки", "конфликт", "дилемма",
+    "противоречие", "проблема", "сложность", "трудность", "выбор",
+    "с одной стороны", "с другой стороны", "между", "или", "либо",
+    "не знаю", "сомневаюсь", "не уверен", "как быть", "что делать",
+    "правильно ли", "стоит ли", "допустимо ли", "можно ли",
+    "обман", "ложь", "скрыть", "промолчать", "предать", "украсть",
+    "навредить", "нарушить", "простить", "наказать",
+]
+
+CONSEQUENCE_MARKERS = [
+    "последствия", "результат", "итог", "повлечёт", "приведёт",
+    "к чему", "что будет", "если", "пострадает", "выиграет",
+    "потеряет", "рискует", "угрожает", "навредит", "поможет",
+    "изменит", "улучшит", "ухудшит", "разрушит", "спасёт",
+]
+
+# Словоформы каждого участника (падежи, число, разговорные синонимы);
+# сопоставляются целыми словами, «ё» в тексте может быть написана как «е»
+STAKEHOLDER_FORMS = {
+    "я": ("я",),
+    "мы": ("мы",),
+    "он": ("он",),
+    "она": ("она",),
+    "они": ("они",),
+    "коллега": ("коллега", "коллеги", "коллеге", "коллегу", "коллегой", "коллег", "коллегам", "коллегами"),
+    "друг": ("друг", "друга", "другу", "другом", "друге", "друзья", "друзей", "друзьям", "друзьями"),
+    "родители": ("родители", "родителей", "родителям", "родителями", "родителях"),
+    "мать": ("мать", "матери", "матерью", "мама", "мамы", "маме", "маму", "мамой"),
+    "отец": ("отец", "отца", "отцу", "отцом", "отце", "папа", "папы", "папе", "папу", "папой"),
+    "брат": ("брат", "брата", "брату", "братом", "брате", "братья", "братьев", "братьям"),
+    "сестра": ("сестра", "сестры", "сестре", "сестру", "сестрой", "сёстры", "сестёр", "сёстрам"),
+    "начальник": ("начальник", "начальника", "начальнику", "начальником", "начальнике", "начальники",
+                  "начальников"),
+    "руководитель": ("руководитель", "руководителя", "руководителю", "руководителем", "руководителе",
+                     "руководители", "руководителей"),
+    "клиент": ("клиент", "клиента", "клиенту", "клиентом", "клиенте", "клиенты", "клиентов", "клиентам"),
+    "сотрудник": ("сотрудник", "сотрудника", "сотруднику", "сотрудником", "сотруднике", "сотрудники",
+                  "сотрудников", "сотрудникам"),
+    "партнёр": ("партнёр", "партнёра", "партнёру", "партнёром", "партнёре", "партнёры", "партнёров"),
+    "сосед": ("сосед", "соседа", "соседу", "соседом", "соседе", "соседи", "соседей", "соседям"),
+    "ребёнок": ("ребёнок", "ребёнка", "ребёнку", "ребёнком", "ребёнке", "дети", "детей", "детям", "детьми"),
+    "семья": ("семья", "семьи", "семье", "семью", "семьёй"),
+    "муж": ("муж", "мужа", "мужу", "мужем", "муже"),
+    "жена": ("жена", "жены", "жене", "жену", "женой", "жён"),
+    "врач": ("врач", "врача", "врачу", "врачом", "враче", "врачи", "врачей"),
+    "пациент": ("пациент", "пациента", "пациенту", "пациентом", "пациенте", "пациенты", "пациентов"),
+    "учитель": ("учитель", "учителя", "учителю", "учителем", "учителе", "учителей"),
+    "ученик": ("ученик", "ученика", "ученику", "учеником", "ученике", "ученики", "учеников"),
+    "продавец": ("продавец", "продавца", "продавцу", "продавцом", "продавце", "продавцы", "продавцов"),
+    "покупатель": ("покупатель", "покупателя", "покупателю", "покупателем", "покупателе", "покупатели",
+                   "покупателей"),
+    "компания": ("компания", "компании", "компанию", "компанией"),
+    "организация": ("организация", "организации", "организацию", "организацией"),
+    "общество": ("общество", "общества", "обществу", "обществом", "обществе"),
+    "государство": ("государство", "государства", "государству", "государством", "государстве"),
+    "человек": ("человек", "человека", "человеку", "человеком", "человеке", "люди", "людей", "людям"),
+}
+
+# Словоформа (и её написание через «е») → участник
+STAKEHOLDER_BY_FORM = {
+    variant: marker
+    for marker, forms in STAKEHOLDER_FORMS.items()
+    for form in forms
+    for variant in (form, form.replace("ё", "е"))
+}
+
+# Группы маркеров, по которым Аналитик определяет типы конфликтов (в порядке вывода)
+CONFLICT_RULES = [
+    ("opposition", ["но", "однако", "хотя", "несмотря"], {
+        "type": "Внутреннее противоречие",
+        "description": "В ситуации присутствует противопоставление — указание на конфликт между двумя позициями или действиями.",
+        "severity": "Средний"
+    }),
+    ("choice", ["выбор", "дилемма", "или", "либо"], {
+        "type": "Дилемма выбора",
+        "description": "Ситуация требует выбора между несколькими вариантами действий.",
+        "severity": "Высокий"
+    }),
+    ("honesty", ["обман", "ложь", "скрыть", "промолчать"], {
+        "type": "Конфликт честности",
+        "description": "Ситуация связана с вопросами правдивости, сокрытия информации или обмана.",
+        "severity": "Высокий"
+    }),
+    ("harm", ["навредить", "пострадает", "нарушить"], {
+        "type": "Конфликт вреда",
+        "description": "Ситуация может привести к причинению вреда одной или нескольким сторонам.",
+        "severity": "Высокий"
+    }),
+    ("justice", ["простить", "наказать"], {
+        "type": "Конфликт справедливости",
+        "description": "Ситуация связана с выбором между прощением и наказанием.",
+        "severity": "Средний"
+    }),
+    ("uncertainty", ["не знаю", "сомневаюсь", "не уверен", "как быть"], {
+        "type": "Моральная неопределённость",
+        "description": "Автор ситуации выражает неуверенность в правильности возможных действий.",
+        "severity": "Средний"
+    }),
+]
+
+# Группы маркеров Агента-Рефлексии
+CONCEALMENT_MARKERS = ["скрыть", "обман", "ложь", "промолчать"]
+RETRIBUTION_MARKERS = ["простить", "наказать", "месть"]
+
+
+def _patterns():
+    """(marker, category, mode) для всех словарей."""
+    for form in STAKEHOLDER_BY_FORM:
+        yield form, "stakeholder", "word"
+    for marker in CONFLICT_MARKERS:
+        yield marker, "conflict", "substring"
+    for marker in CONSEQUENCE_MARKERS:
+        yield marker, "consequence", "substring"
+    for category, markers, _ in CONFLICT_RULES:
+        for marker in markers:
+            yield marker, category, "substring"
+    for marker in CONCEALMENT_MARKERS:
+        yield marker, "concealment", "substring"
+    for marker in RETRIBUTION_MARKERS:
+        yield marker, "retribution", "substring"
+
+
+def find_markers(text: str) -> MarkerHits:
+    """Все вхождения маркеров в тексте за один проход."""
+    return get_marker_matcher().find(text.lower())
+
+
+# Singleton
+_matcher_instance = None
+
+
+def get_marker_matcher() -> MarkerMatcher:
+    """Получить общий автомат маркеров (singleton)."""
+    global _matcher_instance
+    if _matcher_instance is None:
+        _matcher_instance = MarkerMatcher(_patterns())
+    return _matcher_instance
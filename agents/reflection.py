@@ -9,6 +9,8 @@
 """
 
 from agents.base_agent import BaseAgent
+from agents.situation import prepare
+from utils.marker_matcher import MarkerHits
 
 
 class ReflectionAgent(BaseAgent):
@@ -27,8 +29,10 @@ class ReflectionAgent(BaseAgent):
         values_result = input_data.get("values_result", {})
         self.log("Начат этап рефлексии", situation)
 
+        hits = prepare(input_data).marker_hits
+
         # 1. Вопросы о намерениях
-        intention_questions = self._generate_intention_questions(situation, analyst_result)
+        intention_questions = self._generate_intention_questions(hits, analyst_result)
         self.log("Вопросы о намерениях", output_data=intention_questions)
 
         # 2. Вопросы о последствиях
@@ -58,10 +62,9 @@ class ReflectionAgent(BaseAgent):
         self.log("Рефлексия завершена", output_data=result)
         return result
 
-    def _generate_intention_questions(self, situation: str, analyst_result: dict) -> list[dict]:
+    def _generate_intention_questions(self, hits: MarkerHits, analyst_result: dict) -> list[dict]:
         """Вопросы о намерениях и мотивах."""
         questions = []
-        text_lower = situation.lower()
 
         # Базовые вопросы о намерении
         questions.append({
@@ -86,14 +89,14 @@ class ReflectionAgent(BaseAgent):
                 "category": "intention"
             })
 
-        if any(word in text_lower for word in ["скрыть", "обман", "ложь", "промолчать"]):
+        if hits.has("concealment"):
             questions.append({
                 "question": "Что именно вы хотите защитить, скрывая информацию? Себя или другого?",
                 "purpose": "Различение защитной лжи и эгоистичного обмана.",
                 "category": "intention"
             })
 
-        if any(word in text_lower for word in ["простить", "наказать", "месть"]):
+        if hits.has("retribution"):
             questions.append({
                 "question": "Ваше желание — восстановить справедливость или ответить на боль?",
                 "purpose": "Различение стремления к справедливости и мести.",
@@ -0,0 +1,77 @@
+"""
+Подготовленная ситуация — общий результат разбора текста для всех агентов.
+
+Координатор строит PreparedSituation один раз на запрос: приведение к
+нижнему регистру, токенизация, термины векторизатора и поиск маркеров
+выполняются однократно, а Аналитик, Интерпретатор Ценностей, Рефлексия
+и поиск по базе знаний используют готовые результаты.
+"""
+
+import time
+from functools import lru_cache
+
+import config
+from agents.markers import get_marker_matcher
+from knowledge_base.search import QueryTerms, analyze_terms, tokenize
+from utils.stemmer import get_normalizer
+
+
+class PreparedSituation:
+    """Разобранный текст ситуации."""
+
+    def __init__(self, situation: str):
+        start = time.perf_counter()
+        self.text = situation
+        self.normalized = situation.lower()
+        self.tokens = tokenize(self.normalized)
+        self.normalizer = config.TEXT_NORMALIZER
+        normalize = get_normalizer(self.normalizer)
+        self.lemmas = [normalize(token) for token in self.tokens]
+        # Термины TF-IDF (униграммы и биграммы нормальных форм) — для поискового запроса
+        self.ngrams = analyze_terms(self.lemmas)
+        self.marker_hits = get_marker_matcher().find(self.normalized)
+        self.prepare_seconds = time.perf_counter() - start
+
+    def query_terms(self, extra_texts=()) -> QueryTerms:
+        """
+        Термины запроса " ".join([ситуация, *extra_texts]) без повторного
+        разбора ситуации: добавляются только термины дополнительных текстов
+        и биграммы на их стыках. Помечены нормализатором — поиск с другим
+        нормализатором разберёт запрос сам.
+        """
+        terms = QueryTerms(self.ngrams, self.normalizer)
+        previous = self.lemmas[-1] if self.lemmas else None
+        for extra in extra_texts:
+            tokens = _extra_tokens(extra, self.normalizer)
+            if not tokens:
+                continue
+            if previous is not None:
+                terms.append(f"{previous} {tokens[0]}")
+            terms.extend(analyze_terms(list(tokens)))
+            previous = tokens[-1]
+        return terms
+
+    def stats(self) -> dict:
+        """Размеры разбора (для журнала и замеров стоимости этапа)."""
+        return {
+            "chars": len(self.text),
+            "tokens": len(self.tokens),
+            "ngrams": len(self.ngrams),
+            "marker_hits": len(self.marker_hits),
+            "prepare_ms": round(self.prepare_seconds * 1000, 3),
+        }
+
+
+def prepare(input_data: dict) -> PreparedSituation:
+    """PreparedSituation из входа агента (от координатора или построенная заново)."""
+    prepared = input_data.get("prepared")
+    if prepared is None:
+        prepared = PreparedSituation(input_data.get("situation", ""))
+    return prepared
+
+
+@lru_cache(maxsize=256)
+def _extra_tokens(text: str, normalizer: str) -> tuple:
+    """Нормализованные токены дополнительных текстов запроса (описания конфликтов повторяются)."""
+    normalize = get_normalizer(normalizer)
+    return tuple(normalize(token) for token in tokenize(text.lower()))
@@ -10,6 +10,7 @@
 """
 
 from agents.base_agent import BaseAgent
+from agents.situation import prepare
 from knowledge_base.search import get_search
 
 
@@ -33,8 +34,9 @@ class ValuesInterpreterAgent(BaseAgent):
         search_query = self._build_search_query(situation, analyst_result)
         self.log("Построен поисковый запрос", search_query)
 
-        # 2. Поиск в базе знаний
-        search_results = self.search.search(search_query, top_k=10)
+        # 2. Поиск в базе знаний (термины ситуации уже выделены координатором)
+        terms = prepare(input_data).query_terms(self._conflict_descriptions(analyst_result))
+        search_results = self.search.search(search_query, top_k=10, terms=terms)
         self.log("Найдены релевантные источники", search_results)
 
         # 3. Группировать по типу источника
@@ -44,10 +46,17 @@ class ValuesInterpreterAgent(BaseAgent):
         interpretations = self._build_interpretations(grouped, analyst_result)
         self.log("Сформированы интерпретации", interpretations)
 
+        # Только состав корпуса: счётчики кэша и памяти зависят от нагрузки
+        # процесса и сделали бы отчёты неповторяемыми
+        stats = self.search.get_stats()
+
         result = self.create_output({
             "relevant_sources": grouped,
             "interpretations": interpretations,
-            "knowledge_stats": self.search.get_stats(),
+            "knowledge_stats": {
+                "total_entries": stats["total_entries"],
+                "by_type": stats["by_type"],
+            },
             "interpretation_note": (
                 "Приведённые источники представляют различные точки зрения. "
                 "Система не выносит директивных указаний и не определяет "
@@ -63,13 +72,15 @@ class ValuesInterpreterAgent(BaseAgent):
         parts = [situation]
 
         # Добавить типы конфликтов из анализа
-        result_data = analyst_result.get("result", {})
-        conflicts = result_data.get("conflicts", [])
-        for c in conflicts:
-            parts.append(c.get("description", ""))
+        parts.extend(self._conflict_descriptions(analyst_result))
 
         return " ".join(parts)
 
+    def _conflict_descriptions(self, analyst_result: dict) -> list[str]:
+        """Описания конфликтов, выявленных Аналитиком."""
+        result_data = analyst_result.get("result", {})
+        return [c.get("description", "") for c in result_data.get("conflicts", [])]
+
     def _group_by_source(self, results: list[dict]) -> dict:
         """Группировать результаты по типу источника."""
         groups = {
@@ -135,12 +146,13 @@ class ValuesInterpreterAgent(BaseAgent):
         if "principle" in grouped:
             principle_items = grouped["principle"]["items"]
 
-            # Группировать по традиции
-            traditions = set()
+            # Группировать по традиции (в порядке релевантности — отчёт
+            # не должен зависеть от hash seed процесса)
+            traditions = {}
             for item in principle_items:
                 title = item["title"]
                 if ":" in title:
-                    traditions.add(title.split(":")[0].strip())
+                    traditions.setdefault(title.split(":")[0].strip(), None)
 
             interpretations.append({
                 "perspective": "Философско-этический взгляд",
@@ -0,0 +1,295 @@
+"""
+Фикх-Помощник — асинхронный (ASGI) вариант API чата.
+
+Те же эндпоинты и ответы, что в server.py, но ожидание модели
+не занимает поток: вызовы идут через AsyncUpstreamClient, и один
+процесс держит тысячи одновременно ждущих чатов. Число одновременно
+обрабатываемых /api/chat ограничено (config.CHAT_MAX_IN_FLIGHT);
+сверх него сервер сразу отвечает 503 с Retry-After, а не копит очередь.
+Синхронная работа с историей, кэшем и базой (хранилище сессий, поиск,
+сжатие истории) выполняется в потоках (asyncio.to_thread) и не
+останавливает цикл событий.
+
+Endpoints:
+  POST /api/chat   — Отправка вопроса в AI (JSON или поток SSE)
+  GET  /api/status — Статус сервера, ключа, нагрузки и соединений с моделью
+
+Главная страница и статика остаются за server.py (или обратным прокси).
+
+Запуск (нужен любой ASGI-сервер, например uvicorn):
+    uvicorn asgi_server:app --host 127.0.0.1 --port 5001
+"""
+
+import asyncio
+import json
+import os
+
+import config
+import server
+from chat.async_upstream import AsyncUpstreamClient
+from chat.coalesce import AsyncSingleFlight, prompt_fingerprint
+from chat.rate_limit import AsyncRateLimiter
+
+OVERLOADED_MESSAGE = "⏳ Сервер перегружен. Повторите запрос через несколько секунд."
+
+
+class ChatApp:
+    """ASGI-приложение /api/chat и /api/status с ограничением одновременных запросов."""
+
+    def __init__(self, max_in_flight: int = config.CHAT_MAX_IN_FLIGHT,
+                 retry_after: int = config.CHAT_RETRY_AFTER,
+                 client: AsyncUpstreamClient | None = None,
+                 coalesce: bool = config.CHAT_COALESCE):
+        """
+        Args:
+            max_in_flight: максимум одновременно обрабатываемых /api/chat
+            retry_after: значение Retry-After в ответах 503, секунды
+            client: клиент модели (по умолчанию — на server.GROQ_URL с ограничителем частоты по квотам)
+            coalesce: одинаковые одновременные запросы делят один вызов модели
+        """
+        self.max_in_flight = max(int(max_in_flight), 1)
+        self.retry_after = retry_after
+        self.client = client or AsyncUpstreamClient(server.GROQ_URL, limiter=AsyncRateLimiter())
+        self.flight = AsyncSingleFlight() if coalesce else None
+        # Все счётчики меняются только в цикле событий — блокировки не нужны
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.rejected = 0
+        self.completed = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        route = (scope["method"], scope["path"])
+        if route == ("POST", "/api/chat"):
+            await self.chat(scope, receive, send)
+        elif route == ("GET", "/api/status"):
+            await _send_json(send, 200, self.status())
+        else:
+            await _send_json(send, 404, {"status": "error", "message": "Не найдено"})
+
+    async def chat(self, scope, receive, send):
+        """Обработка сообщения чата."""
+        if self.in_flight >= self.max_in_flight:
+            self.rejected += 1
+            await _send_json(send, 503, {"status": "error", "message": OVERLOADED_MESSAGE},
+                             [(b"retry-after", str(self.retry_after).encode())])
+            return
+
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await self._chat(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+
+    async def _chat(self, scope, receive, send):
+        try:
+            data = json.loads(await _read_body(receive) or b"null")
+        except ValueError:
+            data = None
+        if not isinstance(data, dict) or not data.get("message"):
+            await _send_json(send, 400, {"status": "error", "message": server.EMPTY_MESSAGE})
+            return
+
+        user_message = data["message"].strip()
+        # Одним переходом в поток: история, база, кэш и сборка промпта
+        status, reply, prepared = await asyncio.to_thread(_prepare, data, user_message)
+        if reply is not None:
+            await _send_json(send, status, reply)
+            return
+        session_id, cache_key, messages, prompt = prepared
+        headers = {"Authorization": f"Bearer {server.GROQ_API_KEY}"}
+        meta = {"prompt_tokens": prompt["prompt_tokens"]}
+
+        def remember(text):
+            server.remember_answer(cache_key, text)
+            return server.remember_turn(session_id, user_message, text)
+
+        async def on_done(text):
+            return await asyncio.to_thread(remember, text)
+
+        if server.wants_stream(data, _header(scope, b"accept")):
+            await self._relay_stream(send, messages, headers, on_done, meta)
+            return
+
+        session = {}
+        payload = server.groq_payload(messages)
+
+        async def call():
+            result = await self.client.post_json(payload, headers=headers)
+            server.get_history_compactor().observe_usage(result.get("usage"))
+            return result
+
+        try:
+            if self.flight is not None:
+                result = await self.flight.do(prompt_fingerprint(payload), call)
+            else:
+                result = await call()
+            text = result["choices"][0]["message"]["content"]
+        except Exception as e:
+            text = server.groq_error_message(e)
+        else:
+            session = await on_done(text)
+        await _send_json(send, 200, {"status": "ok", "message": text, **meta, **session})
+
+    async def _relay_stream(self, send, messages, headers, on_done=None, meta=None):
+        """
+        Поток SSE как в server.relay_stream; если поток не начался — обычный JSON.
+
+        on_done — корутина text → поля итогового события (сохранение ответа).
+        """
+        payload = server.groq_payload(messages, stream=True)
+        if self.flight is not None:
+            deltas = self.flight.stream(prompt_fingerprint(payload),
+                                        lambda: self.client.stream_deltas(payload, headers=headers))
+        else:
+            deltas = self.client.stream_deltas(payload, headers=headers)
+        parts = []
+        try:
+            try:
+                first = await deltas.__anext__()
+            except StopAsyncIteration:
+                first = ""
+            except Exception as e:
+                await _send_json(send, 200, {"status": "ok", "message": server.groq_error_message(e)})
+                return
+
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream; charset=utf-8"),
+                    (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no"),
+                ],
+            })
+            try:
+                if first:
+                    parts.append(first)
+                    await _send_chunk(send, server.sse_event({"delta": first}))
+                async for delta in deltas:
+                    parts.append(delta)
+                    await _send_chunk(send, server.sse_event({"delta": delta}))
+                message = "".join(parts)
+                extra = await on_done(message) if on_done is not None else None
+                final = server.sse_event({"status": "ok", "message": message, **(meta or {}), **(extra or {})},
+                                         event="done")
+            except Exception as e:
+                final = server.sse_event(
+                    {"status": "error", "message": server.groq_error_message(e), "partial": "".join(parts)},
+                    event="error",
+                )
+            await send({"type": "http.response.body", "body": final.encode("utf-8"), "more_body": False})
+        finally:
+            await deltas.aclose()
+
+    def status(self) -> dict:
+        """Проверка статуса сервера и ключа."""
+        return {
+            "status": "ok",
+            "has_key": bool(server.GROQ_API_KEY),
+            "model": server.GROQ_MODEL,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "max_in_flight": self.max_in_flight,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "upstream": self.client.stats(),
+            "rate_limit": self.client.limiter.stats() if self.client.limiter is not None else None,
+            "coalesce": self.flight.stats() if self.flight is not None else None,
+            "cache": server.get_response_cache().stats() if server.get_response_cache() is not None else None,
+            "offline": server.get_offline_answers().stats() if server.get_offline_answers() is not None else None,
+            "prompt": server.get_history_compactor().stats(),
+            "sessions": server.get_session_store().stats() if server.get_session_store() is not None else None,
+        }
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                server.load_key()
+                server.get_offline_answers()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.client.aclose()
+                if server.get_session_store() is not None:
+                    server.get_session_store().close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def _prepare(data: dict, user_message: str):
+    """
+    Синхронная часть /api/chat до вызова модели (выполняется в потоке).
+
+    Returns:
+        (статус, ответ, None) — если ответ готов без модели,
+        (None, None, (session_id, cache_key, messages, prompt)) — если нужен вызов модели
+    """
+    session_id, history = server.load_history(data)
+    if history is None:
+        return 409, {"status": "error", "message": server.HISTORY_REQUIRED_MESSAGE, "history_required": True}, None
+    offline = server.offline_answer(user_message)
+    if offline is not None:
+        return 200, {"status": "ok", "message": offline, "source": "offline",
+                     **server.remember_turn(session_id, user_message, offline)}, None
+    if not server.GROQ_API_KEY:
+        return 400, {"status": "error", "message": server.NO_KEY_MESSAGE}, None
+
+    cache_key, cached = server.cached_answer(user_message, history)
+    if cached is not None:
+        return 200, {"status": "ok", "message": cached, "source": "cache",
+                     **server.remember_turn(session_id, user_message, cached)}, None
+
+    messages, prompt = server.build_messages(user_message, history, session_id)
+    return None, None, (session_id, cache_key, messages, prompt)
+
+
+def _header(scope, name: bytes) -> str:
+    for key, value in scope["headers"]:
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return ""
+
+
+async def _read_body(receive) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def _send_json(send, status: int, data: dict, headers: list | None = None):
+    body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+                   + (headers or []),
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_chunk(send, text: str):
+    await send({"type": "http.response.body", "body": text.encode("utf-8"), "more_body": True})
+
+
+app = ChatApp()
+
+
+if __name__ == "__main__":
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("Для запуска нужен ASGI-сервер: pip install uvicorn")
+    server.load_key()
+    server.get_offline_answers()
+    uvicorn.run(app, host=os.getenv("HOST", "127.0.0.1"), port=int(os.getenv("PORT", 5001)))
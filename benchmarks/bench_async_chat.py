@@ -0,0 +1,123 @@
+"""
+Нагрузочный тест асинхронного API чата (asgi_server.ChatApp).
+
+Тысячи одновременных запросов /api/chat подаются прямо в ASGI-приложение
+(без сетевого сервера) в одном цикле событий; модель — асинхронная
+заглушка (benchmarks.stub_llm.AsyncStubLLM) в отдельном потоке. Тест
+показывает, сколько чатов одновременно ждут ответа в одном процессе,
+задержку p50/p99, число соединений к модели и RSS, а при числе запросов
+больше лимита — долю отказов 503 с Retry-After.
+
+Запуск:
+    python -m benchmarks.bench_async_chat
+    python -m benchmarks.bench_async_chat --chats 10000 --latency 1 --pool-size 2048
+    python -m benchmarks.bench_async_chat --chats 6000 --max-in-flight 4000   # backpressure
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+from benchmarks.stub_llm import AsyncStubLLM
+from benchmarks.suite import _peak_rss_mb
+
+
+async def _request(app, body: dict, headers: list | None = None) -> tuple[int, dict, bytes]:
+    """Один ASGI-запрос POST /api/chat: (статус, заголовки, тело)."""
+    payload = json.dumps(body).encode("utf-8")
+    scope = {
+        "type": "http", "method": "POST", "path": "/api/chat",
+        "headers": [(b"content-type", b"application/json")] + (headers or []),
+    }
+    sent = False
+    response = {"body": b""}
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            await asyncio.Event().wait()
+        sent = True
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = dict(message["headers"])
+        else:
+            response["body"] += message.get("body", b"")
+
+    await app(scope, receive, send)
+    return response["status"], response["headers"], response["body"]
+
+
+async def _load(app, chats: int, stream: bool) -> tuple[list, float]:
+    async def timed():
+        start = time.perf_counter()
+        status, headers, body = await _request(app, {"message": "Сколько ракаатов в намазе?", "stream": stream})
+        return time.perf_counter() - start, status, headers
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(timed() for _ in range(chats)))
+    return results, time.perf_counter() - started
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chats", type=int, default=5000, help="одновременных запросов /api/chat")
+    parser.add_argument("--latency", type=float, default=0.5, help="задержка ответа модели, секунды")
+    parser.add_argument("--pool-size", type=int, default=1024, help="соединений к модели")
+    parser.add_argument("--max-in-flight", type=int, default=8192, help="лимит одновременных /api/chat")
+    parser.add_argument("--stream", action="store_true", help="потоковые ответы (SSE)")
+    parser.add_argument("--coalesce", action="store_true",
+                        help="объединять одинаковые запросы (иначе каждый чат вызывает модель сам)")
+    args = parser.parse_args(argv)
+
+    with AsyncStubLLM(latency=args.latency, token_delay=0.001 if args.stream else 0) as stub:
+        os.environ.setdefault("GROQ_API_KEY", "stub")
+        import config
+        import server
+        from asgi_server import ChatApp
+        from chat.async_upstream import AsyncUpstreamClient
+
+        server.GROQ_API_KEY = os.environ["GROQ_API_KEY"]
+        # Все чаты — в модель: без кэша ответов и встроенной базы фикха
+        config.CHAT_CACHE_SIZE = 0
+        config.OFFLINE_ANSWERS = False
+        app = ChatApp(max_in_flight=args.max_in_flight,
+                      client=AsyncUpstreamClient(stub.url, pool_size=args.pool_size, read_timeout=120),
+                      coalesce=args.coalesce)
+
+        async def run():
+            results, elapsed = await _load(app, args.chats, args.stream)
+            await app.client.aclose()
+            return results, elapsed
+
+        results, elapsed = asyncio.run(run())
+
+    statuses = Counter(status for _, status, _ in results)
+    ok = np.array([t for t, status, _ in results if status == 200]) * 1000
+    retry_after = {headers.get(b"retry-after") for _, status, headers in results if status == 503}
+
+    print(f"{args.chats} одновременных чатов, задержка модели {args.latency * 1000:.0f} мс, "
+          f"пул {args.pool_size}, лимит {args.max_in_flight}{', SSE' if args.stream else ''}\n")
+    print(f"  ответы:                 {dict(statuses)}")
+    if len(ok):
+        print(f"  задержка 200, мс:       p50 {np.percentile(ok, 50):.0f}, p99 {np.percentile(ok, 99):.0f}")
+    print(f"  пик одновременных чатов: {app.peak_in_flight}")
+    print(f"  пик запросов у модели:   {stub.peak_in_flight}")
+    print(f"  соединений к модели:     {stub.connections}")
+    if retry_after:
+        print(f"  Retry-After в 503:       {', '.join(v.decode() for v in retry_after)}")
+    print(f"  всего:                   {elapsed:.2f} с ({len(results) / elapsed:.0f} запр/с)")
+    print(f"  пиковый RSS:             {_peak_rss_mb():.1f} МБ")
+    return 0 if statuses.get(200) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""
+Бенчмарк /api/chat: ответ одним JSON против потока SSE.
+
+server.py запускается в фоновом потоке (werkzeug, threaded) и ходит
+в локальную заглушку модели (benchmarks.stub_llm), которая генерирует
+ответ по словам. Для каждого режима — время до первого байта текста
+(TTFT, воспринимаемая задержка) и полное время ответа, p50/p95.
+
+Запуск:
+    python -m benchmarks.bench_chat_streaming
+    python -m benchmarks.bench_chat_streaming --requests 200 --threads 20 --words 300
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.stub_llm import StubLLM
+
+
+def _ask(port: int, stream: bool, message: str = "Как совершать омовение?") -> tuple[float, float, str]:
+    """(TTFT, полное время, текст ответа) одного запроса к /api/chat."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    body = json.dumps({"message": message, "history": [], "stream": stream})
+    start = time.perf_counter()
+    conn.request("POST", "/api/chat", body=body, headers={"Content-Type": "application/json"})
+    response = conn.getresponse()
+    if not stream:
+        text = json.loads(response.read())["message"]
+        elapsed = time.perf_counter() - start
+        conn.close()
+        return elapsed, elapsed, text
+
+    first = None
+    text = ""
+    event = None
+    while True:
+        line = response.readline()
+        if not line:
+            break
+        line = line.decode("utf-8").rstrip("\n")
+        if line.startswith("event: "):
+            event = line[7:]
+        elif line.startswith("data: "):
+            data = json.loads(line[6:])
+            if event in ("done", "error"):
+                text = data["message"]
+                break
+            if first is None:
+                first = time.perf_counter() - start
+        else:
+            event = None
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return first or elapsed, elapsed, text
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--threads", type=int, default=10, help="одновременных клиентов")
+    parser.add_argument("--latency", type=float, default=0.3, help="время до первого токена у модели, секунды")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="пауза между токенами, секунды")
+    parser.add_argument("--words", type=int, default=200, help="слов в ответе модели")
+    args = parser.parse_args(argv)
+
+    answer = " ".join(f"слово{i}" for i in range(args.words))
+    with StubLLM(latency=args.latency, token_delay=args.token_delay, answer=answer) as stub:
+        os.environ["GROQ_URL"] = stub.url
+        os.environ.setdefault("GROQ_API_KEY", "stub")
+        # У заглушки нет квот — ограничитель не должен задерживать запросы
+        os.environ["UPSTREAM_RPM"] = os.environ["UPSTREAM_TPM"] = "0"
+        from werkzeug.serving import make_server
+
+        import config
+        import server
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        server.GROQ_API_KEY = os.environ["GROQ_API_KEY"]
+        # Все запросы — в модель: без кэша ответов и встроенной базы фикха
+        config.CHAT_CACHE_SIZE = 0
+        config.OFFLINE_ANSWERS = False
+        httpd = make_server("127.0.0.1", 0, server.app, threaded=True)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        port = httpd.server_port
+
+        print(f"{args.requests} запросов, {args.threads} клиентов, ответ {args.words} слов, "
+              f"до первого токена {args.latency * 1000:.0f} мс\n")
+        print(f"{'режим':<8} {'TTFT p50':>10} {'TTFT p95':>10} {'всего p50':>10} {'всего p95':>10}  (мс)")
+        for name, stream in (("json", False), ("sse", True)):
+            with ThreadPoolExecutor(args.threads) as pool:
+                results = list(pool.map(lambda _: _ask(port, stream), range(args.requests)))
+            if any(text != answer for _, _, text in results):
+                print(f"{name}: ответ отличается от ответа модели", file=sys.stderr)
+                return 1
+            ttft = np.array([r[0] for r in results]) * 1000
+            total = np.array([r[1] for r in results]) * 1000
+            print(f"{name:<8} {np.percentile(ttft, 50):>10.1f} {np.percentile(ttft, 95):>10.1f} "
+                  f"{np.percentile(total, 50):>10.1f} {np.percentile(total, 95):>10.1f}")
+        httpd.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+Бенчмарк объединения одинаковых запросов к модели (chat.coalesce).
+
+Всплеск: --burst клиентов одновременно (через барьер) спрашивают
+/api/chat о --distinct популярных вопросах — с разным регистром
+и пробелами, как пишут живые пользователи. server.py запускается
+в фоновом потоке (werkzeug, threaded), модель — локальная заглушка
+(benchmarks.stub_llm), которая считает вызовы и отвечает 429 сверх
+--upstream-limit одновременных запросов. Для ответа одним JSON
+и потоком SSE, с объединением и без: вызовы модели, ответы 429,
+задержка p50/p99 и число ответов, отличных от ответа модели.
+
+Кэш ответов и встроенная база фикха отключены, чтобы все запросы
+доходили до модели.
+
+Запуск:
+    python -m benchmarks.bench_coalesce
+    python -m benchmarks.bench_coalesce --burst 500 --distinct 10 --latency 1
+"""
+
+import argparse
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.bench_chat_streaming import _ask
+from benchmarks.stub_llm import StubLLM
+
+QUESTIONS = [
+    "Когда начинается пост в Рамадан?",
+    "Что нарушает пост?",
+    "Сколько платить закят аль-фитр?",
+    "Можно ли чистить зубы во время поста?",
+    "Как совершать таравих?",
+    "Что делать, если пропустил пост по болезни?",
+    "Когда читать намерение на пост?",
+    "Можно ли принимать лекарства в пост?",
+    "Как рассчитать фидью?",
+    "Какие дни запрещено поститься?",
+]
+
+
+def _variant(question: str, i: int) -> str:
+    """Тот же вопрос в написании i-го пользователя (регистр, пробелы)."""
+    if i % 3 == 1:
+        question = question.lower()
+    if i % 3 == 2:
+        question = "  " + question.replace(" ", "  ")
+    return question
+
+
+def _burst(port: int, burst: int, distinct: int, stream: bool) -> list[tuple[float, str]]:
+    """(полное время, текст ответа) каждого запроса всплеска."""
+    barrier = threading.Barrier(burst)
+
+    def one(i: int):
+        barrier.wait()
+        _, elapsed, text = _ask(port, stream, _variant(QUESTIONS[i % distinct], i // distinct))
+        return elapsed, text
+
+    with ThreadPoolExecutor(burst) as pool:
+        return list(pool.map(one, range(burst)))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--burst", type=int, default=200, help="одновременных запросов")
+    parser.add_argument("--distinct", type=int, default=5, help=f"разных вопросов (до {len(QUESTIONS)})")
+    parser.add_argument("--latency", type=float, default=0.5, help="время до первого токена у модели, секунды")
+    parser.add_argument("--token-delay", type=float, default=0.002, help="пауза между токенами, секунды")
+    parser.add_argument("--upstream-limit", type=int, default=8,
+                        help="одновременных запросов, которые модель принимает без 429 (0 — без лимита)")
+    parser.add_argument("--window", type=float, default=0.0,
+                        help="окно объединения после завершения вызова, секунды (CHAT_COALESCE_WINDOW)")
+    args = parser.parse_args(argv)
+    distinct = max(1, min(args.distinct, len(QUESTIONS)))
+
+    answer = " ".join(f"слово{i}" for i in range(100))
+    with StubLLM(latency=args.latency, token_delay=args.token_delay, answer=answer,
+                 max_in_flight=args.upstream_limit, retry_after=1) as stub:
+        os.environ["GROQ_URL"] = stub.url
+        os.environ.setdefault("GROQ_API_KEY", "stub")
+        # У заглушки нет квот — ограничитель не должен задерживать запросы
+        os.environ["UPSTREAM_RPM"] = os.environ["UPSTREAM_TPM"] = "0"
+        from werkzeug.serving import make_server
+
+        import config
+        import server
+        from chat.coalesce import SingleFlight
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        server.GROQ_API_KEY = os.environ["GROQ_API_KEY"]
+        # Все запросы — в модель: без кэша ответов и встроенной базы фикха
+        config.CHAT_CACHE_SIZE = 0
+        config.OFFLINE_ANSWERS = False
+        httpd = make_server("127.0.0.1", 0, server.app, threaded=True)
+        # Очередь приёма на весь всплеск: иначе лишние соединения ждут повтора SYN (1 с)
+        httpd.socket.listen(max(args.burst, 128))
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        port = httpd.server_port
+        # Прогрев: индекс поиска строится при первом запросе
+        _ask(port, False, "Что такое намаз?")
+
+        print(f"всплеск {args.burst} запросов, {distinct} разных вопросов, "
+              f"модель: {args.latency * 1000:.0f} мс до первого токена, "
+              f"лимит {args.upstream_limit or '—'} одновременных\n")
+        print(f"{'режим':<14} {'вызовов':>8} {'429':>6} {'p50, мс':>9} {'p99, мс':>9} {'ошибок':>7}")
+        failed = False
+        for stream in (False, True):
+            for coalesce in (False, True):
+                config.CHAT_COALESCE = coalesce
+                server._single_flight = SingleFlight(window=args.window) if coalesce else None
+                stub.reset()
+                results = _burst(port, args.burst, distinct, stream)
+                wrong = sum(text != answer for _, text in results)
+                latency = np.array([t for t, _ in results]) * 1000
+                name = f"{'sse' if stream else 'json'}, {'общий' if coalesce else 'свой'}"
+                print(f"{name:<14} {stub.requests:>8} {stub.errors:>6} {np.percentile(latency, 50):>9.0f} "
+                      f"{np.percentile(latency, 99):>9.0f} {wrong:>7}")
+                if coalesce:
+                    stats = server.get_single_flight().stats()
+                    failed |= wrong > 0 or stats["upstream_calls"] > distinct
+                    print(f"{'':<14} объединено {stats['coalesced']} из {stats['coalesced'] + stats['upstream_calls']} "
+                          f"({stats['coalesced_ratio']:.1%})")
+        httpd.shutdown()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""
+Бенчмарк движка "inverted" (инвертированный индекс + MaxScore)
+против полного перебора по TF-IDF матрице.
+
+Проверяет совпадение top-k на каждом запросе и показывает, как растёт
+задержка с размером корпуса. Завершается с кодом 1 при расхождении.
+
+Запуск:
+    python -m benchmarks.bench_inverted_index
+    python -m benchmarks.bench_inverted_index --sizes 10000,100000 --top-k 5
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.bench_search_topk import same_ranking, synthetic_entries, synthetic_queries
+from knowledge_base.search import KnowledgeSearch
+
+
+def _run(search: KnowledgeSearch, queries: list[str], top_k: int) -> tuple[list, float]:
+    """Выполнить запросы, вернуть ранжирования и медианную задержку (мс)."""
+    rankings, timings = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results = search.search(query, top_k=top_k)
+        timings.append((time.perf_counter() - start) * 1000)
+        rankings.append([(r["id"], r["relevance_score"]) for r in results])
+    return rankings, float(np.median(timings))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="размеры синтетических корпусов через запятую")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    queries = synthetic_queries(args.queries)
+    ok = True
+
+    print(f"{'записей':>10} {'перебор, мс':>12} {'inverted, мс':>13} {'ускорение':>10}  top-k")
+    for size in (int(s) for s in args.sizes.split(",")):
+        entries = synthetic_entries(size)
+        brute = KnowledgeSearch(entries=entries, engine="tfidf", cache_size=0)
+        inverted = KnowledgeSearch(entries=entries, engine="inverted", cache_size=0)
+        brute.search(queries[0], top_k=args.top_k)
+        inverted.search(queries[0], top_k=args.top_k)
+
+        expected, brute_ms = _run(brute, queries, args.top_k)
+        actual, inverted_ms = _run(inverted, queries, args.top_k)
+        equal = all(same_ranking(a, b) for a, b in zip(expected, actual))
+        ok = ok and equal
+
+        print(f"{size:>10} {brute_ms:>12.3f} {inverted_ms:>13.3f} "
+              f"{brute_ms / inverted_ms:>9.1f}x  {'совпадает' if equal else 'РАСХОДИТСЯ'}")
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
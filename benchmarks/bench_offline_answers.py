@@ -0,0 +1,107 @@
+"""
+Бенчмарк оффлайн-ответов /api/chat (chat.offline_answers).
+
+Размеченный набор вопросов: частые (ожидаемая запись базы фикха) и такие,
+на которые база не отвечает (должны уйти в модель). Для нескольких
+порогов косинуса — доля ответов без модели, доля неверных ответов
+(не та запись или ответ на вопрос вне базы) и время сопоставления.
+
+Запуск:
+    python -m benchmarks.bench_offline_answers
+    python -m benchmarks.bench_offline_answers --thresholds 0.15,0.25,0.35 --margin 0.05
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from chat.offline_answers import OfflineAnswers
+
+# (вопрос, начало заголовка ожидаемой записи; None — отвечать должна модель)
+QUESTIONS = [
+    ("Сколько ракаатов в обязательных намазах?", "Обязательные намазы"),
+    ("Как правильно делать омовение?", "Малое омовение"),
+    ("Какой нисаб закята?", "Закят"),
+    ("Сколько выплачивать закят аль-фитр?", "Закят"),
+    ("Можно ли поститься во время месячных?", "Месячные"),
+    ("Можно ли молиться во время месячных?", "Месячные"),
+    ("Что нарушает пост?", "Пост (саум)"),
+    ("Разрешены ли проценты по вкладу?", "Риба"),
+    ("Можно ли брать кредит в банке?", "Риба"),
+    ("Харам ли курение кальяна?", "Курение"),
+    ("Можно ли носить золото мужчине?", "Золото"),
+    ("Можно ли делать татуировку?", "Татуировки"),
+    ("Что такое истихара?", "Намаз-истихара"),
+    ("Можно ли держать собаку дома?", "Животные"),
+    ("Как совершить гусль после джанабы?", "Полное омовение"),
+    ("Можно ли слушать музыку?", "Музыка"),
+    ("Как делать таяммум если нет воды", "Таяммум"),
+    ("Кто вы?", "О проекте"),
+    ("Ассаляму алейкум", "Приветствие"),
+    ("Можно ли праздновать день рождения?", "День рождения"),
+    ("Как разделить наследство между детьми?", "Наследство"),
+    ("Можно ли жене работать без разрешения мужа?", "Содержание жены"),
+    ("Можно ли играть в шахматы?", "Игры"),
+    ("Можно ли беременной не поститься?", "Пост для беременных"),
+    ("можно ли есть желатин", "Желатин"),
+    ("Как совершать джаназа-намаз?", "Заупокойная"),
+    ("Какая погода в Москве?", None),
+    ("Напиши код на питоне", None),
+    ("Что такое ислам?", None),
+    ("Как читать Коран?", None),
+    ("Можно ли молиться в обуви?", None),
+    ("Можно ли работать в банке программистом, если зарплата из процентов?", None),
+    ("Мой муж не молится, что мне делать?", None),
+    ("Посоветуйте книгу по истории Османской империи", None),
+]
+
+
+def _run(offline: OfflineAnswers, repeat: int) -> dict:
+    answered = wrong = 0
+    timings = []
+    for question, expected in QUESTIONS:
+        found = offline.match(question)
+        for _ in range(repeat):
+            start = time.perf_counter()
+            offline.match(question)
+            timings.append(time.perf_counter() - start)
+        if found is None:
+            continue
+        answered += 1
+        if expected is None or not found[0]["title"].startswith(expected):
+            wrong += 1
+    us = np.array(timings) * 1e6
+    return {
+        "answered": answered / len(QUESTIONS),
+        "wrong": wrong / len(QUESTIONS),
+        "match_p50_us": float(np.percentile(us, 50)),
+        "match_p99_us": float(np.percentile(us, 99)),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--thresholds", default="0.1,0.15,0.25,0.35,0.5", help="пороги косинуса через запятую")
+    parser.add_argument("--margin", type=float, default=0.1, help="отрыв от следующей записи")
+    parser.add_argument("--repeat", type=int, default=20, help="повторов вопроса для замера времени")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    offline = OfflineAnswers(threshold=0, margin=args.margin)
+    built_ms = (time.perf_counter() - start) * 1000
+    in_db = sum(expected is not None for _, expected in QUESTIONS)
+    print(f"{len(offline.entries)} записей базы, индекс за {built_ms:.1f} мс; "
+          f"{len(QUESTIONS)} вопросов, из них {in_db} есть в базе\n")
+    print(f"{'порог':<8} {'без модели':>11} {'неверные':>9} {'p50, мкс':>9} {'p99, мкс':>9}")
+    for threshold in [float(t) for t in args.thresholds.split(",")]:
+        offline.threshold = threshold
+        result = _run(offline, args.repeat)
+        print(f"{threshold:<8g} {result['answered']:>11.1%} {result['wrong']:>9.1%} "
+              f"{result['match_p50_us']:>9.1f} {result['match_p99_us']:>9.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+Бенчмарк ограничителя частоты запросов к модели (chat.rate_limit).
+
+Всплеск: --burst потоков одновременно отправляют запрос через
+UpstreamClient в локальную заглушку модели (benchmarks.stub_llm)
+с квотой --rpm запросов в минуту (ведро на --quota-burst запросов);
+сверх квоты заглушка отвечает 429 с Retry-After. Три клиента:
+
+  без ограничителя    — повторы с паузой (UPSTREAM_MAX_RETRIES), потом ошибка;
+  только Retry-After  — ограничитель без квот: очередь и пауза по 429;
+  квота               — ограничитель с той же квотой, что у заглушки.
+
+Для каждого — сколько запросов получили ответ, сколько 429 вернула
+модель, отказы очереди, время всплеска, пропускная способность (ответов
+в секунду против квоты) и задержка p50/p99.
+
+Запуск:
+    python -m benchmarks.bench_rate_limit
+    python -m benchmarks.bench_rate_limit --burst 300 --rpm 1200 --quota-burst 20
+"""
+
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.stub_llm import StubLLM
+from chat.rate_limit import RateLimitDropped, RateLimiter
+from chat.upstream import UpstreamClient, UpstreamError
+
+PAYLOAD = {"model": "stub", "messages": [{"role": "user", "content": "Что нарушает пост?"}], "max_tokens": 256}
+
+
+def _burst(client: UpstreamClient, burst: int) -> tuple[list, float]:
+    """(результаты (время, исход), длительность всплеска до последнего ответа)."""
+    barrier = threading.Barrier(burst)
+    started = []
+
+    def one(_):
+        barrier.wait()
+        start = time.perf_counter()
+        if not started:
+            started.append(start)
+        try:
+            client.post_json(PAYLOAD)
+            outcome = "ok"
+        except UpstreamError as e:
+            outcome = f"http {e.status}"
+        except RateLimitDropped:
+            outcome = "dropped"
+        return time.perf_counter() - start, outcome, time.perf_counter()
+
+    with ThreadPoolExecutor(burst) as pool:
+        results = list(pool.map(one, range(burst)))
+    finished = max(end for _, outcome, end in results if outcome == "ok") if any(
+        outcome == "ok" for _, outcome, _ in results) else min(started)
+    return [(elapsed, outcome) for elapsed, outcome, _ in results], finished - min(started)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--burst", type=int, default=200, help="одновременных запросов")
+    parser.add_argument("--rpm", type=int, default=600, help="квота модели, запросов в минуту")
+    parser.add_argument("--quota-burst", type=int, default=10, help="вместимость ведра квоты, запросов")
+    parser.add_argument("--latency", type=float, default=0.2, help="задержка ответа модели, секунды")
+    parser.add_argument("--max-wait", type=float, default=30.0, help="дедлайн ожидания квоты, секунды")
+    args = parser.parse_args(argv)
+
+    clients = {
+        "без ограничителя": lambda: None,
+        "только Retry-After": lambda: RateLimiter(rpm=0, tpm=0, max_wait=args.max_wait),
+        "квота": lambda: RateLimiter(rpm=args.rpm, tpm=0, burst=args.quota_burst / args.rpm,
+                                     max_wait=args.max_wait),
+    }
+    quota_rate = args.rpm / 60
+    print(f"всплеск {args.burst} запросов, квота модели {args.rpm} в минуту ({quota_rate:g}/с), "
+          f"сразу до {args.quota_burst}, ответ {args.latency * 1000:.0f} мс\n")
+    print(f"{'клиент':<20} {'ответов':>8} {'ошибок':>7} {'отказов':>8} {'429':>6} "
+          f"{'время, с':>9} {'ответов/с':>10} {'p50, мс':>8} {'p99, мс':>8}")
+    failed = False
+    with StubLLM(latency=args.latency, rpm=args.rpm, rpm_burst=args.quota_burst) as stub:
+        for name, make_limiter in clients.items():
+            # Квота заглушки восполняется между прогонами
+            time.sleep(args.quota_burst / quota_rate)
+            stub.reset()
+            limiter = make_limiter()
+            client = UpstreamClient(stub.url, pool_size=args.burst, limiter=limiter)
+            results, elapsed = _burst(client, args.burst)
+            client.close()
+            ok = sum(outcome == "ok" for _, outcome in results)
+            dropped = sum(outcome == "dropped" for _, outcome in results)
+            latency = np.array([t for t, _ in results]) * 1000
+            print(f"{name:<20} {ok:>8} {len(results) - ok - dropped:>7} {dropped:>8} {stub.errors:>6} "
+                  f"{elapsed:>9.2f} {ok / elapsed if elapsed else 0:>10.1f} "
+                  f"{np.percentile(latency, 50):>8.0f} {np.percentile(latency, 99):>8.0f}")
+            if limiter is not None:
+                stats = limiter.stats()
+                print(f"{'':<20} ждали квоты {stats['waited']}, в среднем {stats['avg_wait_ms']:.0f} мс, "
+                      f"пик очереди {stats['peak_queue_depth']}")
+                if name == "квота":
+                    failed |= ok + dropped < len(results)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
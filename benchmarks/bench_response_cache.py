@@ -0,0 +1,103 @@
+"""
+Бенчмарк кэша ответов /api/chat (chat.response_cache).
+
+Поток вопросов с распределением Ципфа по темам; каждая тема задана
+несколькими перефразировками, к которым добавляются вежливые обращения
+(«Подскажите, …», «… Спасибо.»), как в живом трафике. Для точного
+совпадения и нескольких порогов почти-дубликатов — доля попаданий (= доля сэкономленных вызовов модели),
+доля ошибочных попаданий (ответ на вопрос другой темы) и время поиска.
+
+Запуск:
+    python -m benchmarks.bench_response_cache
+    python -m benchmarks.bench_response_cache --requests 50000 --thresholds 0.5,0.6,0.7,0.8
+"""
+
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+from chat.response_cache import ResponseCache
+
+# Темы: перефразировки одного вопроса (ответ у темы один)
+TOPICS = [
+    ["Сколько ракаатов в обязательных намазах?", "сколько ракаатов в обязательном намазе",
+     "Сколько ракаатов нужно в обязательных намазах", "обязательные намазы: сколько ракаатов?"],
+    ["Как правильно делать омовение?", "как делать омовение правильно", "Как совершать малое омовение?",
+     "правильное омовение как делать"],
+    ["Что нарушает омовение?", "что нарушает вуду", "Что портит омовение?", "нарушает ли сон омовение"],
+    ["Какой нисаб закята?", "какой нисаб для закята", "С какой суммы платить закят?", "нисаб закята сколько"],
+    ["Можно ли поститься во время месячных?", "можно ли держать пост во время месячных",
+     "пост во время месячных можно ли"],
+    ["Можно ли молиться во время месячных?", "можно ли читать намаз во время месячных",
+     "намаз во время месячных можно ли"],
+    ["Что нарушает пост?", "что нарушает пост в рамадан", "Что портит пост?", "нарушает ли пост зубная паста"],
+    ["Когда начинается время утреннего намаза?", "когда начинается фаджр", "Время утреннего намаза когда?"],
+    ["Можно ли есть мясо, забитое не мусульманином?", "халяль ли мясо забитое христианином",
+     "можно ли есть мясо людей писания"],
+    ["Как совершать джаназа-намаз?", "как читать погребальную молитву", "джаназа намаз как совершать"],
+    ["Разрешены ли проценты по вкладу?", "можно ли получать проценты по вкладу", "проценты по депозиту харам?"],
+    ["Сколько выплачивать закят аль-фитр?", "размер закят аль-фитр", "закят аль фитр сколько платить"],
+]
+
+
+_PREFIXES = ["", "", "Подскажите, ", "Скажите пожалуйста, ", "Ассаламу алейкум! ", "Вопрос: ", "Уважаемый устаз, "]
+_SUFFIXES = ["", "", " Спасибо.", " Заранее спасибо!", " Джазакаллаху хайран."]
+
+
+def _traffic(requests: int, seed: int) -> list[tuple[int, str]]:
+    """(тема, вопрос): темы по Ципфу, перефразировка и обращение — случайно."""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(TOPICS))]
+    topics = rng.choices(range(len(TOPICS)), weights=weights, k=requests)
+    return [
+        (topic, rng.choice(_PREFIXES) + rng.choice(TOPICS[topic]) + rng.choice(_SUFFIXES))
+        for topic in topics
+    ]
+
+
+def _run(cache: ResponseCache, traffic: list) -> dict:
+    wrong = 0
+    timings = []
+    for topic, question in traffic:
+        key = cache.make_key("prompt", "model", question, [])
+        start = time.perf_counter()
+        hit = cache.get(key)
+        timings.append(time.perf_counter() - start)
+        if hit is None:
+            cache.put(key, f"topic-{topic}")
+        elif hit[0] != f"topic-{topic}":
+            wrong += 1
+    stats = cache.stats()
+    us = np.array(timings) * 1e6
+    return {
+        "hit_rate": stats["hit_rate"],
+        "similar_hits": stats["similar_hits"],
+        "wrong_rate": wrong / len(traffic),
+        "lookup_p50_us": float(np.percentile(us, 50)),
+        "lookup_p99_us": float(np.percentile(us, 99)),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--thresholds", default="0.5,0.6,0.7,0.8,0.9", help="пороги косинуса через запятую")
+    parser.add_argument("--size", type=int, default=1024, help="размер кэша")
+    args = parser.parse_args(argv)
+
+    traffic = _traffic(args.requests, seed=3)
+    print(f"{args.requests} вопросов, {len(TOPICS)} тем, {len({q for _, q in traffic})} различных формулировок\n")
+    print(f"{'режим':<16} {'попадания':>10} {'почти-дубл.':>12} {'ошибочные':>10} {'p50, мкс':>9} {'p99, мкс':>9}")
+    for threshold in [0.0] + [float(t) for t in args.thresholds.split(",")]:
+        result = _run(ResponseCache(maxsize=args.size, ttl=0, similarity=threshold), traffic)
+        name = "точное" if threshold == 0 else f"косинус ≥ {threshold:g}"
+        print(f"{name:<16} {result['hit_rate']:>10.1%} {result['similar_hits']:>12} {result['wrong_rate']:>10.2%} "
+              f"{result['lookup_p50_us']:>9.1f} {result['lookup_p99_us']:>9.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
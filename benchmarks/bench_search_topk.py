@@ -0,0 +1,146 @@
+"""
+Бенчмарк быстрого пути KnowledgeSearch.search().
+
+Сравнивает прежнюю реализацию (cosine_similarity + полная argsort)
+с прямым скалярным произведением и частичным отбором top-k (argpartition)
+на синтетических корпусах. Завершается с кодом 1, если результаты расходятся.
+
+Запуск:
+    python -m benchmarks.bench_search_topk
+    python -m benchmarks.bench_search_topk --sizes 10000,100000 --queries 50
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+from knowledge_base.corpus import get_all_principle_entries
+from knowledge_base.quran_data import get_all_quran_entries
+from knowledge_base.hadith_data import get_all_hadith_entries
+from knowledge_base.search import KnowledgeSearch
+
+
+def synthetic_entries(size: int, seed: int = 42) -> list[dict]:
+    """Синтетический корпус из словаря встроенной базы знаний."""
+    rng = random.Random(seed)
+    base = get_all_principle_entries() + get_all_quran_entries() + get_all_hadith_entries()
+    words = sorted({
+        w for e in base
+        for w in re.findall(r"\w+", (e["content"] + " " + " ".join(e["tags"])).lower())
+    })
+    types = ("principle", "quran", "hadith")
+
+    entries = []
+    for i in range(size):
+        content = " ".join(rng.choices(words, k=rng.randint(12, 40)))
+        entries.append({
+            "id": f"synthetic_{i:07d}",
+            "source_type": types[i % len(types)],
+            "title": f"Синтетическая запись {i}",
+            "content": content,
+            "tags": rng.sample(words, 3),
+            "reference": f"synthetic:{i}",
+        })
+    return entries
+
+
+def synthetic_queries(count: int, seed: int = 7) -> list[str]:
+    """Запросы из фрагментов встроенной базы знаний."""
+    rng = random.Random(seed)
+    base = get_all_principle_entries() + get_all_quran_entries() + get_all_hadith_entries()
+    queries = []
+    for _ in range(count):
+        words = rng.choice(base)["content"].split()
+        start = rng.randrange(max(1, len(words) - 8))
+        queries.append(" ".join(words[start:start + rng.randint(3, 12)]))
+    return queries
+
+
+def legacy_search(search: KnowledgeSearch, query: str, top_k: int) -> list[tuple]:
+    """Прежняя реализация search(): косинус + полная сортировка."""
+    query_vec = search.vectorizer.transform([query.lower()])
+    similarities = cosine_similarity(query_vec, search.tfidf_matrix).flatten()
+    top_indices = similarities.argsort()[-top_k:][::-1]
+    return [
+        (search.entries[idx]["id"], float(similarities[idx]))
+        for idx in top_indices
+        if similarities[idx] > 0.0
+    ]
+
+
+def fast_search(search: KnowledgeSearch, query: str, top_k: int) -> list[tuple]:
+    """Текущая реализация search()."""
+    return [(r["id"], r["relevance_score"]) for r in search.search(query, top_k=top_k)]
+
+
+def same_ranking(legacy: list[tuple], fast: list[tuple]) -> bool:
+    """
+    Совпадают ли ранжирования.
+
+    Порядок записей с равной оценкой не определён, поэтому сравниваются
+    оценки по позициям и множества id внутри каждой группы равных оценок
+    (кроме последней: на границе top_k равные записи могут различаться).
+    """
+    if len(legacy) != len(fast):
+        return False
+    legacy_scores = [round(s, 4) for _, s in legacy]
+    if legacy_scores != [s for _, s in fast]:
+        return False
+
+    groups_legacy, groups_fast = {}, {}
+    for (lid, _), (fid, _), score in zip(legacy, fast, legacy_scores):
+        groups_legacy.setdefault(score, set()).add(lid)
+        groups_fast.setdefault(score, set()).add(fid)
+    boundary = legacy_scores[-1] if legacy_scores else None
+    return all(
+        groups_legacy[score] == groups_fast[score]
+        for score in groups_legacy if score != boundary
+    )
+
+
+def _measure(fn, search, queries, top_k) -> tuple[list, float]:
+    """Выполнить запросы, вернуть результаты и медианную задержку (мс)."""
+    results, timings = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(fn(search, query, top_k))
+        timings.append((time.perf_counter() - start) * 1000)
+    return results, float(np.median(timings))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000",
+                        help="размеры синтетических корпусов через запятую")
+    parser.add_argument("--queries", type=int, default=30)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    queries = synthetic_queries(args.queries)
+    ok = True
+
+    print(f"{'записей':>10} {'прежний, мс':>12} {'быстрый, мс':>12} {'ускорение':>10}  результаты")
+    for size in (int(s) for s in args.sizes.split(",")):
+        search = KnowledgeSearch(entries=synthetic_entries(size), cache_size=0)
+        # Прогрев
+        fast_search(search, queries[0], args.top_k)
+        legacy_search(search, queries[0], args.top_k)
+
+        legacy, legacy_ms = _measure(legacy_search, search, queries, args.top_k)
+        fast, fast_ms = _measure(fast_search, search, queries, args.top_k)
+        equal = all(same_ranking(a, b) for a, b in zip(legacy, fast))
+        ok = ok and equal
+
+        print(f"{size:>10} {legacy_ms:>12.3f} {fast_ms:>12.3f} "
+              f"{legacy_ms / fast_ms:>9.1f}x  {'совпадают' if equal else 'РАСХОДЯТСЯ'}")
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Бенчмарк нормализации словоформ (utils.stemmer).
+
+Сравнивает прежний путь (токены как есть) со стеммингом Snowball без
+кэша и с LRU-кэшем токен → основа: пропускную способность токенизации,
+размер словаря и матрицы индекса, время построения индекса и поиска.
+Проверяет, что словоформы из FORMS сводятся к одной основе.
+
+Запуск:
+    python -m benchmarks.bench_text_normalizer
+    python -m benchmarks.bench_text_normalizer --size 50000 --tokens 1000000
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.bench_search_topk import synthetic_entries, synthetic_queries
+from knowledge_base.search import KnowledgeSearch, tokenize
+from utils.stemmer import RussianStemmer, get_normalizer
+
+# Основа → словоформы, которые должны к ней сводиться
+FORMS = {
+    "обман": ["обман", "обмана", "обманул", "обманывать"],
+}
+
+
+def _token_stream(entries: list[dict], count: int) -> list[str]:
+    """Поток токенов из текстов корпуса (с повторами, как в реальном тексте)."""
+    tokens = []
+    for entry in entries:
+        tokens.extend(tokenize(entry["content"].lower()))
+        if len(tokens) >= count:
+            break
+    return tokens[:count]
+
+
+def _throughput(normalize, tokens: list[str]) -> float:
+    """Токенов в секунду."""
+    start = time.perf_counter()
+    for token in tokens:
+        normalize(token)
+    return len(tokens) / (time.perf_counter() - start)
+
+
+def _query_ms(search: KnowledgeSearch, queries: list[str]) -> float:
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        search.search(query, top_k=10)
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=20000, help="записей в синтетическом корпусе")
+    parser.add_argument("--tokens", type=int, default=300000, help="токенов для замера пропускной способности")
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    entries = synthetic_entries(args.size)
+    tokens = _token_stream(entries, args.tokens)
+    queries = synthetic_queries(args.queries)
+
+    stem = get_normalizer("snowball")
+    wrong = [(form, stem(form), root) for root, forms in FORMS.items() for form in forms
+             if stem(form) != root]
+    for form, got, root in wrong:
+        print(f"словоформа {form!r} → {got!r}, ожидалась {root!r}")
+
+    print(f"Нормализация {len(tokens)} токенов ({len(set(tokens))} различных):")
+    for label, normalize in (
+        ("как есть (прежний путь)", lambda token: token),
+        ("snowball без кэша", RussianStemmer().stem),
+        ("snowball с кэшем", get_normalizer("snowball")),
+    ):
+        print(f"  {label:<26} {_throughput(normalize, tokens) / 1e6:>8.2f} млн токенов/с")
+
+    print(f"\n{'нормализатор':<14} {'словарь':>9} {'nnz':>10} {'индекс, с':>10} {'запрос, мс':>11}")
+    for normalizer in ("none", "snowball"):
+        start = time.perf_counter()
+        search = KnowledgeSearch(entries=entries, cache_size=0, normalizer=normalizer)
+        fit_seconds = time.perf_counter() - start
+        search.search(queries[0], top_k=10)
+        print(f"{normalizer:<14} {len(search.vectorizer.vocabulary_):>9} "
+              f"{search.tfidf_matrix.nnz:>10} {fit_seconds:>10.2f} {_query_ms(search, queries):>11.3f}")
+
+    return 1 if wrong else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Бенчмарк клиента модели: urllib на каждый запрос против пула keep-alive.
+
+Запросы идут к локальной заглушке (benchmarks.stub_llm) из нескольких
+потоков, как из рабочих потоков Flask. Для каждого клиента — задержка
+p50/p95/p99, пропускная способность и число TCP-соединений, открытых
+на 1000 запросов. Заглушка работает по HTTP, поэтому выигрыш здесь —
+только TCP-рукопожатие; к api.groq.com (TLS) разница больше.
+
+Запуск:
+    python -m benchmarks.bench_upstream_client
+    python -m benchmarks.bench_upstream_client --requests 5000 --threads 32 --latency 0.01
+    python -m benchmarks.bench_upstream_client --error-rate 0.1   # повторы при 429
+"""
+
+import argparse
+import json
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.stub_llm import StubLLM
+from chat.upstream import UpstreamClient, UpstreamError
+
+_PAYLOAD = {
+    "model": "stub",
+    "messages": [{"role": "user", "content": "Сколько ракаатов в обязательных намазах?"}],
+    "temperature": 0.7,
+    "max_tokens": 2048,
+}
+
+
+def _urllib_call(url: str):
+    """Прежний путь (urllib до пула соединений): новое соединение на каждый запрос."""
+    req = urllib.request.Request(
+        url, data=json.dumps(_PAYLOAD).encode("utf-8"),
+        headers={"Content-Type": "application/json", "Authorization": "Bearer stub"}, method="POST",
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            return json.loads(resp.read().decode("utf-8"))["choices"][0]["message"]["content"]
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def _run(call, requests: int, threads: int) -> tuple[dict, int]:
+    def timed(_):
+        start = time.perf_counter()
+        ok = call()
+        return time.perf_counter() - start, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(timed, range(requests)))
+    elapsed = time.perf_counter() - started
+    ms = np.array([t for t, _ in results]) * 1000
+    failed = sum(1 for _, ok in results if not ok)
+    return {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "rps": requests / elapsed,
+    }, failed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=16, help="одновременных запросов (потоков)")
+    parser.add_argument("--latency", type=float, default=0.005, help="задержка ответа заглушки, секунды")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 429 от заглушки")
+    parser.add_argument("--pool-size", type=int, default=16)
+    args = parser.parse_args(argv)
+
+    with StubLLM(latency=args.latency, error_rate=args.error_rate) as stub:
+        client = UpstreamClient(stub.url, pool_size=args.pool_size, max_retries=3, backoff_max=0.05)
+
+        def pooled():
+            try:
+                return client.post_json(_PAYLOAD, headers={"Authorization": "Bearer stub"})
+            except UpstreamError:
+                return None
+
+        cases = [
+            ("urllib (без пула)", lambda: _urllib_call(stub.url) not in (None, 429)),
+            (f"пул keep-alive ({args.pool_size})", lambda: pooled() is not None),
+        ]
+        print(f"{args.requests} запросов, {args.threads} потоков, задержка заглушки {args.latency * 1000:.0f} мс, "
+              f"доля 429: {args.error_rate:.0%}\n")
+        print(f"{'клиент':<24} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9} {'запр/с':>9} "
+              f"{'соед./1000':>11} {'неудачи':>8}")
+        for name, call in cases:
+            stub.reset()
+            stats, failed = _run(call, args.requests, args.threads)
+            per_1000 = stub.connections * 1000 / args.requests
+            print(f"{name:<24} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} "
+                  f"{stats['rps']:>9.0f} {per_1000:>11.1f} {failed:>8}")
+        client_stats = client.stats()
+        print(f"\nКлиент с пулом: повторов {client_stats['retries']}, "
+              f"соединений открыто {client_stats['connections_opened']}")
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
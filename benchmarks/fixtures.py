@@ -0,0 +1,92 @@
+"""
+Воспроизводимые данные для бенчмарков: ситуации и масштабированные корпуса.
+
+Все генераторы детерминированы (seed), поэтому прогоны на разных
+версиях кода сравнимы между собой.
+"""
+
+import random
+import re
+
+from agents.markers import CONFLICT_MARKERS, CONSEQUENCE_MARKERS, STAKEHOLDER_MARKERS
+from knowledge_base.loader import iter_entries
+
+SITUATION_KINDS = ("short", "long", "dense")
+
+_TEMPLATES = [
+    "Мой {who} просит меня {act}, но я не уверен, что это правильно.",
+    "{Who} узнал, что я собирался {act}, и теперь я сомневаюсь.",
+    "Если я решусь {act}, пострадает {who}, однако молчать тоже нельзя.",
+    "Стоит ли {act}, когда {who} рассчитывает на мою честность?",
+    "С одной стороны, {who} мне дорог, с другой стороны, нельзя {act}.",
+]
+_WHO = ["коллега", "друг", "начальник", "брат", "сестра", "сосед", "клиент", "врач", "учитель", "муж", "жена"]
+_ACTS = [
+    "скрыть ошибку", "промолчать о нарушении", "солгать руководителю", "простить долг",
+    "наказать сотрудника", "нарушить обещание", "взять чужие деньги", "рассказать правду",
+]
+
+
+def _bundled_words() -> list[str]:
+    words = set()
+    for entry in iter_entries():
+        words.update(re.findall(r"\w+", (entry["content"] + " " + " ".join(entry["tags"])).lower()))
+    return sorted(words)
+
+
+def _sentence(rng: random.Random) -> str:
+    template = rng.choice(_TEMPLATES)
+    who, act = rng.choice(_WHO), rng.choice(_ACTS)
+    return template.format(who=who, Who=who.capitalize(), act=act)
+
+
+def synthetic_situations(kind: str, count: int, seed: int = 11) -> list[str]:
+    """
+    Различные ситуации одного вида:
+      - short — одно-два предложения
+      - long  — многостраничное описание (~2000 слов)
+      - dense — короткий текст, насыщенный маркерами участников и конфликтов
+    """
+    if kind not in SITUATION_KINDS:
+        raise ValueError(f"Неизвестный вид ситуаций: {kind!r} (допустимо: {', '.join(SITUATION_KINDS)})")
+    rng = random.Random(f"{kind}:{seed}")
+    words = _bundled_words() if kind == "long" else None
+    markers = STAKEHOLDER_MARKERS + CONFLICT_MARKERS + CONSEQUENCE_MARKERS
+
+    situations = []
+    for i in range(count):
+        if kind == "short":
+            text = " ".join(_sentence(rng) for _ in range(rng.randint(1, 2)))
+        elif kind == "long":
+            parts = []
+            while sum(len(p.split()) for p in parts) < 2000:
+                parts.append(_sentence(rng))
+                parts.append(" ".join(rng.choices(words, k=rng.randint(15, 40))).capitalize() + ".")
+            text = " ".join(parts)
+        else:
+            text = " ".join(rng.choices(markers, k=rng.randint(60, 120))).capitalize() + "."
+        # Номер делает ситуации различными для кэша поиска
+        situations.append(f"{text} (№{i})")
+    return situations
+
+
+def scaled_corpus(factor: int, seed: int = 5) -> list[dict]:
+    """
+    Встроенный корпус, увеличенный в factor раз.
+
+    Первая копия — исходные записи; в остальных слова содержания
+    перемешаны, чтобы документы различались, а словарь оставался
+    реалистичным.
+    """
+    rng = random.Random(seed)
+    base = list(iter_entries())
+    entries = []
+    for copy in range(factor):
+        for entry in base:
+            if copy == 0:
+                entries.append(entry)
+                continue
+            words = entry["content"].split()
+            rng.shuffle(words)
+            entries.append(dict(entry, id=f"{entry['id']}__{copy}", content=" ".join(words)))
+    return entries
@@ -0,0 +1,346 @@
+"""
+Локальная заглушка OpenAI-совместимого эндпоинта chat/completions.
+
+Отвечает фиксированным текстом с заданной задержкой и считает принятые
+TCP-соединения и запросы — для замеров клиента модели без сети и ключа.
+Доля ответов может быть ошибкой 429 с заголовком Retry-After; с лимитом
+max_in_flight 429 получают и запросы сверх него (как у провайдера при
+всплеске нагрузки), с квотой rpm — запросы сверх неё (Retry-After — через
+сколько секунд квота освободится). На запрос
+со stream: true ответ отдаётся событиями SSE по словам: latency — время
+до первого токена, token_delay — пауза между токенами.
+
+AsyncStubLLM — то же на asyncio в отдельном потоке: держит тысячи
+одновременных соединений (для нагрузочных тестов асинхронного сервера).
+
+Запуск отдельно (для server.py):
+    python -m benchmarks.stub_llm --port 8099 --latency 0.2
+    GROQ_URL=http://127.0.0.1:8099/openai/v1/chat/completions GROQ_API_KEY=stub python server.py
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_ANSWER = "**Ответ заглушки.** Мнения мазхабов совпадают."
+
+
+class StubLLM:
+    """Заглушка модели в фоновом потоке."""
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, retry_after: float = 0.0,
+                 answer: str = STUB_ANSWER, port: int = 0, seed: int = 7, token_delay: float = 0.0,
+                 max_in_flight: int = 0, rpm: int = 0, rpm_burst: int = 0):
+        """
+        Args:
+            latency: задержка ответа (до первого токена), секунды
+            token_delay: пауза между токенами потокового ответа, секунды
+            error_rate: доля ответов 429
+            retry_after: значение Retry-After в ответах 429 (0 — без заголовка)
+            answer: текст ответа модели
+            max_in_flight: запросы сверх стольких одновременных получают 429 (0 — без лимита)
+            rpm: квота запросов в минуту, ведро токенов (0 — без квоты)
+            rpm_burst: вместимость ведра квоты, запросов (0 — минутная квота)
+            port: порт (0 — любой свободный)
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.answer = answer
+        self.token_delay = token_delay
+        self.max_in_flight = max_in_flight
+        self.rpm = rpm
+        self._quota_capacity = rpm_burst or rpm
+        self._quota = float(self._quota_capacity)
+        self._quota_updated = time.monotonic()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.connections = 0
+        self.requests = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = _CountingServer(("127.0.0.1", port), _handler(self), self)
+        self.port = self._server.server_address[1]
+        self.url = f"http://127.0.0.1:{self.port}/openai/v1/chat/completions"
+
+    def start(self) -> "StubLLM":
+        threading.Thread(target=self._server.serve_forever, name="stub-llm", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset(self):
+        with self._lock:
+            self.connections = self.requests = self.errors = self.peak_in_flight = 0
+            self._quota = float(self._quota_capacity)
+            self._quota_updated = time.monotonic()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _fails(self) -> bool:
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+    def _enter(self) -> bool:
+        """Учесть начало запроса; False — сверх лимита max_in_flight."""
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            return not self.max_in_flight or self.in_flight <= self.max_in_flight
+
+    def _leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _quota_wait(self) -> float:
+        """Списать запрос с квоты rpm; 0 — в квоте, иначе через сколько секунд она освободится."""
+        if not self.rpm:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            rate = self.rpm / 60.0
+            self._quota = min(self._quota_capacity, self._quota + (now - self._quota_updated) * rate)
+            self._quota_updated = now
+            if self._quota >= 1:
+                self._quota -= 1
+                return 0.0
+            return (1 - self._quota) / rate
+
+
+class _CountingServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, handler, stub: StubLLM):
+        self.stub = stub
+        super().__init__(address, handler)
+
+    def process_request(self, request, client_address):
+        self.stub._count("connections")
+        super().process_request(request, client_address)
+
+
+def _handler(stub: StubLLM):
+    class Handler(BaseHTTPRequestHandler):
+        # HTTP/1.1 — соединение остаётся открытым, пока клиент не попросит закрыть
+        protocol_version = "HTTP/1.1"
+        # Заголовки и тело пишутся отдельно — без TCP_NODELAY ответ ждёт отложенного ACK
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            stub._count("requests")
+            quota_wait = stub._quota_wait()
+            if quota_wait:
+                stub._count("errors")
+                self._send_json(429, {"error": {"message": "Rate limit reached for requests"}},
+                                {"Retry-After": str(math.ceil(quota_wait))})
+                return
+            try:
+                self._respond(payload, stub._enter())
+            finally:
+                stub._leave()
+
+        def _respond(self, payload: dict, admitted: bool):
+            # Сверх лимита провайдер отказывает сразу, без генерации
+            if admitted and stub.latency:
+                time.sleep(stub.latency)
+            if not admitted or stub._fails():
+                stub._count("errors")
+                headers = {"Retry-After": f"{stub.retry_after:g}"} if stub.retry_after else {}
+                self._send_json(429, {"error": {"message": "Rate limit reached"}}, headers)
+                return
+            if payload.get("stream"):
+                self._send_stream(payload)
+                return
+            if stub.token_delay:
+                # Полный ответ отдаётся после генерации всех токенов
+                time.sleep(stub.token_delay * (len(stub.answer.split(" ")) - 1))
+            self._send_json(200, {
+                "id": "stub",
+                "object": "chat.completion",
+                "model": payload.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": stub.answer},
+                    "finish_reason": "stop",
+                }],
+            })
+
+        def _send_json(self, status: int, data: dict, headers: dict | None = None):
+            body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_stream(self, payload: dict):
+            """Ответ событиями SSE (chunked, соединение остаётся открытым)."""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            words = stub.answer.split(" ")
+            for i, word in enumerate(words):
+                if i and stub.token_delay:
+                    time.sleep(stub.token_delay)
+                event = {
+                    "id": "stub",
+                    "object": "chat.completion.chunk",
+                    "model": payload.get("model", "stub"),
+                    "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}}],
+                }
+                self._write_chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n")
+            self._write_chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _write_chunk(self, text: str):
+            data = text.encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+class AsyncStubLLM:
+    """Заглушка модели на asyncio (свой цикл событий в фоновом потоке)."""
+
+    def __init__(self, latency: float = 0.0, answer: str = STUB_ANSWER, token_delay: float = 0.0):
+        self.latency = latency
+        self.answer = answer
+        self.token_delay = token_delay
+        self.connections = 0
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._loop = asyncio.new_event_loop()
+        self._server = None
+        self.port = None
+        self.url = None
+
+    def start(self) -> "AsyncStubLLM":
+        ready = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._serve, "127.0.0.1", 0, backlog=4096)
+            )
+            self.port = self._server.sockets[0].getsockname()[1]
+            self.url = f"http://127.0.0.1:{self.port}/openai/v1/chat/completions"
+            ready.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=run, name="async-stub-llm", daemon=True).start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        self._loop.call_soon_threadsafe(self._server.close)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def reset(self):
+        self.connections = self.requests = self.peak_in_flight = 0
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                length = 0
+                while (line := await reader.readline()).strip():
+                    name, _, value = line.decode("latin-1").partition(":")
+                    if name.strip().lower() == "content-length":
+                        length = int(value)
+                payload = json.loads(await reader.readexactly(length) or b"{}")
+                self.requests += 1
+                self.in_flight += 1
+                self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+                try:
+                    await self._respond(writer, payload)
+                finally:
+                    self.in_flight -= 1
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer: asyncio.StreamWriter, payload: dict):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        words = self.answer.split(" ")
+        if not payload.get("stream"):
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay * (len(words) - 1))
+            body = json.dumps({
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": self.answer}}],
+            }, ensure_ascii=False).encode("utf-8")
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                         + f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+            await writer.drain()
+            return
+
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n")
+        for i, word in enumerate(words):
+            if i and self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            event = {"choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}}]}
+            data = f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8")
+            writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            await writer.drain()
+        data = b"data: [DONE]\n\n"
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n0\r\n\r\n")
+        await writer.drain()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.2, help="задержка ответа (до первого токена), секунды")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="пауза между токенами потока, секунды")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--retry-after", type=float, default=0.0, help="Retry-After в ответах 429, секунды")
+    args = parser.parse_args(argv)
+
+    stub = StubLLM(args.latency, args.error_rate, args.retry_after, port=args.port, token_delay=args.token_delay)
+    print(f"Заглушка модели: {stub.url}")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Соединений: {stub.connections}, запросов: {stub.requests}, ошибок 429: {stub.errors}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Набор бенчмарков конвейера анализа и поиска по базе знаний.
+
+Микробенчмарки:
+  - search@Nx        — KnowledgeSearch.search() на корпусе в N раз больше встроенного
+  - build_index@Nx   — построение индекса (_build_index) на том же корпусе
+  - analyst:<вид>    — AnalystAgent.process на ситуациях short / long / dense
+  - pipeline:<вид>   — полный Pipeline.run
+
+Для каждого бенчмарка — задержка p50/p95/p99, пропускная способность
+и пиковый RSS процесса. Результаты сохраняются в JSON и сравниваются
+с базовым прогоном; при регрессии p50 больше допуска код выхода — 1,
+без файла базовых результатов (он не хранится в репозитории — замеры
+зависят от машины) — 2.
+
+Запуск:
+    python -m benchmarks.suite --save-baseline
+    python -m benchmarks.suite --compare
+    python -m benchmarks.suite --scales 1,10,100,1000 --filter search --output results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from agents.analyst import AnalystAgent
+from benchmarks.bench_search_topk import synthetic_queries
+from benchmarks.fixtures import SITUATION_KINDS, scaled_corpus, synthetic_situations
+from coordinator.pipeline import Pipeline
+from knowledge_base.search import KnowledgeSearch
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Увеличивать при изменении состава или методики бенчмарков
+SUITE_VERSION = 1
+
+
+def _peak_rss_mb() -> float:
+    """Пиковый RSS процесса, МБ (монотонно растёт за время прогона)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux — килобайты, macOS — байты
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_benchmark(fn, inputs: list, iterations: int, time_budget: float, warmup: int = 3) -> dict:
+    """
+    Замерить fn на входах (по кругу): не более iterations вызовов и не дольше
+    time_budget секунд, но не менее трёх вызовов.
+    """
+    for item in inputs[:warmup]:
+        fn(item)
+
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < iterations:
+        item = inputs[len(timings) % len(inputs)]
+        start = time.perf_counter()
+        fn(item)
+        timings.append(time.perf_counter() - start)
+        if len(timings) >= 3 and time.perf_counter() - started > time_budget:
+            break
+
+    ms = np.array(timings) * 1000
+    return {
+        "iterations": len(timings),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "mean_ms": round(float(ms.mean()), 4),
+        "ops_per_sec": round(len(timings) / float(np.sum(timings)), 2),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _benchmarks(scales: list[int], situations_per_kind: int):
+    """(имя, case) в порядке запуска; case() готовит данные и возвращает (fn, входы)."""
+    queries = synthetic_queries(100)
+    for scale in scales:
+        def search_case(scale=scale):
+            search = KnowledgeSearch(entries=scaled_corpus(scale), cache_size=0)
+            return lambda query: search.search(query, top_k=10), queries
+
+        def build_case(scale=scale):
+            corpus = scaled_corpus(scale)
+            search = KnowledgeSearch(entries=corpus, cache_size=0)
+            return lambda _: search._build_index(), [None]
+
+        yield f"search@{scale}x", search_case
+        yield f"build_index@{scale}x", build_case
+
+    for kind in SITUATION_KINDS:
+        def analyst_case(kind=kind):
+            agent = AnalystAgent()
+            return lambda text: agent.process({"situation": text}), synthetic_situations(kind, situations_per_kind)
+
+        def pipeline_case(kind=kind):
+            pipeline = Pipeline()
+            # Входы повторяются по кругу — без кэша замеряется полный путь поиска
+            pipeline.values.search = KnowledgeSearch(cache_size=0)
+            return pipeline.run, synthetic_situations(kind, situations_per_kind, seed=12)
+
+        yield f"analyst:{kind}", analyst_case
+        yield f"pipeline:{kind}", pipeline_case
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> list[str]:
+    """Бенчмарки, у которых p50 вырос больше чем на max_regression (доля)."""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base is None or not base.get("p50_ms"):
+            continue
+        change = current["p50_ms"] / base["p50_ms"] - 1
+        current["p50_change"] = round(change, 4)
+        if change > max_regression:
+            regressions.append(f"{name}: p50 {base['p50_ms']:.3f} → {current['p50_ms']:.3f} мс (+{change:.0%})")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scales", default="1,10,100", help="кратности корпуса через запятую (до 1000)")
+    parser.add_argument("--filter", default="", help="запускать только бенчмарки, содержащие подстроку")
+    parser.add_argument("--iterations", type=int, default=200, help="максимум замеров на бенчмарк")
+    parser.add_argument("--time-budget", type=float, default=5.0, help="секунд на бенчмарк")
+    parser.add_argument("--situations", type=int, default=50, help="различных ситуаций каждого вида")
+    parser.add_argument("--output", help="сохранить результаты в JSON")
+    parser.add_argument("--save-baseline", action="store_true", help=f"сохранить результаты как базовые ({BASELINE_PATH})")
+    parser.add_argument("--compare", action="store_true", help="сравнить с базовыми результатами")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="путь к базовым результатам")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="допустимый рост p50 (доля)")
+    args = parser.parse_args(argv)
+
+    scales = [int(s) for s in args.scales.split(",")]
+    results = {}
+
+    # Базовые результаты читаются до прогона: без них сравнивать не с чем
+    baseline = None
+    if args.compare:
+        try:
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            print(f"Нет базовых результатов: {args.baseline}\n"
+                  f"Сохраните их прогоном с --save-baseline или укажите файл через --baseline",
+                  file=sys.stderr)
+            return 2
+        except (OSError, ValueError) as e:
+            print(f"Не удалось прочитать базовые результаты {args.baseline}: {e}", file=sys.stderr)
+            return 2
+
+    print(f"{'бенчмарк':<22} {'p50, мс':>10} {'p95, мс':>10} {'p99, мс':>10} {'оп/с':>10} {'RSS, МБ':>9}")
+    for name, case in _benchmarks(scales, args.situations):
+        if args.filter not in name:
+            continue
+        fn, inputs = case()
+        stats = run_benchmark(fn, inputs, args.iterations, args.time_budget)
+        results[name] = stats
+        print(f"{name:<22} {stats['p50_ms']:>10.3f} {stats['p95_ms']:>10.3f} {stats['p99_ms']:>10.3f} "
+              f"{stats['ops_per_sec']:>10.1f} {stats['peak_rss_mb']:>9.1f}", flush=True)
+
+    code = 0
+    if baseline is not None:
+        if baseline.get("suite_version") != SUITE_VERSION:
+            print(f"\nБазовые результаты получены другой версией набора ({baseline.get('suite_version')})",
+                  file=sys.stderr)
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print("\nРегрессии:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            code = 1
+        else:
+            print(f"\nРегрессий нет (допуск p50: +{args.max_regression:.0%})")
+
+    document = {
+        "suite_version": SUITE_VERSION,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "args": vars(args),
+        "results": results,
+    }
+    for path in filter(None, (args.output, args.baseline if args.save_baseline else None)):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(document, f, ensure_ascii=False, indent=2)
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,342 @@
+"""
+Асинхронный HTTP-клиент к модели (asyncio, без внешних зависимостей).
+
+Аналог chat.upstream.UpstreamClient для асинхронного сервера (asgi_server):
+ожидание ответа модели не занимает поток, поэтому тысячи чатов могут
+одновременно ждать ответа в одном процессе. Соединения HTTP/1.1 keep-alive
+переиспользуются из пула; число одновременных соединений ограничено,
+остальные запросы ждут свободного соединения без блокировки цикла событий.
+
+Повторы при 429/5xx и сбоях до отправки запроса (в том числе
+ConnectTimeout) — как в синхронном клиенте
+(backoff_delay, Retry-After; с ограничителем частоты — ожидание квоты
+в его очереди), только до начала ответа.
+"""
+
+import asyncio
+import json
+import ssl
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import config
+from chat.rate_limit import PRIORITY_NORMAL, PRIORITY_RETRY
+from chat.upstream import (
+    IDLE_TIMEOUT, RETRY_STATUSES, STREAM_DONE, ConnectTimeout, UpstreamError, backoff_delay, event_delta,
+    event_usage, parse_event_line,
+)
+
+# Ошибки переиспользованного соединения, закрытого сервером между запросами
+_STALE_ERRORS = (ConnectionResetError, BrokenPipeError, asyncio.IncompleteReadError)
+
+
+class _Connection:
+    __slots__ = ("reader", "writer", "released")
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.released = 0.0
+
+    def close(self):
+        self.writer.close()
+
+
+class _Response:
+    """Статус и заголовки ответа; тело читается через body() / lines()."""
+
+    def __init__(self, conn: _Connection, status: int, headers: dict, read_timeout: float):
+        self.conn = conn
+        self.status = status
+        self.headers = headers
+        self.read_timeout = read_timeout
+        self.chunked = "chunked" in headers.get("transfer-encoding", "").lower()
+        self.length = int(headers["content-length"]) if "content-length" in headers else None
+        # Без длины и chunked тело читается до закрытия соединения
+        self.will_close = headers.get("connection", "").lower() == "close" or (
+            not self.chunked and self.length is None
+        )
+
+    async def chunks(self):
+        """Фрагменты тела ответа."""
+        reader = self.conn.reader
+        if self.chunked:
+            while True:
+                size = int((await self._wait(reader.readline())).split(b";")[0].strip(), 16)
+                if size == 0:
+                    # Завершающие заголовки (trailer) до пустой строки
+                    while (await self._wait(reader.readline())).strip():
+                        pass
+                    return
+                data = await self._wait(reader.readexactly(size))
+                await self._wait(reader.readexactly(2))
+                yield data
+        elif self.length is not None:
+            if self.length:
+                yield await self._wait(reader.readexactly(self.length))
+        else:
+            while True:
+                data = await self._wait(reader.read(65536))
+                if not data:
+                    return
+                yield data
+
+    async def body(self) -> bytes:
+        return b"".join([chunk async for chunk in self.chunks()])
+
+    async def lines(self):
+        """Строки тела ответа (для SSE)."""
+        buffer = b""
+        async for chunk in self.chunks():
+            buffer += chunk
+            *complete, buffer = buffer.split(b"\n")
+            for line in complete:
+                yield line
+        if buffer:
+            yield buffer
+
+    def _wait(self, awaitable):
+        return asyncio.wait_for(awaitable, self.read_timeout)
+
+
+class AsyncUpstreamClient:
+    """POST-запросы JSON к эндпоинту модели через асинхронный пул соединений."""
+
+    def __init__(self, url: str = config.GROQ_URL,
+                 pool_size: int = config.ASYNC_UPSTREAM_POOL_SIZE,
+                 connect_timeout: float = config.UPSTREAM_CONNECT_TIMEOUT,
+                 read_timeout: float = config.UPSTREAM_READ_TIMEOUT,
+                 max_retries: int = config.UPSTREAM_MAX_RETRIES,
+                 backoff_max: float = config.UPSTREAM_BACKOFF_MAX,
+                 limiter=None):
+        """limiter — chat.rate_limit.AsyncRateLimiter (None — без ограничения частоты)."""
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Неподдерживаемая схема URL: {url!r}")
+        self.url = url
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        self._host_header = parts.netloc
+        self._ssl = ssl.create_default_context() if parts.scheme == "https" else None
+        self.pool_size = max(int(pool_size), 1)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max(int(max_retries), 0)
+        self.backoff_max = backoff_max
+        self.limiter = limiter
+        self._slots: asyncio.Semaphore | None = None
+        self._idle: deque = deque()
+        self._requests = 0
+        self._retries = 0
+        self._opened = 0
+        self._waiting = 0
+
+    async def post_json(self, payload: dict, headers: dict | None = None) -> dict:
+        """
+        Отправить payload и вернуть разобранный JSON-ответ.
+
+        Raises:
+            UpstreamError: ответ со статусом не 2xx после всех повторов
+            RateLimitDropped: квота не освободилась до дедлайна (с ограничителем)
+            OSError / asyncio.TimeoutError: сбой соединения или таймаут
+        """
+        body = json.dumps(payload).encode("utf-8")
+        cost = self.limiter.estimate(payload) if self.limiter is not None else 0
+        response = await self._perform(body, {"Content-Type": "application/json", **(headers or {})}, cost)
+        data = await self._read(response)
+        if not 200 <= response.status < 300:
+            raise UpstreamError(response.status, data.decode("utf-8", errors="ignore"), response.headers)
+        result = json.loads(data.decode("utf-8"))
+        if self.limiter is not None:
+            self.limiter.settle(cost, result.get("usage"))
+        return result
+
+    async def stream_deltas(self, payload: dict, headers: dict | None = None):
+        """
+        Фрагменты текста потокового ответа (stream: true).
+
+        Ошибки до начала ответа — исключением при первом шаге итерации.
+        С ограничителем стоимость уточняется и для оборванного потока:
+        по usage последнего события или по полученному тексту.
+        """
+        body = json.dumps(payload).encode("utf-8")
+        cost = self.limiter.estimate(payload) if self.limiter is not None else 0
+        response = await self._perform(body, {
+            "Content-Type": "application/json", "Accept": "text/event-stream", **(headers or {}),
+        }, cost)
+        if not 200 <= response.status < 300:
+            data = await self._read(response)
+            raise UpstreamError(response.status, data.decode("utf-8", errors="ignore"), response.headers)
+        completed = done = False
+        parts, usage = [], None
+        try:
+            async for line in response.lines():
+                # После [DONE] тело дочитывается, чтобы соединение можно было переиспользовать
+                if done:
+                    continue
+                event = parse_event_line(line)
+                if event is STREAM_DONE:
+                    done = True
+                elif event is not None:
+                    usage = event_usage(event) or usage
+                    content = event_delta(event)
+                    if content:
+                        parts.append(content)
+                        yield content
+            completed = True
+        finally:
+            self._release(response.conn, completed and not response.will_close)
+            if self.limiter is not None:
+                self.limiter.settle(cost, usage or self.limiter.stream_usage(payload, "".join(parts), completed))
+
+    async def _perform(self, body: bytes, headers: dict, cost: float = 0) -> _Response:
+        """
+        Запрос с повторами; возвращает ответ с непрочитанным телом. cost — оценка в токенах для ограничителя.
+
+        Сбои повторяются, только если запрос не был отправлен; 429
+        с ограничителем повторяется до его дедлайна, не тратя max_retries.
+        """
+        self._requests += 1
+        attempt = 0
+        priority = PRIORITY_NORMAL
+        deadline = self.limiter.deadline() if self.limiter is not None else None
+        while True:
+            if self.limiter is not None:
+                await self.limiter.acquire(cost, priority, deadline)
+            sent = []
+            try:
+                response = await self._send(body, headers, sent)
+            except (OSError, asyncio.IncompleteReadError):
+                # После отправки (таймаут или обрыв) модель могла начать генерацию —
+                # повтор удвоил бы нагрузку и стоимость; до отправки повтор безопасен
+                if sent or attempt >= self.max_retries:
+                    raise
+                delay = backoff_delay(attempt, self.backoff_max)
+            else:
+                if self.limiter is not None:
+                    self.limiter.observe(response.status, response.headers)
+                if response.status == 429 and self.limiter is not None:
+                    # Паузу выдерживает ограничитель; повтор ждёт в очереди впереди новых
+                    # запросов и не тратит max_retries — его ограничивает дедлайн ограничителя
+                    await self._read(response)
+                    priority = PRIORITY_RETRY
+                    self._retries += 1
+                    continue
+                if response.status not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                await self._read(response)
+                delay = backoff_delay(attempt, self.backoff_max, response.headers.get("retry-after"))
+            attempt += 1
+            self._retries += 1
+            await asyncio.sleep(delay)
+
+    async def _send(self, body: bytes, headers: dict, sent: list) -> _Response:
+        """Отправить запрос и дождаться статуса; в sent — отметка, что запрос записан."""
+        conn, reused = await self._acquire()
+        try:
+            try:
+                return await self._exchange(conn, body, headers, sent)
+            except _STALE_ERRORS:
+                if not reused:
+                    raise
+                # Сервер закрыл простаивавшее соединение — один раз пробуем новое
+                sent.clear()
+                conn.close()
+                conn = await self._connect()
+                return await self._exchange(conn, body, headers, sent)
+        except BaseException:
+            self._release(conn, reusable=False)
+            raise
+
+    async def _exchange(self, conn: _Connection, body: bytes, headers: dict, sent: list) -> _Response:
+        head = [f"POST {self.path} HTTP/1.1", f"Host: {self._host_header}", f"Content-Length: {len(body)}"]
+        head += [f"{name}: {value}" for name, value in headers.items()]
+        conn.writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await conn.writer.drain()
+        sent.append(True)
+
+        status_line = await asyncio.wait_for(conn.reader.readline(), self.read_timeout)
+        if not status_line:
+            raise ConnectionResetError("Соединение закрыто сервером")
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await asyncio.wait_for(conn.reader.readline(), self.read_timeout)
+            if not line.strip():
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+        return _Response(conn, status, response_headers, self.read_timeout)
+
+    async def _read(self, response: _Response) -> bytes:
+        """Прочитать тело ответа и вернуть соединение в пул."""
+        try:
+            data = await response.body()
+        except BaseException:
+            self._release(response.conn, reusable=False)
+            raise
+        self._release(response.conn, reusable=not response.will_close)
+        return data
+
+    async def _acquire(self) -> tuple[_Connection, bool]:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size)
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        now = time.monotonic()
+        while self._idle:
+            conn = self._idle.pop()
+            if now - conn.released < IDLE_TIMEOUT and not conn.reader.at_eof():
+                return conn, True
+            conn.close()
+        try:
+            return await self._connect(), False
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def _connect(self) -> _Connection:
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port, ssl=self._ssl,
+                                        server_hostname=self.host if self._ssl else None),
+                self.connect_timeout,
+            )
+        except asyncio.TimeoutError as e:
+            raise ConnectTimeout(f"Таймаут соединения с {self.host}:{self.port}") from e
+        self._opened += 1
+        return _Connection(reader, writer)
+
+    def _release(self, conn: _Connection, reusable: bool):
+        if reusable:
+            conn.released = time.monotonic()
+            self._idle.append(conn)
+        else:
+            conn.close()
+        self._slots.release()
+
+    async def aclose(self):
+        """Закрыть простаивающие соединения."""
+        while self._idle:
+            conn = self._idle.pop()
+            conn.close()
+            try:
+                await conn.writer.wait_closed()
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        """Счётчики клиента для /api/status."""
+        return {
+            "requests": self._requests,
+            "retries": self._retries,
+            "pool_size": self.pool_size,
+            "idle_connections": len(self._idle),
+            "waiting_for_connection": self._waiting,
+            "connections_opened": self._opened,
+        }
@@ -0,0 +1,391 @@
+"""
+Объединение одинаковых одновременных запросов к модели (single-flight).
+
+Запросы с одинаковым отпечатком промпта, пришедшие, пока первый
+(ведущий) ещё выполняется, не вызывают модель сами, а получают его
+результат — ответ или ту же ошибку. Потоковые ответы тоже общие:
+фрагменты копятся в буфере, и каждый получатель читает его со своей
+позиции; следующий фрагмент из модели читает тот, кому он нужен первым,
+поэтому уход любого получателя (в том числе ведущего) не обрывает поток
+остальным. Модель перестаёт читаться, только когда ушли все.
+
+Окно window (секунды) продлевает жизнь успешного результата после
+завершения вызова: запрос, пришедший в это окно, тоже получает его.
+Ошибки после завершения не переиспользуются.
+
+SingleFlight — для потоков (Flask), AsyncSingleFlight — для цикла
+событий (asgi_server.py).
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+
+import config
+from chat.response_cache import normalize_question
+
+
+def prompt_fingerprint(payload: dict) -> str:
+    """
+    Отпечаток запроса к модели: параметры и сообщения с нормализованными
+    пробелами; текущий вопрос (последнее сообщение) — как ключ кэша ответов.
+    """
+    messages = payload.get("messages", [])
+    normalized = [(m.get("role"), " ".join(str(m.get("content", "")).split())) for m in messages[:-1]]
+    if messages:
+        normalized.append((messages[-1].get("role"), normalize_question(str(messages[-1].get("content", "")))))
+    params = {k: v for k, v in payload.items() if k != "messages"}
+    data = json.dumps([params, normalized], ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "finished_at")
+
+    def __init__(self, done):
+        self.done = done
+        self.result = None
+        self.error = None
+        # Когда вызов завершился (для потока — когда поток дочитан); None — ещё выполняется
+        self.finished_at = None
+
+
+class _Flights:
+    """Общая часть: реестр вызовов по ключу, окно и счётчики."""
+
+    def __init__(self, window: float, clock):
+        self.window = window
+        self._clock = clock
+        self._calls: dict[str, _Call] = {}
+        self.leaders = 0
+        self.joined = 0
+
+    def _joinable(self, call: _Call | None) -> bool:
+        if call is None:
+            return False
+        if call.finished_at is None:
+            return True
+        return call.error is None and self._clock() - call.finished_at <= self.window
+
+    def _finished(self, key: str, call: _Call, error: BaseException | None = None):
+        call.error = call.error or error
+        call.finished_at = self._clock()
+        if (self.window <= 0 or call.error is not None) and self._calls.get(key) is call:
+            del self._calls[key]
+
+    def _sweep(self):
+        """Убрать завершённые вызовы с истёкшим окном."""
+        now = self._clock()
+        for key in [k for k, c in self._calls.items()
+                    if c.finished_at is not None and now - c.finished_at > self.window]:
+            del self._calls[key]
+
+    def _stats(self) -> dict:
+        calls = self.leaders + self.joined
+        return {
+            "window_seconds": self.window,
+            "in_flight": sum(c.finished_at is None for c in self._calls.values()),
+            "upstream_calls": self.leaders,
+            "coalesced": self.joined,
+            "coalesced_ratio": round(self.joined / calls, 4) if calls else 0.0,
+        }
+
+
+class SingleFlight(_Flights):
+    """Объединение одинаковых вызовов из разных потоков."""
+
+    def __init__(self, window: float = config.CHAT_COALESCE_WINDOW, clock=time.monotonic):
+        """
+        Args:
+            window: сколько секунд после завершения успешный результат
+                    отдаётся новым запросам (0 — только пока вызов выполняется)
+        """
+        super().__init__(window, clock)
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn):
+        """Результат fn() — своего вызова или уже идущего с тем же ключом."""
+        call, leader = self._join(key)
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            with self._lock:
+                self._finished(key, call)
+            call.done.set()
+        else:
+            call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stream(self, key: str, open_stream):
+        """
+        Поток ответа (deltas() и close(), как у EventStream): свой —
+        open_stream() — или общий с уже идущим с тем же ключом.
+        Ошибки открытия — исключением, как у open_stream.
+        """
+        while True:
+            call, leader = self._join(key)
+            if leader:
+                try:
+                    stream = open_stream()
+                except BaseException as e:
+                    with self._lock:
+                        self._finished(key, call, e)
+                    call.done.set()
+                    raise
+                call.result = SharedStream(stream, on_finish=lambda error: self._stream_finished(key, call, error))
+                call.done.set()
+            else:
+                call.done.wait()
+                if call.error is not None and call.result is None:
+                    raise call.error
+            view = call.result.view()
+            if view is not None:
+                return view
+            # Общий поток успели закрыть все получатели — открываем заново
+
+    def _join(self, key: str) -> tuple[_Call, bool]:
+        with self._lock:
+            call = self._calls.get(key)
+            if self._joinable(call):
+                self.joined += 1
+                return call, False
+            if self.window > 0:
+                self._sweep()
+            call = self._calls[key] = _Call(threading.Event())
+            self.leaders += 1
+            return call, True
+
+    def _stream_finished(self, key: str, call: _Call, error: BaseException | None):
+        with self._lock:
+            self._finished(key, call, error)
+
+    def stats(self) -> dict:
+        """Счётчики для /api/status."""
+        with self._lock:
+            return self._stats()
+
+
+class SharedStream:
+    """Один поток модели на несколько получателей."""
+
+    def __init__(self, stream, on_finish=None):
+        """
+        Args:
+            stream: поток модели (EventStream)
+            on_finish: вызывается с ошибкой (или None), когда поток дочитан или прерван
+        """
+        self._stream = stream
+        self._source = stream.deltas()
+        self._on_finish = on_finish
+        self._buffer: list[str] = []
+        self._error: BaseException | None = None
+        self._done = False
+        self._readers = 0
+        # _lock — состояние, _pull — чтение следующего фрагмента из модели
+        self._lock = threading.Lock()
+        self._pull = threading.Lock()
+
+    def view(self) -> "_StreamView | None":
+        """Новый получатель (None, если поток уже прерван уходом всех получателей)."""
+        with self._lock:
+            if isinstance(self._error, _Abandoned):
+                return None
+            self._readers += 1
+            return _StreamView(self)
+
+    def _item(self, index: int) -> str | None:
+        """Фрагмент с номером index; None — конец потока."""
+        with self._lock:
+            if index < len(self._buffer):
+                return self._buffer[index]
+            if self._done:
+                if self._error is not None:
+                    raise self._error
+                return None
+        with self._pull:
+            with self._lock:
+                # Пока ждали, фрагмент мог прочитать другой получатель
+                if index < len(self._buffer) or self._done:
+                    return self._item_locked(index)
+            try:
+                delta = next(self._source)
+            except StopIteration:
+                self._finish(None)
+                return None
+            except BaseException as e:
+                self._finish(e)
+                raise
+            with self._lock:
+                self._buffer.append(delta)
+            return delta
+
+    def _item_locked(self, index: int) -> str | None:
+        if index < len(self._buffer):
+            return self._buffer[index]
+        if self._error is not None:
+            raise self._error
+        return None
+
+    def _finish(self, error: BaseException | None):
+        with self._lock:
+            if self._done:
+                return
+            self._done = True
+            self._error = error
+        if self._on_finish is not None:
+            self._on_finish(error)
+
+    def _leave(self):
+        with self._lock:
+            self._readers -= 1
+            if self._readers > 0 or self._done:
+                return
+            # Ушли все — дальше модель не читаем (соединение закрывается)
+            self._done = True
+            self._error = _Abandoned("поток закрыт всеми получателями")
+        self._source.close()
+        self._stream.close()
+        if self._on_finish is not None:
+            self._on_finish(self._error)
+
+
+class _Abandoned(ConnectionAbortedError):
+    pass
+
+
+class _StreamView:
+    """Получатель общего потока: deltas() и close(), как у EventStream."""
+
+    def __init__(self, shared: SharedStream):
+        self._shared = shared
+        self._closed = False
+
+    def deltas(self):
+        index = 0
+        while True:
+            delta = self._shared._item(index)
+            if delta is None:
+                return
+            yield delta
+            index += 1
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._shared._leave()
+
+
+class AsyncSingleFlight(_Flights):
+    """Объединение одинаковых вызовов в цикле событий (без блокировок)."""
+
+    def __init__(self, window: float = config.CHAT_COALESCE_WINDOW, clock=time.monotonic):
+        super().__init__(window, clock)
+
+    async def do(self, key: str, coro_fn):
+        """
+        Результат await coro_fn() — своего вызова или уже идущего с тем же
+        ключом. Вызов идёт отдельной задачей: отмена любого ожидающего
+        (разрыв соединения клиента) не отменяет его для остальных.
+        """
+        call = self._calls.get(key)
+        if self._joinable(call):
+            self.joined += 1
+        else:
+            if self.window > 0:
+                self._sweep()
+            call = self._calls[key] = _Call(asyncio.ensure_future(coro_fn()))
+            self.leaders += 1
+            call.done.add_done_callback(lambda task: self._finished(
+                key, call, None if task.cancelled() else task.exception()))
+        return await asyncio.shield(call.done)
+
+    def stream(self, key: str, open_deltas):
+        """
+        Асинхронный генератор фрагментов: свой (open_deltas() —
+        AsyncUpstreamClient.stream_deltas) или общий с уже идущим.
+        """
+        call = self._calls.get(key)
+        if self._joinable(call) and not call.result.abandoned:
+            self.joined += 1
+        else:
+            if self.window > 0:
+                self._sweep()
+            call = self._calls[key] = _Call(None)
+            self.leaders += 1
+            call.result = AsyncSharedStream(open_deltas(), on_finish=lambda error: self._finished(key, call, error))
+        return call.result.view()
+
+    def stats(self) -> dict:
+        """Счётчики для /api/status."""
+        return self._stats()
+
+
+class AsyncSharedStream:
+    """
+    Асинхронный вариант SharedStream. Следующий фрагмент читается отдельной
+    задачей: отмена получателя, который её ждёт, не прерывает чтение остальным.
+    """
+
+    def __init__(self, source, on_finish=None):
+        self._source = source
+        self._on_finish = on_finish
+        self._buffer: list[str] = []
+        self._error: BaseException | None = None
+        self._done = False
+        self._readers = 0
+        self._pending: asyncio.Future | None = None
+        self.abandoned = False
+
+    async def view(self):
+        self._readers += 1
+        index = 0
+        try:
+            while True:
+                if index >= len(self._buffer) and not self._done:
+                    if self._pending is None:
+                        self._pending = asyncio.ensure_future(self._read_next())
+                    await asyncio.shield(self._pending)
+                    continue
+                if index < len(self._buffer):
+                    yield self._buffer[index]
+                    index += 1
+                elif self._error is not None:
+                    raise self._error
+                else:
+                    return
+        finally:
+            self._readers -= 1
+            if self._readers == 0 and not self._done:
+                self.abandoned = True
+                self._finish(_Abandoned("поток закрыт всеми получателями"))
+                if self._pending is not None:
+                    # Генератор модели сейчас внутри задачи — отмена закрывает и его
+                    self._pending.cancel()
+                else:
+                    await self._source.aclose()
+
+    async def _read_next(self):
+        try:
+            self._buffer.append(await self._source.__anext__())
+        except StopAsyncIteration:
+            self._finish(None)
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:
+            self._finish(e)
+        finally:
+            self._pending = None
+
+    def _finish(self, error: BaseException | None):
+        if self._done:
+            return
+        self._done = True
+        self._error = error
+        if self._on_finish is not None:
+            self._on_finish(error)
@@ -0,0 +1,239 @@
+"""
+Сборка промпта /api/chat в пределах бюджета токенов.
+
+Токены считаются приближённо, без токенизатора модели: слова латиницей —
+по 4 символа на токен, прочие (кириллица) — по 3, числа — по 3 цифры,
+знаки препинания — по токену, плюс служебные токены на каждое сообщение.
+Оценка немного завышена, чтобы промпт гарантированно помещался в бюджет;
+для сверки /api/status показывает и prompt_tokens, которые вернула модель.
+
+Последние сообщения истории идут в промпт целиком (от новых к старым,
+пока хватает бюджета, но не больше CHAT_HISTORY_MESSAGES). Более ранние
+заменяются кратким содержанием — первыми предложениями вопросов
+и ответов. Содержание кэшируется по session_id (выданному сервером,
+см. chat.sessions) и при следующих ходах только дополняется новыми
+выпавшими сообщениями.
+"""
+
+import hashlib
+import json
+import re
+import threading
+
+import config
+from knowledge_base.query_cache import QueryCache
+
+# Служебные токены на сообщение (роль и разделители шаблона чата) и на весь промпт
+MESSAGE_OVERHEAD = 4
+PROMPT_OVERHEAD = 3
+SUMMARY_HEADER = "Краткое содержание начала разговора (ранние сообщения):"
+# Длина строки краткого содержания, символов
+SUMMARY_LINE_CHARS = 200
+
+_PIECE_RE = re.compile(r"[A-Za-z]+|\d+|\w+|[^\w\s]")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?…])\s")
+_MARKUP_RE = re.compile(r"<[^>]+>|[*_#`]+")
+
+
+def count_tokens(text: str) -> int:
+    """Приближённое число токенов текста."""
+    tokens = 0
+    for piece in _PIECE_RE.findall(text):
+        first = piece[0]
+        if first.isascii() and first.isalpha():
+            tokens += -(-len(piece) // 4)
+        elif first.isdigit() or first.isalpha() or first == "_":
+            tokens += -(-len(piece) // 3)
+        else:
+            tokens += 1
+    return tokens
+
+
+def message_tokens(message: dict) -> int:
+    """Токены сообщения промпта вместе со служебными."""
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD
+
+
+def summary_line(message: dict) -> str:
+    """Строка краткого содержания: роль и начало текста без разметки (по границе предложения)."""
+    text = " ".join(_MARKUP_RE.sub(" ", message.get("text", "")).split())
+    if len(text) > SUMMARY_LINE_CHARS:
+        head = text[:SUMMARY_LINE_CHARS]
+        ends = [m.start() for m in _SENTENCE_END_RE.finditer(head)]
+        # Слишком короткое первое предложение (заголовок) — режем по слову
+        text = head[:ends[-1]] if ends and ends[-1] >= SUMMARY_LINE_CHARS // 3 else head.rsplit(" ", 1)[0] + "…"
+    role = "Пользователь" if message.get("role") == "user" else "Ассистент"
+    return f"- {role}: {text}"
+
+
+def _message_digest(message: dict) -> str:
+    """Отпечаток сообщения истории (роль и текст)."""
+    data = json.dumps([message.get("role"), message.get("text", "")], ensure_ascii=False)
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class HistoryCompactor:
+    """Промпт в пределах бюджета токенов и счётчики экономии."""
+
+    def __init__(self, budget: int = config.CHAT_PROMPT_BUDGET,
+                 max_messages: int = config.CHAT_HISTORY_MESSAGES,
+                 summary_tokens: int = config.CHAT_SUMMARY_TOKENS,
+                 cache_size: int = config.CHAT_SUMMARY_CACHE_SIZE):
+        """
+        Args:
+            budget: максимум токенов промпта (системный промпт + история + вопрос)
+            max_messages: максимум сообщений истории целиком
+            summary_tokens: бюджет краткого содержания ранних сообщений (0 — просто отбрасывать)
+            cache_size: число сессий с закэшированным кратким содержанием
+        """
+        self.budget = budget
+        self.max_messages = max_messages
+        self.summary_tokens = summary_tokens
+        # session_id → (число покрытых сообщений, отпечаток последнего из них, строки содержания)
+        self._summaries = QueryCache(cache_size) if cache_size > 0 else None
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.full_prompt_tokens = 0
+        self.trimmed = 0
+        self.summarized = 0
+        self.summaries_reused = 0
+        self.summaries_rebuilt = 0
+        self.upstream_prompt_tokens = 0
+        self.upstream_reports = 0
+
+    def build(self, system_prompt: str, user_message: str, history: list,
+              session_id: str | None = None) -> tuple[list[dict], dict]:
+        """
+        Сообщения для модели и сведения о промпте:
+        {prompt_tokens, full_prompt_tokens, history_messages, kept, summarized}.
+
+        full_prompt_tokens — сколько стоил бы промпт с последними
+        max_messages сообщениями целиком (как до сжатия истории).
+        """
+        system = {"role": "system", "content": system_prompt}
+        question = {"role": "user", "content": user_message}
+        turns = [
+            {"role": "user" if msg.get("role") == "user" else "assistant", "content": msg.get("text", "")}
+            for msg in history
+        ]
+        costs = [message_tokens(turn) for turn in turns]
+        fixed = PROMPT_OVERHEAD + message_tokens(system) + message_tokens(question)
+        available = self.budget - fixed
+        window = min(len(turns), self.max_messages)
+
+        # Всё окно помещается — промпт как раньше
+        if sum(costs[len(turns) - window:]) <= available and window == len(turns):
+            kept = window
+        else:
+            reserve = self.summary_tokens if self.summary_tokens > 0 else 0
+            kept, used = 0, 0
+            for cost in reversed(costs[len(turns) - window:]):
+                if used + cost > available - reserve:
+                    break
+                kept += 1
+                used += cost
+        older = len(turns) - kept
+
+        summary = None
+        if older and self.summary_tokens > 0:
+            room = min(self.summary_tokens, available - sum(costs[len(turns) - kept:]))
+            summary = self._summary(history[:older], session_id, room)
+
+        messages = [system]
+        if summary is not None:
+            messages.append({"role": "system", "content": summary})
+        messages += turns[len(turns) - kept:]
+        messages.append(question)
+
+        prompt_tokens = PROMPT_OVERHEAD + sum(message_tokens(m) for m in messages)
+        full_prompt_tokens = fixed + sum(costs[len(turns) - window:])
+        info = {
+            "prompt_tokens": prompt_tokens,
+            "full_prompt_tokens": full_prompt_tokens,
+            "history_messages": len(turns),
+            "kept": kept,
+            "summarized": older if summary is not None else 0,
+        }
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens
+            self.full_prompt_tokens += full_prompt_tokens
+            self.trimmed += bool(older)
+            self.summarized += summary is not None
+        return messages, info
+
+    def _summary(self, older: list, session_id: str | None, room: int) -> str | None:
+        """Краткое содержание ранних сообщений не длиннее room токенов."""
+        lines = self._summary_lines(older, session_id)
+        header = count_tokens(SUMMARY_HEADER) + MESSAGE_OVERHEAD
+        picked, used = [], header
+        # Не помещается всё — остаются самые поздние строки
+        for line in reversed(lines):
+            cost = count_tokens(line) + 1
+            if used + cost > room:
+                break
+            picked.append(line)
+            used += cost
+        if not picked:
+            return None
+        return "\n".join([SUMMARY_HEADER] + picked[::-1])
+
+    def _summary_lines(self, older: list, session_id: str | None) -> list[str]:
+        """
+        Строки содержания; из кэша сессии дописываются только новые сообщения.
+
+        История сессии в SessionStore только дополняется, поэтому кэш
+        сверяется по числу покрытых сообщений и отпечатку последнего из них,
+        а не по хэшу всей ранней истории: ход стоит O(новых сообщений).
+        Подменённая историей клиента сессия почти наверняка не совпадёт
+        по последнему сообщению, и содержание соберётся заново.
+        """
+        if self._summaries is None or not isinstance(session_id, str):
+            return [summary_line(msg) for msg in older]
+
+        cached = self._summaries.get(session_id)
+        if (cached is not None and 0 < cached[0] <= len(older)
+                and _message_digest(older[cached[0] - 1]) == cached[1]):
+            covered, _, lines = cached
+            lines = lines + [summary_line(msg) for msg in older[covered:]]
+            reused = True
+        else:
+            lines = [summary_line(msg) for msg in older]
+            reused = False
+        with self._lock:
+            if reused:
+                self.summaries_reused += 1
+            else:
+                self.summaries_rebuilt += 1
+        self._summaries.put(session_id, (len(older), _message_digest(older[-1]), lines))
+        return lines
+
+    def observe_usage(self, usage: dict | None):
+        """Учесть prompt_tokens, которые вернула модель (для сверки оценки)."""
+        if not usage or "prompt_tokens" not in usage:
+            return
+        with self._lock:
+            self.upstream_prompt_tokens += int(usage["prompt_tokens"])
+            self.upstream_reports += 1
+
+    def stats(self) -> dict:
+        """Счётчики для /api/status."""
+        with self._lock:
+            return {
+                "budget": self.budget,
+                "max_messages": self.max_messages,
+                "summary_tokens": self.summary_tokens,
+                "requests": self.requests,
+                "prompt_tokens": self.prompt_tokens,
+                "avg_prompt_tokens": round(self.prompt_tokens / self.requests, 1) if self.requests else 0.0,
+                "full_prompt_tokens": self.full_prompt_tokens,
+                "saved_ratio": (round(1 - self.prompt_tokens / self.full_prompt_tokens, 4)
+                                if self.full_prompt_tokens else 0.0),
+                "trimmed_requests": self.trimmed,
+                "summarized_requests": self.summarized,
+                "summaries_reused": self.summaries_reused,
+                "summaries_rebuilt": self.summaries_rebuilt,
+                "upstream_prompt_tokens": self.upstream_prompt_tokens,
+                "upstream_reports": self.upstream_reports,
+            }
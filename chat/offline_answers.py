@@ -0,0 +1,151 @@
+"""
+Ответы из встроенной базы фикха (static/fiqh_db.js) без обращения к модели.
+
+База — те же записи {keys, title, answer}, что использует server.js.
+При старте строятся два индекса:
+  - ключевой: фразы keys после нормализации словоформ (utils.stemmer);
+    фраза совпадает, если все её слова есть в вопросе;
+  - TF-IDF по title и keys (KnowledgeSearch в памяти).
+
+Ответ отдаётся, только если уверенность высокая: у лучшей записи есть
+совпавшая ключевая фраза, косинус TF-IDF не ниже порога и запись
+заметно опережает следующую. Всё остальное уходит в модель.
+"""
+
+import json
+import re
+import threading
+
+import config
+from knowledge_base.search import KnowledgeSearch, tokenize
+from utils.stemmer import get_normalizer
+
+_ENTRY_RE = re.compile(
+    r"\{\s*keys:\s*\[(?P<keys>.*?)\],\s*title:\s*(?P<title>\"(?:[^\"\\]|\\.)*\"),"
+    r"\s*answer:\s*`(?P<answer>.*?)`\s*,?\s*\}",
+    re.S,
+)
+
+
+def load_fiqh_db(path: str = config.FIQH_DB_PATH) -> list[dict]:
+    """Записи FIQH_DB из JS-файла: [{keys, title, answer}, ...]."""
+    with open(path, "r", encoding="utf-8") as f:
+        source = f.read()
+    entries = []
+    for match in _ENTRY_RE.finditer(source):
+        entries.append({
+            "keys": json.loads(f"[{match['keys']}]"),
+            "title": json.loads(match["title"]),
+            # Переносы строк в шаблонной строке — оформление исходника, разметка — <br>
+            "answer": " ".join(line.strip() for line in match["answer"].splitlines()),
+        })
+    return entries
+
+
+def _prepare(text: str) -> str:
+    """Нижний регистр, ё → е; составные слова («аль-фитр») — по частям."""
+    return text.lower().replace("ё", "е").replace("-", " ")
+
+
+def format_answer(entry: dict) -> str:
+    """Текст ответа для чата, как у оффлайн-ответов server.js."""
+    return (f"<strong>{entry['title']}</strong><br><br>{entry['answer']}<br><br>"
+            f"<em style=\"opacity:0.6\">📚 Ответ из базы знаний</em>")
+
+
+class OfflineAnswers:
+    """Индекс базы фикха и выбор уверенного ответа."""
+
+    def __init__(self, entries: list[dict] | None = None,
+                 threshold: float = config.OFFLINE_ANSWER_THRESHOLD,
+                 margin: float = config.OFFLINE_ANSWER_MARGIN,
+                 normalizer: str = config.TEXT_NORMALIZER):
+        """
+        Args:
+            entries: записи {keys, title, answer} (по умолчанию — static/fiqh_db.js)
+            threshold: минимальный косинус TF-IDF вопроса и записи
+            margin: насколько лучшая запись должна опережать следующую по косинусу
+            normalizer: нормализация словоформ (см. utils.stemmer)
+        """
+        self.entries = load_fiqh_db() if entries is None else entries
+        self.threshold = threshold
+        self.margin = margin
+        self._normalize = get_normalizer(normalizer)
+        # Ключевой индекс: основа слова → записи с фразами, где оно есть; фразы записей
+        self._phrases: list[list[frozenset]] = []
+        self._keyword_index: dict[str, set[int]] = {}
+        for i, entry in enumerate(self.entries):
+            phrases = [frozenset(self._stems(key)) for key in entry["keys"]]
+            self._phrases.append([p for p in phrases if p])
+            for phrase in phrases:
+                for stem in phrase:
+                    self._keyword_index.setdefault(stem, set()).add(i)
+        self._search = KnowledgeSearch(
+            index_dir=None,
+            entries=[{
+                "id": str(i),
+                "source_type": "fiqh_db",
+                "title": entry["title"],
+                "content": _prepare(entry["title"]),
+                "tags": [_prepare(key) for key in entry["keys"]],
+            } for i, entry in enumerate(self.entries)],
+            cache_size=0,
+            normalizer=normalizer,
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _stems(self, text: str) -> list[str]:
+        normalize = self._normalize
+        return [normalize(token) for token in tokenize(_prepare(text))]
+
+    def match(self, question: str) -> tuple[dict, float] | None:
+        """(запись, косинус) уверенного совпадения или None."""
+        stems = set(self._stems(question))
+        keyword_score = {}
+        for stem in stems:
+            for i in self._keyword_index.get(stem, ()):
+                if i in keyword_score:
+                    continue
+                # Самая длинная целиком совпавшая фраза записи
+                keyword_score[i] = max((len(p) for p in self._phrases[i] if p <= stems), default=0)
+        if not any(keyword_score.values()):
+            return None
+
+        results = self._search.search(_prepare(question), top_k=2)
+        if not results:
+            return None
+        best = results[0]
+        index, score = int(best["id"]), best["relevance_score"]
+        runner_up = results[1]["relevance_score"] if len(results) > 1 else 0.0
+        # Ключевая фраза лучшей записи не короче, чем у любой другой
+        if (keyword_score.get(index, 0) == 0
+                or keyword_score[index] < max(keyword_score.values())
+                or score < self.threshold
+                or score - runner_up < self.margin):
+            return None
+        return self.entries[index], score
+
+    def answer(self, question: str) -> str | None:
+        """Готовый ответ для чата или None (вопрос уходит в модель)."""
+        found = self.match(question)
+        with self._lock:
+            if found is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return format_answer(found[0])
+
+    def stats(self) -> dict:
+        """Счётчики для /api/status."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "threshold": self.threshold,
+                "margin": self.margin,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
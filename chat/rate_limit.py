@@ -0,0 +1,381 @@
+"""
+Ограничение частоты запросов к модели по квотам провайдера (RPM и TPM).
+
+Квоты — два ведра (token bucket): запросов в минуту и токенов в минуту.
+Вёдра пополняются непрерывно со скоростью квоты, вместимость — минутная
+квота, умноженная на burst. Стоимость запроса в токенах оценивается
+заранее (промпт — chat.history.count_tokens, ответ — средняя длина уже
+полученных, не больше max_tokens) и уточняется по usage из ответа модели
+(у потока — из последнего события, а без него — по тексту ответа);
+заголовок x-ratelimit-remaining-tokens поправляет уровень ведра, если
+оценка разошлась с учётом провайдера.
+
+Запрос сверх квоты не получает ошибку, а ждёт в ограниченной очереди
+с приоритетом: первым проходит меньший приоритет, при равном — более
+ранний дедлайн. Запрос снимается с очереди (RateLimitDropped), если
+очередь полна, если ожидаемое ожидание длиннее оставшегося до дедлайна
+или дедлайн истёк. Ответ 429 приостанавливает все запросы на Retry-After
+(без заголовка — на паузу, растущую вдвое с каждым 429 подряд), а сам
+запрос встаёт обратно в очередь с приоритетом повтора.
+
+Квоты считаются на процесс: при нескольких процессах сервера квоту
+аккаунта нужно делить между ними.
+
+RateLimiter — для потоков (UpstreamClient), AsyncRateLimiter — для цикла
+событий (AsyncUpstreamClient).
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from abc import ABC, abstractmethod
+
+import config
+from chat.history import MESSAGE_OVERHEAD, PROMPT_OVERHEAD, count_tokens
+
+# Приоритеты очереди: повтор после 429 проходит раньше новых запросов
+PRIORITY_RETRY = 0
+PRIORITY_NORMAL = 1
+
+# Ожидаемая длина ответа, пока модель не вернула usage, токенов
+INITIAL_COMPLETION_TOKENS = 512
+# Вес нового ответа в скользящем среднем длины ответа
+COMPLETION_EWMA = 0.1
+# Пауза после первого 429 без Retry-After, секунды (дальше — вдвое больше, до max_wait)
+PAUSE_BASE = 1.0
+
+
+class RateLimitDropped(Exception):
+    """Запрос снят с очереди к модели: очередь полна или квота не освободится до дедлайна."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Запрос к модели не дождался квоты ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Bucket:
+    __slots__ = ("rate", "capacity", "level")
+
+    def __init__(self, per_minute: float, burst: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(per_minute * burst, 1.0)
+        self.level = self.capacity
+
+    def refill(self, elapsed: float):
+        self.level = min(self.capacity, self.level + elapsed * self.rate)
+
+    def delay(self, cost: float, ahead: float = 0.0) -> float:
+        """Через сколько секунд в ведре наберётся ahead + cost (cost — не больше вместимости)."""
+        need = ahead + min(cost, self.capacity) - self.level
+        return need / self.rate if need > 0 else 0.0
+
+
+class _Limits(ABC):
+    """Общая часть: вёдра, очередь, пауза после 429 и счётчики (вызывается под блокировкой)."""
+
+    def __init__(self, rpm: float, tpm: float, burst: float, queue_size: int, max_wait: float, clock):
+        if burst <= 0:
+            raise ValueError(f"burst должен быть положительным: {burst!r}")
+        self.rpm = rpm
+        self.tpm = tpm
+        self.queue_size = max(int(queue_size), 0)
+        self.max_wait = max_wait
+        self._clock = clock
+        self._requests = _Bucket(rpm, burst) if rpm > 0 else None
+        self._tokens = _Bucket(tpm, burst) if tpm > 0 else None
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._pauses = 0
+        # Куча (приоритет, дедлайн, номер, стоимость, время постановки)
+        self._queue: list[tuple] = []
+        self._queued_cost = 0.0
+        self._seq = itertools.count()
+        self._completion = float(INITIAL_COMPLETION_TOKENS)
+        self.admitted = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.peak_depth = 0
+        self.dropped_full = 0
+        self.dropped_deadline = 0
+        self.throttled = 0
+
+    def deadline(self) -> float:
+        """Дедлайн нового запроса (сейчас + max_wait) — один на все его повторы."""
+        return self._clock() + self.max_wait
+
+    def estimate(self, payload: dict) -> int:
+        """Оценка стоимости запроса в токенах: промпт и ожидаемая длина ответа."""
+        if self._tokens is None:
+            return 0
+        completion = min(payload.get("max_tokens") or self._completion, self._completion)
+        return int(_prompt_tokens(payload) + completion)
+
+    def stream_usage(self, payload: dict, text: str, complete: bool) -> dict:
+        """
+        usage потока, в котором модель его не прислала: промпт по оценке,
+        ответ — по полученному тексту. Оборванный поток (complete=False)
+        уточняет только уровень ведра, не среднюю длину ответа.
+        """
+        prompt = _prompt_tokens(payload)
+        completion = count_tokens(text)
+        usage = {"prompt_tokens": prompt, "total_tokens": prompt + completion}
+        if complete:
+            usage["completion_tokens"] = completion
+        return usage
+
+    def _refill(self) -> float:
+        now = self._clock()
+        elapsed = now - self._updated
+        self._updated = now
+        for bucket in (self._requests, self._tokens):
+            if bucket is not None:
+                bucket.refill(elapsed)
+        return now
+
+    def _delay(self, cost: float, now: float, ahead_requests: float = 0.0, ahead_tokens: float = 0.0) -> float:
+        """Через сколько секунд пройдёт запрос стоимостью cost после ahead_* уже ждущих."""
+        delay = max(self._paused_until - now, 0.0)
+        if self._requests is not None:
+            delay = max(delay, self._requests.delay(1, ahead_requests))
+        if self._tokens is not None:
+            delay = max(delay, self._tokens.delay(cost, ahead_tokens))
+        return delay
+
+    def _enter(self, cost: float, priority: int, deadline: float | None) -> tuple | None:
+        """Запрос в очередь; None — квота есть и очередь пуста (прошёл сразу)."""
+        now = self._refill()
+        if deadline is None:
+            deadline = now + self.max_wait
+        if not self._queue and self._delay(cost, now) <= 0:
+            self._admit(cost, 0.0)
+            return None
+        if len(self._queue) >= self.queue_size:
+            self.dropped_full += 1
+            raise RateLimitDropped("очередь полна", self._delay(cost, now, len(self._queue), self._queued_cost))
+        expected = self._delay(cost, now, len(self._queue), self._queued_cost)
+        if expected > deadline - now:
+            self.dropped_deadline += 1
+            raise RateLimitDropped("ожидание дольше дедлайна", expected)
+        entry = (priority, deadline, next(self._seq), cost, now)
+        heapq.heappush(self._queue, entry)
+        self._queued_cost += cost
+        self.peak_depth = max(self.peak_depth, len(self._queue))
+        return entry
+
+    def _poll(self, entry: tuple) -> float | None:
+        """None — запрос прошёл квоту; иначе сколько секунд ждать до следующей проверки."""
+        _, deadline, _, cost, enqueued = entry
+        now = self._refill()
+        remaining = deadline - now
+        if self._queue[0] is entry:
+            delay = self._delay(cost, now)
+            if delay <= 0:
+                self._remove(entry)
+                self._admit(cost, now - enqueued)
+                return None
+            if delay > remaining:
+                self._remove(entry)
+                self.dropped_deadline += 1
+                raise RateLimitDropped("ожидание дольше дедлайна", delay)
+            return delay
+        if remaining <= 0:
+            self._remove(entry)
+            self.dropped_deadline += 1
+            raise RateLimitDropped("истёк дедлайн", self._delay(cost, now, len(self._queue), self._queued_cost))
+        return remaining
+
+    def _admit(self, cost: float, waited: float):
+        if self._requests is not None:
+            self._requests.level -= 1
+        if self._tokens is not None:
+            self._tokens.level -= cost
+        self.admitted += 1
+        if waited > 0:
+            self.waited += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def _remove(self, entry: tuple):
+        """Убрать запрос из очереди (если он там) и разбудить остальных — сменилась голова."""
+        if entry in self._queue:
+            self._queue.remove(entry)
+            heapq.heapify(self._queue)
+            self._queued_cost -= entry[3]
+            if not self._queue:
+                self._queued_cost = 0.0
+        self._notify()
+
+    def _observe(self, status: int, headers: dict):
+        now = self._refill()
+        remaining = headers.get("x-ratelimit-remaining-tokens")
+        if remaining is not None and self._tokens is not None:
+            try:
+                self._tokens.level = min(self._tokens.level, float(remaining))
+            except ValueError:
+                pass
+        if status != 429:
+            self._pauses = 0
+            return
+        self.throttled += 1
+        try:
+            pause = float(headers.get("retry-after", ""))
+        except ValueError:
+            pause = min(PAUSE_BASE * 2 ** self._pauses, self.max_wait)
+            self._pauses += 1
+        self._paused_until = max(self._paused_until, now + pause)
+        # Провайдер считает квоту исчерпанной — вёдра не дают пройти до конца паузы
+        for bucket in (self._requests, self._tokens):
+            if bucket is not None:
+                bucket.level = min(bucket.level, 0.0)
+        self._notify()
+
+    def _settle(self, cost: float, usage: dict | None):
+        if not usage or "total_tokens" not in usage:
+            return
+        if "completion_tokens" in usage:
+            self._completion += COMPLETION_EWMA * (float(usage["completion_tokens"]) - self._completion)
+        if self._tokens is None:
+            return
+        self._refill()
+        # Оценка была завышена — токены возвращаются в ведро, занижена — доплачиваются
+        self._tokens.level = min(self._tokens.capacity, self._tokens.level + cost - float(usage["total_tokens"]))
+        self._notify()
+
+    @abstractmethod
+    def _notify(self):
+        """Разбудить ожидающих: очередь или состояние вёдер изменились."""
+
+    def _stats(self) -> dict:
+        now = self._refill()
+        return {
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "requests_available": round(self._requests.level, 1) if self._requests is not None else None,
+            "tokens_available": round(self._tokens.level) if self._tokens is not None else None,
+            "queue_depth": len(self._queue),
+            "peak_queue_depth": self.peak_depth,
+            "queue_size": self.queue_size,
+            "max_wait_seconds": self.max_wait,
+            "admitted": self.admitted,
+            "waited": self.waited,
+            "avg_wait_ms": round(self.wait_seconds / self.waited * 1000, 1) if self.waited else 0.0,
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 1),
+            "dropped_queue_full": self.dropped_full,
+            "dropped_deadline": self.dropped_deadline,
+            "throttled_429": self.throttled,
+            "paused_seconds": round(max(self._paused_until - now, 0.0), 2),
+            "expected_completion_tokens": round(self._completion),
+        }
+
+
+def _prompt_tokens(payload: dict) -> int:
+    """Оценка промпта запроса в токенах."""
+    return PROMPT_OVERHEAD + sum(
+        count_tokens(str(m.get("content", ""))) + MESSAGE_OVERHEAD for m in payload.get("messages", [])
+    )
+
+
+class RateLimiter(_Limits):
+    """Ограничитель для потоков: ожидание квоты блокирует поток."""
+
+    def __init__(self, rpm: float = config.UPSTREAM_RPM,
+                 tpm: float = config.UPSTREAM_TPM,
+                 burst: float = config.UPSTREAM_RATE_BURST,
+                 queue_size: int = config.UPSTREAM_QUEUE_SIZE,
+                 max_wait: float = config.UPSTREAM_QUEUE_TIMEOUT,
+                 clock=time.monotonic):
+        """
+        Args:
+            rpm: квота запросов в минуту (0 — без ограничения)
+            tpm: квота токенов (промпт + ответ) в минуту (0 — без ограничения)
+            burst: доля минутной квоты, доступная сразу (вместимость вёдер)
+            queue_size: максимум запросов, ждущих квоты
+            max_wait: сколько запрос может ждать квоты (вместе с повторами после 429), секунды
+        """
+        super().__init__(rpm, tpm, burst, queue_size, max_wait, clock)
+        self._cond = threading.Condition()
+
+    def acquire(self, cost: float, priority: int = PRIORITY_NORMAL, deadline: float | None = None):
+        """
+        Дождаться квоты на запрос стоимостью cost токенов.
+
+        Raises:
+            RateLimitDropped: очередь полна или квота не освободится до дедлайна
+        """
+        with self._cond:
+            entry = self._enter(cost, priority, deadline)
+            if entry is None:
+                return
+            try:
+                while (timeout := self._poll(entry)) is not None:
+                    self._cond.wait(timeout)
+            except BaseException:
+                self._remove(entry)
+                raise
+
+    def observe(self, status: int, headers: dict):
+        """Учесть ответ модели: 429 с Retry-After — пауза для всех, остаток квоты из заголовков."""
+        with self._cond:
+            self._observe(status, headers)
+
+    def settle(self, cost: float, usage: dict | None):
+        """Уточнить стоимость принятого запроса по usage ответа."""
+        with self._cond:
+            self._settle(cost, usage)
+
+    def _notify(self):
+        self._cond.notify_all()
+
+    def stats(self) -> dict:
+        """Очередь, ожидание и отказы для /api/status."""
+        with self._cond:
+            return self._stats()
+
+
+class AsyncRateLimiter(_Limits):
+    """Ограничитель для цикла событий: ожидание квоты не блокирует цикл."""
+
+    def __init__(self, rpm: float = config.UPSTREAM_RPM,
+                 tpm: float = config.UPSTREAM_TPM,
+                 burst: float = config.UPSTREAM_RATE_BURST,
+                 queue_size: int = config.UPSTREAM_QUEUE_SIZE,
+                 max_wait: float = config.UPSTREAM_QUEUE_TIMEOUT,
+                 clock=time.monotonic):
+        super().__init__(rpm, tpm, burst, queue_size, max_wait, clock)
+        # Событие заменяется новым при каждом уведомлении — ждущие берут текущее
+        self._changed = asyncio.Event()
+
+    async def acquire(self, cost: float, priority: int = PRIORITY_NORMAL, deadline: float | None = None):
+        """Как RateLimiter.acquire; отмена ожидающей задачи убирает запрос из очереди."""
+        entry = self._enter(cost, priority, deadline)
+        if entry is None:
+            return
+        try:
+            while (timeout := self._poll(entry)) is not None:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            self._remove(entry)
+            raise
+
+    def observe(self, status: int, headers: dict):
+        """Учесть ответ модели: 429 с Retry-After — пауза для всех, остаток квоты из заголовков."""
+        self._observe(status, headers)
+
+    def settle(self, cost: float, usage: dict | None):
+        """Уточнить стоимость принятого запроса по usage ответа."""
+        self._settle(cost, usage)
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def stats(self) -> dict:
+        """Очередь, ожидание и отказы для /api/status."""
+        return self._stats()
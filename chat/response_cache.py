@@ -0,0 +1,207 @@
+"""
+Кэш ответов модели для повторяющихся вопросов /api/chat.
+
+Ключ — контекст (версия SYSTEM_PROMPT, модель, отпечаток последних ходов
+истории) и нормализованный вопрос (нижний регистр, ё → е, токены без
+пунктуации). Хранилище — QueryCache (LRU + TTL), как у кэша поиска.
+
+Необязательный поиск почти-дубликатов (similarity > 0) сравнивает вопрос
+с вопросами того же контекста по косинусу TF-IDF-векторов: токены
+нормализуются так же, как в KnowledgeSearch (utils.stemmer, униграммы
+и биграммы), IDF считается по закэшированным вопросам контекста.
+Кандидаты берутся из posting lists терминов вопроса.
+"""
+
+import hashlib
+import json
+import math
+import threading
+import time
+from collections import Counter
+
+import config
+from knowledge_base.query_cache import QueryCache
+from knowledge_base.search import analyze_terms, tokenize
+from utils.stemmer import get_normalizer
+
+
+def normalize_question(text: str) -> str:
+    """Вопрос для ключа: токены в нижнем регистре (ё → е) через пробел."""
+    return " ".join(tokenize(text.lower().replace("ё", "е")))
+
+
+def prompt_version(system_prompt: str) -> str:
+    """Короткий отпечаток системного промпта (меняется при любой правке)."""
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:12]
+
+
+def history_fingerprint(history: list, turns: int) -> str:
+    """Отпечаток последних turns ходов истории (роль + нормализованный текст)."""
+    if turns <= 0 or not history:
+        return ""
+    recent = [
+        ("user" if msg.get("role") == "user" else "assistant", normalize_question(msg.get("text", "")))
+        for msg in history[-turns:]
+    ]
+    payload = json.dumps(recent, ensure_ascii=False).encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=8).hexdigest()
+
+
+class ResponseCache:
+    """Потокобезопасный кэш ответов: точное совпадение и почти-дубликаты."""
+
+    def __init__(self, maxsize: int = config.CHAT_CACHE_SIZE,
+                 ttl: float = config.CHAT_CACHE_TTL,
+                 similarity: float = config.CHAT_CACHE_SIMILARITY,
+                 history_turns: int = config.CHAT_CACHE_HISTORY_TURNS,
+                 normalizer: str = config.TEXT_NORMALIZER,
+                 clock=time.monotonic):
+        """
+        Args:
+            maxsize: максимум ответов в кэше
+            ttl: время жизни ответа, секунды (0 — без TTL)
+            similarity: порог косинуса для почти-дубликатов (0 — только точное совпадение)
+            history_turns: сколько последних ходов истории входит в ключ
+            normalizer: нормализация словоформ для почти-дубликатов (см. utils.stemmer)
+        """
+        self.similarity = similarity
+        self.history_turns = history_turns
+        self._normalize = get_normalizer(normalizer)
+        self._store = QueryCache(maxsize, ttl, clock, on_evict=self._forget)
+        # Все обращения к _store идут под этой блокировкой, поэтому _forget
+        # (вызывается из _store) меняет индекс почти-дубликатов без своей блокировки
+        self._lock = threading.Lock()
+        # ключ → счётчик терминов вопроса; контекст → термин → ключи; контекст → df терминов
+        self._terms: dict[tuple, Counter] = {}
+        self._postings: dict[tuple, dict[str, set]] = {}
+        self._df: dict[tuple, Counter] = {}
+        # контекст → число проиндексированных вопросов
+        self._docs: Counter = Counter()
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    def make_key(self, prompt: str, model: str, question: str, history: list) -> tuple:
+        """Ключ ответа: (контекст, нормализованный вопрос)."""
+        context = (prompt_version(prompt), model, history_fingerprint(history, self.history_turns))
+        return context, normalize_question(question)
+
+    def get(self, key: tuple) -> tuple[str, str] | None:
+        """(ответ, "exact" | "similar") или None при промахе."""
+        with self._lock:
+            answer = self._store.get(key)
+            if answer is not None:
+                self.exact_hits += 1
+                return answer, "exact"
+            if self.similarity > 0:
+                similar = self._most_similar(key)
+                if similar is not None:
+                    answer = self._store.get(similar)
+                    if answer is not None:
+                        self.similar_hits += 1
+                        return answer, "similar"
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple, answer: str):
+        """Сохранить ответ модели на вопрос."""
+        with self._lock:
+            self._store.put(key, answer)
+            if self.similarity > 0 and self._store.maxsize > 0 and key not in self._terms:
+                self._index(key)
+
+    def clear(self):
+        with self._lock:
+            self._store.clear()
+            self._terms.clear()
+            self._postings.clear()
+            self._df.clear()
+            self._docs.clear()
+
+    def _analyze(self, question: str) -> Counter:
+        normalize = self._normalize
+        return Counter(analyze_terms([normalize(token) for token in question.split()]))
+
+    def _index(self, key: tuple):
+        context, question = key
+        terms = self._analyze(question)
+        self._terms[key] = terms
+        postings = self._postings.setdefault(context, {})
+        df = self._df.setdefault(context, Counter())
+        for term in terms:
+            postings.setdefault(term, set()).add(key)
+            df[term] += 1
+        self._docs[context] += 1
+
+    def _forget(self, key: tuple):
+        """Убрать вытесненный ответ из индекса почти-дубликатов."""
+        terms = self._terms.pop(key, None)
+        if terms is None:
+            return
+        context = key[0]
+        postings, df = self._postings[context], self._df[context]
+        for term in terms:
+            keys = postings[term]
+            keys.discard(key)
+            if not keys:
+                del postings[term]
+            df[term] -= 1
+            if df[term] <= 0:
+                del df[term]
+        self._docs[context] -= 1
+        if self._docs[context] <= 0:
+            del self._postings[context], self._df[context], self._docs[context]
+
+    def _most_similar(self, key: tuple) -> tuple | None:
+        """Самый похожий закэшированный вопрос контекста с косинусом не ниже порога."""
+        context, question = key
+        postings = self._postings.get(context)
+        if not postings:
+            return None
+        terms = self._analyze(question)
+        candidates = set()
+        for term in terms:
+            candidates.update(postings.get(term, ()))
+        if not candidates:
+            return None
+
+        # Сглаженный IDF, как в TfidfVectorizer: ln((1 + n) / (1 + df)) + 1
+        df = self._df[context]
+        n = self._docs[context]
+        idf = {}
+
+        def vector(counts: Counter) -> dict:
+            weights = {}
+            for term, tf in counts.items():
+                if term not in idf:
+                    idf[term] = math.log((1 + n) / (1 + df.get(term, 0))) + 1
+                weights[term] = tf * idf[term]
+            norm = math.sqrt(sum(w * w for w in weights.values()))
+            return {term: w / norm for term, w in weights.items()}
+
+        query = vector(terms)
+        best, best_score = None, self.similarity
+        for candidate in candidates:
+            doc = vector(self._terms[candidate])
+            score = sum(w * doc.get(term, 0.0) for term, w in query.items())
+            if score >= best_score:
+                best, best_score = candidate, score
+        return best
+
+    def stats(self) -> dict:
+        """Счётчики кэша для /api/status."""
+        with self._lock:
+            store = self._store.stats()
+            lookups = self.exact_hits + self.similar_hits + self.misses
+            return {
+                "size": store["size"],
+                "maxsize": store["maxsize"],
+                "ttl_seconds": store["ttl_seconds"],
+                "similarity_threshold": self.similarity,
+                "exact_hits": self.exact_hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.exact_hits + self.similar_hits) / lookups, 4) if lookups else 0.0,
+                "evictions": store["evictions"],
+                "expirations": store["expirations"],
+            }
@@ -0,0 +1,270 @@
+"""
+Серверное хранилище истории чатов по session_id.
+
+Идентификаторы сессий выдаёт сервер (create: secrets.token_urlsafe,
+256 бит) — подобрать чужой нельзя, а незнакомые идентификаторы от
+клиента не принимаются (exists). Клиент присылает только новый вопрос,
+история берётся отсюда. В памяти —
+LRU с TTL (от последнего обращения), ограничениями на число сессий
+и объём текста. Сессии, вытесненные по LRU или лимиту памяти, при
+заданном db_path сбрасываются в SQLite и поднимаются оттуда при
+следующем обращении; истёкшие по TTL удаляются и с диска.
+
+Время — настенное (time.time), чтобы TTL сессий на диске переживал
+перезапуск сервера.
+"""
+
+import json
+import secrets
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import config
+
+# Оценка памяти на сообщение сверх самой строки (словарь, ключи, список), байт
+MESSAGE_OVERHEAD_BYTES = 240
+# Каждые столько сбросов на диск удаляются истёкшие там сессии
+PURGE_EVERY = 1000
+# Случайных байт в идентификаторе сессии
+SESSION_ID_BYTES = 32
+
+
+def _message_bytes(message: dict) -> int:
+    return sys.getsizeof(message["text"]) + MESSAGE_OVERHEAD_BYTES
+
+
+def _clean(messages: list) -> list[dict]:
+    """Сообщения в виде {role, text}: роль user или assistant, текст — строка."""
+    return [
+        {"role": "user" if msg.get("role") == "user" else "assistant", "text": str(msg.get("text", ""))}
+        for msg in messages
+        if isinstance(msg, dict)
+    ]
+
+
+class _Session:
+    __slots__ = ("messages", "bytes", "accessed")
+
+    def __init__(self, messages: list[dict], accessed: float):
+        self.messages = messages
+        self.bytes = sum(_message_bytes(m) for m in messages)
+        self.accessed = accessed
+
+
+class SessionStore:
+    """Потокобезопасное хранилище историй с LRU, TTL, лимитом памяти и сбросом на диск."""
+
+    def __init__(self, max_sessions: int = config.CHAT_SESSION_MAX,
+                 ttl: float = config.CHAT_SESSION_TTL,
+                 max_bytes: int = config.CHAT_SESSION_MAX_MB * 1024 * 1024,
+                 max_messages: int = config.CHAT_SESSION_MESSAGES,
+                 db_path: str | None = config.CHAT_SESSION_DB,
+                 clock=time.time):
+        """
+        Args:
+            max_sessions: максимум сессий в памяти
+            ttl: время жизни сессии без обращений, секунды (0 — без TTL)
+            max_bytes: лимит памяти на истории (оценка), байт
+            max_messages: максимум сообщений в истории сессии
+            db_path: файл SQLite для вытесненных сессий (None или "" — не сохранять)
+            clock: источник времени (настенного — для сессий на диске)
+        """
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_messages = max_messages
+        self._clock = clock
+        self._sessions: OrderedDict[str, _Session] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, messages TEXT NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._purge_disk()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.spilled = 0
+        self.restored = 0
+
+    def create(self, messages: list = ()) -> str:
+        """Новая сессия с историей messages; возвращает её идентификатор."""
+        session_id = secrets.token_urlsafe(SESSION_ID_BYTES)
+        with self._lock:
+            self._store(session_id, _Session([], self._clock()), _clean(messages))
+        return session_id
+
+    def exists(self, session_id: str) -> bool:
+        """Сессия выдана этим сервером и ещё не истекла."""
+        with self._lock:
+            return self._get(session_id) is not None
+
+    def history(self, session_id: str) -> list[dict]:
+        """История сессии (копия; пустая, если сессии нет)."""
+        with self._lock:
+            session = self._get(session_id)
+            return list(session.messages) if session is not None else []
+
+    def replace(self, session_id: str, messages: list) -> int:
+        """Заменить историю сессии присланной клиентом; возвращает число сообщений."""
+        with self._lock:
+            self._forget(session_id)
+            return self._store(session_id, _Session([], self._clock()), _clean(messages))
+
+    def append(self, session_id: str, messages: list) -> int:
+        """Дописать сообщения в историю сессии; возвращает число сообщений."""
+        with self._lock:
+            session = self._get(session_id) or _Session([], self._clock())
+            return self._store(session_id, session, _clean(messages))
+
+    def delete(self, session_id: str):
+        """Удалить историю сессии из памяти и с диска."""
+        with self._lock:
+            self._forget(session_id)
+
+    def close(self):
+        """Сбросить сессии из памяти на диск (если он задан) и закрыть базу."""
+        with self._lock:
+            if self._db is None:
+                return
+            while self._sessions:
+                session_id, session = self._sessions.popitem(last=False)
+                self._bytes -= session.bytes
+                self._spill(session_id, session)
+            self._db.commit()
+            self._db.close()
+            self._db = None
+
+    # ─── Внутреннее (под self._lock) ────────────────────────────────
+
+    def _get(self, session_id: str) -> _Session | None:
+        now = self._clock()
+        session = self._sessions.get(session_id)
+        if session is not None:
+            if self._expired(session, now):
+                self._drop(session_id)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            session.accessed = now
+            self._sessions.move_to_end(session_id)
+            self.hits += 1
+            return session
+
+        session = self._restore(session_id, now)
+        if session is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._sessions[session_id] = session
+        self._bytes += session.bytes
+        self._evict(keep=session_id)
+        return session
+
+    def _store(self, session_id: str, session: _Session, messages: list[dict]) -> int:
+        if session_id in self._sessions:
+            self._bytes -= session.bytes
+        session.messages.extend(messages)
+        if len(session.messages) > self.max_messages:
+            # Обрезается сразу четверть окна: начало истории (и закэшированное
+            # краткое содержание, см. chat.history) меняется раз в несколько ходов
+            keep = max(self.max_messages - self.max_messages // 4, 1)
+            del session.messages[:len(session.messages) - keep]
+        session.bytes = sum(_message_bytes(m) for m in session.messages)
+        session.accessed = self._clock()
+        self._sessions[session_id] = session
+        self._sessions.move_to_end(session_id)
+        self._bytes += session.bytes
+        self._evict(keep=session_id)
+        return len(session.messages)
+
+    def _evict(self, keep: str | None = None):
+        """Истёкшие — удалить; сверх лимитов — вытеснить самые давние (на диск, если задан)."""
+        now = self._clock()
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if self._expired(session, now):
+                self._drop(session_id)
+                self.expirations += 1
+                continue
+            over = len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes
+            if not over or session_id == keep:
+                return
+            self._drop(session_id)
+            self.evictions += 1
+            if self._db is not None:
+                self._spill(session_id, session)
+
+    def _drop(self, session_id: str):
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._bytes -= session.bytes
+
+    def _forget(self, session_id: str):
+        self._drop(session_id)
+        if self._db is not None:
+            self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self._db.commit()
+
+    def _expired(self, session: _Session, now: float) -> bool:
+        return self.ttl > 0 and now - session.accessed > self.ttl
+
+    def _spill(self, session_id: str, session: _Session):
+        self._db.execute(
+            "INSERT OR REPLACE INTO sessions (id, messages, accessed) VALUES (?, ?, ?)",
+            (session_id, json.dumps(session.messages, ensure_ascii=False), session.accessed),
+        )
+        self.spilled += 1
+        if self.spilled % PURGE_EVERY == 0:
+            self._purge_disk()
+        self._db.commit()
+
+    def _restore(self, session_id: str, now: float) -> _Session | None:
+        if self._db is None:
+            return None
+        row = self._db.execute("SELECT messages, accessed FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        self._db.commit()
+        session = _Session(json.loads(row[0]), row[1])
+        if self._expired(session, now):
+            self.expirations += 1
+            return None
+        session.accessed = now
+        self.restored += 1
+        return session
+
+    def _purge_disk(self):
+        if self.ttl > 0:
+            self._db.execute("DELETE FROM sessions WHERE accessed < ?", (self._clock() - self.ttl,))
+            self._db.commit()
+
+    def stats(self) -> dict:
+        """Заполненность и счётчики для /api/status."""
+        with self._lock:
+            on_disk = None
+            if self._db is not None:
+                on_disk = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "on_disk": on_disk,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "spilled": self.spilled,
+                "restored": self.restored,
+            }
@@ -0,0 +1,433 @@
+"""
+HTTP-клиент к модели (Groq, OpenAI-совместимый API) без внешних зависимостей.
+
+Вместо нового соединения (и TLS-рукопожатия) на каждый запрос клиент
+держит пул keep-alive соединений HTTP/1.1 (http.client) к одному хосту:
+соединение после ответа возвращается в пул и переиспользуется следующим
+запросом. Размер пула ограничивает число одновременных соединений,
+таймауты установки соединения и чтения ответа задаются раздельно.
+
+Ответы 429/5xx и сбои до отправки запроса (установка соединения —
+ConnectTimeout, запись запроса) повторяются ограниченное число раз
+с экспоненциальной паузой и случайным разбросом (full jitter); заголовок
+Retry-After учитывается, но пауза не превышает потолка. Сбой после
+отправки запроса (таймаут или обрыв при ожидании и чтении ответа)
+не повторяется: модель могла начать генерацию, повтор удвоил бы нагрузку
+и стоимость. Исключение — переиспользованное соединение, которое сервер
+закрыл, пока оно простаивало (обрыв без единого байта ответа): запрос
+один раз отправляется по новому соединению.
+
+С ограничителем частоты (chat.rate_limit) каждая попытка сначала ждёт
+квоты, а ответ 429 не тратит повторы max_retries: паузу Retry-After
+выдерживает ограничитель, и запрос ждёт в его очереди — число таких
+повторов ограничено только дедлайном ограничителя (max_wait), после
+которого запрос снимается с RateLimitDropped.
+
+Потоковые ответы (stream: true) читаются событиями SSE через EventStream:
+соединение занято до конца потока и затем возвращается в пул.
+"""
+
+import http.client
+import json
+import random
+import socket
+import ssl
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import config
+from chat.rate_limit import PRIORITY_NORMAL, PRIORITY_RETRY
+
+# Статусы ответа, при которых запрос повторяется
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Простаивающее дольше соединение закрывается (сервер мог уже его закрыть)
+IDLE_TIMEOUT = 30.0
+
+# Базовая пауза перед первым повтором, секунды
+BACKOFF_BASE = 0.25
+
+# Ошибки переиспользованного соединения, закрытого сервером между запросами
+_STALE_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+
+def backoff_delay(attempt: int, backoff_max: float, retry_after: str | None = None) -> float:
+    """Пауза перед повтором: full jitter, не меньше Retry-After, не больше потолка."""
+    delay = random.uniform(0, min(backoff_max, BACKOFF_BASE * 2 ** attempt))
+    if retry_after:
+        try:
+            delay = max(delay, float(retry_after))
+        except ValueError:
+            pass
+    return min(delay, backoff_max)
+
+
+# Маркер конца потока (data: [DONE])
+STREAM_DONE = object()
+
+
+def parse_event_line(line: bytes):
+    """Событие строки SSE: dict, STREAM_DONE или None (не строка data:)."""
+    line = line.strip()
+    if not line.startswith(b"data:"):
+        return None
+    data = line[5:].strip()
+    if data == b"[DONE]":
+        return STREAM_DONE
+    return json.loads(data.decode("utf-8"))
+
+
+def parse_events(lines):
+    """JSON-события SSE из строк потокового ответа (до data: [DONE])."""
+    for line in lines:
+        event = parse_event_line(line)
+        if event is STREAM_DONE:
+            return
+        if event is not None:
+            yield event
+
+
+def event_delta(event: dict) -> str:
+    """Фрагмент текста события потока (choices[0].delta.content)."""
+    choices = event.get("choices") or [{}]
+    return (choices[0].get("delta") or {}).get("content") or ""
+
+
+def event_usage(event: dict) -> dict | None:
+    """usage из события потока (последнего): usage или x_groq.usage."""
+    return event.get("usage") or (event.get("x_groq") or {}).get("usage")
+
+
+class UpstreamError(Exception):
+    """Модель ответила статусом не 2xx (после всех повторов)."""
+
+    def __init__(self, status: int, body: str, headers: dict | None = None):
+        super().__init__(f"HTTP {status}: {body[:200]}")
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+
+
+class ConnectTimeout(TimeoutError):
+    """Не удалось получить или установить соединение: запрос не отправлен, повтор безопасен."""
+
+
+class ConnectionPool:
+    """Пул keep-alive соединений к одному хосту."""
+
+    def __init__(self, url: str, size: int, connect_timeout: float, read_timeout: float):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Неподдерживаемая схема URL: {url!r}")
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.size = max(int(size), 1)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._ssl_context = ssl.create_default_context() if self.scheme == "https" else None
+        # (соединение, время возврата в пул); последнее возвращённое — самое «тёплое»
+        self._idle: deque = deque()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self.opened = 0
+
+    def acquire(self) -> tuple[http.client.HTTPConnection, bool]:
+        """Соединение из пула (или новое) и признак переиспользования."""
+        if not self._slots.acquire(timeout=self.read_timeout):
+            raise ConnectTimeout("Нет свободных соединений к модели")
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                conn, released = self._idle.pop()
+                if now - released < IDLE_TIMEOUT:
+                    return conn, True
+                conn.close()
+        try:
+            return self._connect(), False
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn: http.client.HTTPConnection, reusable: bool = True):
+        """Вернуть соединение в пул (или закрыть, если его нельзя переиспользовать)."""
+        if reusable:
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+        else:
+            conn.close()
+        self._slots.release()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self.scheme == "https":
+            conn = http.client.HTTPSConnection(
+                self.host, self.port, timeout=self.connect_timeout, context=self._ssl_context
+            )
+        else:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.connect_timeout)
+        try:
+            conn.connect()
+        except TimeoutError as e:
+            conn.close()
+            raise ConnectTimeout(f"Таймаут соединения с {self.host}:{self.port}") from e
+        conn.sock.settimeout(self.read_timeout)
+        # Запрос уходит одним пакетом, но мелкие записи не должны ждать ACK (как в urllib3)
+        conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self._lock:
+            self.opened += 1
+        return conn
+
+    def close(self):
+        """Закрыть простаивающие соединения."""
+        with self._lock:
+            while self._idle:
+                self._idle.pop()[0].close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            idle = len(self._idle)
+        return {"pool_size": self.size, "idle_connections": idle, "connections_opened": self.opened}
+
+
+class UpstreamClient:
+    """POST-запросы JSON к эндпоинту модели через пул соединений с повторами."""
+
+    def __init__(self, url: str = config.GROQ_URL,
+                 pool_size: int = config.UPSTREAM_POOL_SIZE,
+                 connect_timeout: float = config.UPSTREAM_CONNECT_TIMEOUT,
+                 read_timeout: float = config.UPSTREAM_READ_TIMEOUT,
+                 max_retries: int = config.UPSTREAM_MAX_RETRIES,
+                 backoff_max: float = config.UPSTREAM_BACKOFF_MAX,
+                 limiter=None):
+        """
+        Args:
+            url: адрес эндпоинта (chat/completions)
+            pool_size: максимум одновременных соединений
+            connect_timeout: таймаут установки соединения, секунды
+            read_timeout: таймаут ожидания ответа, секунды
+            max_retries: повторов при 429/5xx и сбоях соединения (0 — без повторов)
+            backoff_max: потолок паузы между повторами, секунды
+            limiter: ограничитель частоты по квотам (chat.rate_limit.RateLimiter; None — без него)
+        """
+        parts = urlsplit(url)
+        self.url = url
+        self.path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        self.pool = ConnectionPool(url, pool_size, connect_timeout, read_timeout)
+        self.max_retries = max(int(max_retries), 0)
+        self.backoff_max = backoff_max
+        self.limiter = limiter
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._retries = 0
+
+    def post_json(self, payload: dict, headers: dict | None = None) -> dict:
+        """
+        Отправить payload и вернуть разобранный JSON-ответ.
+
+        Raises:
+            UpstreamError: ответ со статусом не 2xx после всех повторов
+            RateLimitDropped: квота не освободилась до дедлайна (с ограничителем)
+            OSError: сбой соединения или таймаут
+        """
+        body = json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json", **(headers or {})}
+        cost = self.limiter.estimate(payload) if self.limiter is not None else 0
+        status, response_headers, data = self._perform("POST", body, headers, cost=cost)
+        if not 200 <= status < 300:
+            raise UpstreamError(status, data.decode("utf-8", errors="ignore"), response_headers)
+        result = json.loads(data.decode("utf-8"))
+        if self.limiter is not None:
+            self.limiter.settle(cost, result.get("usage"))
+        return result
+
+    def stream_json(self, payload: dict, headers: dict | None = None) -> "EventStream":
+        """
+        Отправить payload и вернуть поток событий SSE ответа (stream: true).
+
+        Повторы возможны только до начала ответа: ошибки 429/5xx приходят
+        статусом до первого события.
+
+        Raises:
+            UpstreamError: ответ со статусом не 2xx после всех повторов
+            RateLimitDropped: квота не освободилась до дедлайна (с ограничителем)
+            OSError: сбой соединения или таймаут
+        """
+        body = json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json", "Accept": "text/event-stream", **(headers or {})}
+        cost = self.limiter.estimate(payload) if self.limiter is not None else 0
+        status, response_headers, result = self._perform("POST", body, headers, stream=True, cost=cost)
+        if not 200 <= status < 300:
+            raise UpstreamError(status, result.decode("utf-8", errors="ignore"), response_headers)
+        if self.limiter is not None:
+            limiter = self.limiter
+
+            def settle(usage, text, complete):
+                limiter.settle(cost, usage or limiter.stream_usage(payload, text, complete))
+
+            result.on_finish = settle
+        return result
+
+    def request(self, method: str, body: bytes, headers: dict) -> tuple[int, dict, bytes]:
+        """(статус, заголовки, тело) с повторами при 429/5xx и сбоях соединения."""
+        return self._perform(method, body, headers)
+
+    def _perform(self, method: str, body: bytes, headers: dict, stream: bool = False,
+                 cost: float = 0) -> tuple[int, dict, object]:
+        """
+        Запрос с повторами. При stream=True успешный ответ не читается,
+        а возвращается как EventStream (соединение занято до конца потока).
+        cost — оценка стоимости запроса в токенах для ограничителя.
+
+        Сбои повторяются, только если запрос не был отправлен; 429
+        с ограничителем повторяется до его дедлайна, не тратя max_retries.
+        """
+        with self._lock:
+            self._requests += 1
+        attempt = 0
+        priority = PRIORITY_NORMAL
+        deadline = self.limiter.deadline() if self.limiter is not None else None
+        while True:
+            if self.limiter is not None:
+                self.limiter.acquire(cost, priority, deadline)
+            sent = []
+            try:
+                conn, response = self._send(method, body, headers, sent)
+                status = response.status
+                response_headers = {name.lower(): value for name, value in response.getheaders()}
+                if self.limiter is not None:
+                    self.limiter.observe(status, response_headers)
+                if stream and 200 <= status < 300:
+                    return status, response_headers, EventStream(self.pool, conn, response)
+                data = _read(self.pool, conn, response)
+            except (OSError, http.client.HTTPException):
+                # После отправки (таймаут или обрыв) модель могла начать генерацию —
+                # повтор удвоил бы нагрузку и стоимость; до отправки повтор безопасен
+                if sent or attempt >= self.max_retries:
+                    raise
+                delay = backoff_delay(attempt, self.backoff_max)
+            else:
+                if status == 429 and self.limiter is not None:
+                    # Паузу выдерживает ограничитель; повтор ждёт в очереди впереди новых
+                    # запросов и не тратит max_retries — его ограничивает дедлайн ограничителя
+                    priority = PRIORITY_RETRY
+                    with self._lock:
+                        self._retries += 1
+                    continue
+                if status not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return status, response_headers, data
+                delay = backoff_delay(attempt, self.backoff_max, response_headers.get("retry-after"))
+            attempt += 1
+            with self._lock:
+                self._retries += 1
+            time.sleep(delay)
+
+    def _send(self, method: str, body: bytes, headers: dict,
+              sent: list) -> tuple[http.client.HTTPConnection, http.client.HTTPResponse]:
+        """
+        Отправить запрос и дождаться статуса; тело ответа не читается.
+
+        В sent добавляется отметка, как только запрос целиком записан
+        в соединение, по которому ждётся ответ.
+        """
+        conn, reused = self.pool.acquire()
+        try:
+            try:
+                response = self._exchange(conn, method, body, headers, sent)
+            except _STALE_ERRORS:
+                if not reused:
+                    raise
+                # Сервер закрыл простаивавшее соединение — один раз пробуем новое
+                sent.clear()
+                conn.close()
+                conn = self.pool._connect()
+                response = self._exchange(conn, method, body, headers, sent)
+        except BaseException:
+            self.pool.release(conn, reusable=False)
+            raise
+        return conn, response
+
+    def _exchange(self, conn, method: str, body: bytes, headers: dict, sent: list) -> http.client.HTTPResponse:
+        conn.request(method, self.path, body=body, headers=headers)
+        sent.append(True)
+        return conn.getresponse()
+
+    def close(self):
+        self.pool.close()
+
+    def stats(self) -> dict:
+        """Счётчики клиента для /api/status."""
+        with self._lock:
+            stats = {"requests": self._requests, "retries": self._retries}
+        stats.update(self.pool.stats())
+        return stats
+
+
+def _read(pool: ConnectionPool, conn, response: http.client.HTTPResponse) -> bytes:
+    """Прочитать тело ответа и вернуть соединение в пул."""
+    try:
+        data = response.read()
+    except BaseException:
+        pool.release(conn, reusable=False)
+        raise
+    pool.release(conn, reusable=not response.will_close)
+    return data
+
+
+class EventStream:
+    """
+    События SSE потокового ответа модели (разобранные JSON из строк data:).
+
+    Соединение возвращается в пул, когда поток дочитан до конца ([DONE]
+    или конец ответа); при досрочном close() — закрывается.
+
+    on_finish(usage, text, complete) вызывается один раз по окончании
+    потока, в том числе оборванного: usage из последнего события (или None),
+    полученный текст и признак, что поток дочитан до конца.
+    """
+
+    def __init__(self, pool: ConnectionPool, conn, response: http.client.HTTPResponse):
+        self._pool = pool
+        self._conn = conn
+        self._response = response
+        self._parts = []
+        self._usage = None
+        self.on_finish = None
+
+    def __iter__(self):
+        try:
+            for event in parse_events(iter(self._response.readline, b"")):
+                self._parts.append(event_delta(event))
+                self._usage = event_usage(event) or self._usage
+                yield event
+            # Дочитываем завершающий фрагмент, чтобы соединение можно было переиспользовать
+            self._response.read()
+        except BaseException:
+            self.close()
+            raise
+        self._finish(reusable=not self._response.will_close, complete=True)
+
+    def deltas(self):
+        """Фрагменты текста ответа (choices[0].delta.content)."""
+        for event in self:
+            content = event_delta(event)
+            if content:
+                yield content
+
+    def close(self):
+        """Прервать поток (соединение не возвращается в пул)."""
+        self._finish(reusable=False)
+
+    def _finish(self, reusable: bool, complete: bool = False):
+        if self._conn is not None:
+            self._pool.release(self._conn, reusable)
+            self._conn = None
+            if self.on_finish is not None:
+                self.on_finish(self._usage, "".join(self._parts), complete)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -9,6 +9,99 @@ DEBUG = os.getenv("DEBUG", "true").lower() == "true"
 
 # Search
 SEARCH_TOP_K = int(os.getenv("SEARCH_TOP_K", 8))
+# Движок ранжирования: "tfidf" (полный перебор) или "inverted" (инвертированный индекс, MaxScore)
+SEARCH_ENGINE = os.getenv("SEARCH_ENGINE", "tfidf")
+# Каталог JSONL/Parquet-файлов корпуса (principles, quran, hadith); при их отсутствии — встроенные модули
+KNOWLEDGE_DATA_DIR = os.getenv(
+    "KNOWLEDGE_DATA_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "knowledge_base", "data"),
+)
+# Каталог сохранённого TF-IDF индекса (пустая строка — не сохранять на диск)
+SEARCH_INDEX_DIR = os.getenv(
+    "SEARCH_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".search_index"),
+)
+# Кэш результатов поиска: число запросов (0 — отключить) и TTL в секундах (0 — без TTL)
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", 1024))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", 0))
+# Доля добавленных/удалённых записей, после которой IDF пересчитывается автоматически (0 — только refresh())
+SEARCH_REFIT_RATIO = float(os.getenv("SEARCH_REFIT_RATIO", 0.2))
+# Нормализация словоформ при индексации, поиске и сопоставлении маркеров:
+# "snowball" — стемминг русского языка, "none" — словоформы как есть
+TEXT_NORMALIZER = os.getenv("TEXT_NORMALIZER", "snowball")
+# Размер LRU-кэша токен → нормальная форма
+TEXT_NORMALIZER_CACHE_SIZE = int(os.getenv("TEXT_NORMALIZER_CACHE_SIZE", 65536))
+# Профилирование этапов: учитывать прирост памяти (tracemalloc, заметно замедляет работу)
+PROFILE_TRACE_ALLOC = os.getenv("PROFILE_TRACE_ALLOC", "false").lower() == "true"
+# Порт эндпоинта /metrics (Prometheus / OpenMetrics)
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9108))
+
+# Chat (server.py)
+# Адрес OpenAI-совместимого эндпоинта модели (для локальной заглушки — http://127.0.0.1:<порт>/...)
+GROQ_URL = os.getenv("GROQ_URL", "https://api.groq.com/openai/v1/chat/completions")
+# Пул keep-alive соединений к модели: максимум одновременных соединений
+UPSTREAM_POOL_SIZE = int(os.getenv("UPSTREAM_POOL_SIZE", 16))
+# Таймауты установки соединения и ожидания ответа, секунды
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", 5))
+UPSTREAM_READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", 60))
+# Повторы при 429/5xx и сбоях соединения: число повторов и потолок паузы (экспонента с jitter), секунды
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", 2))
+UPSTREAM_BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", 8))
+# Квоты аккаунта Groq на модель: запросов и токенов в минуту (0 — без ограничения);
+# по умолчанию — бесплатный тариф для llama-3.3-70b-versatile, сверяйте с console.groq.com/settings/limits
+UPSTREAM_RPM = int(os.getenv("UPSTREAM_RPM", 30))
+UPSTREAM_TPM = int(os.getenv("UPSTREAM_TPM", 12000))
+# Доля минутной квоты, которую можно израсходовать сразу (всплеск)
+UPSTREAM_RATE_BURST = float(os.getenv("UPSTREAM_RATE_BURST", 1.0))
+# Очередь запросов, ждущих квоты: максимум мест и сколько запрос может ждать (с повторами после 429), секунды
+UPSTREAM_QUEUE_SIZE = int(os.getenv("UPSTREAM_QUEUE_SIZE", 256))
+UPSTREAM_QUEUE_TIMEOUT = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT", 30))
+# Асинхронный сервер (asgi_server.py): соединений к модели — ожидание в цикле событий дешёвое, пул больше
+ASYNC_UPSTREAM_POOL_SIZE = int(os.getenv("ASYNC_UPSTREAM_POOL_SIZE", 256))
+# Максимум одновременно обрабатываемых /api/chat; сверх него — 503 с Retry-After (секунды)
+CHAT_MAX_IN_FLIGHT = int(os.getenv("CHAT_MAX_IN_FLIGHT", 4096))
+CHAT_RETRY_AFTER = int(os.getenv("CHAT_RETRY_AFTER", 5))
+# Кэш ответов модели: число ответов (0 — отключить) и TTL в секундах (0 — без TTL)
+CHAT_CACHE_SIZE = int(os.getenv("CHAT_CACHE_SIZE", 1024))
+CHAT_CACHE_TTL = float(os.getenv("CHAT_CACHE_TTL", 86400))
+# Порог косинуса TF-IDF для почти-дубликатов вопроса (0 — только точное совпадение)
+CHAT_CACHE_SIMILARITY = float(os.getenv("CHAT_CACHE_SIMILARITY", 0))
+# Сколько последних ходов истории входит в ключ кэша
+CHAT_CACHE_HISTORY_TURNS = int(os.getenv("CHAT_CACHE_HISTORY_TURNS", 2))
+# Бюджет промпта /api/chat в токенах (оценка, см. chat.history) и максимум сообщений истории целиком
+CHAT_PROMPT_BUDGET = int(os.getenv("CHAT_PROMPT_BUDGET", 3000))
+CHAT_HISTORY_MESSAGES = int(os.getenv("CHAT_HISTORY_MESSAGES", 20))
+# Бюджет краткого содержания ранних сообщений, токенов (0 — не сохранять, просто отбрасывать)
+CHAT_SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", 400))
+# Сколько сессий хранят готовое краткое содержание
+CHAT_SUMMARY_CACHE_SIZE = int(os.getenv("CHAT_SUMMARY_CACHE_SIZE", 1024))
+# Серверные истории чатов по session_id: максимум сессий (0 — отключить, история приходит от клиента),
+# TTL без обращений в секундах (0 — без TTL), лимит памяти в МБ и сообщений на сессию
+CHAT_SESSION_MAX = int(os.getenv("CHAT_SESSION_MAX", 10000))
+CHAT_SESSION_TTL = float(os.getenv("CHAT_SESSION_TTL", 7 * 86400))
+CHAT_SESSION_MAX_MB = int(os.getenv("CHAT_SESSION_MAX_MB", 64))
+CHAT_SESSION_MESSAGES = int(os.getenv("CHAT_SESSION_MESSAGES", 40))
+# Файл SQLite для сессий, вытесненных из памяти (пустая строка — не сохранять на диск)
+CHAT_SESSION_DB = os.getenv("CHAT_SESSION_DB", "")
+# Объединение одинаковых одновременных запросов к модели (single-flight); false — каждый запрос вызывает модель
+CHAT_COALESCE = os.getenv("CHAT_COALESCE", "true").lower() == "true"
+# Сколько секунд после завершения вызова его успешный результат получают новые одинаковые запросы
+CHAT_COALESCE_WINDOW = float(os.getenv("CHAT_COALESCE_WINDOW", 0))
+# Ответы из встроенной базы фикха (static/fiqh_db.js) без вызова модели; false — всё в модель
+OFFLINE_ANSWERS = os.getenv("OFFLINE_ANSWERS", "true").lower() == "true"
+FIQH_DB_PATH = os.getenv(
+    "FIQH_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "fiqh_db.js"),
+)
+# Уверенность оффлайн-ответа: минимальный косинус TF-IDF и отрыв от следующей записи
+OFFLINE_ANSWER_THRESHOLD = float(os.getenv("OFFLINE_ANSWER_THRESHOLD", 0.25))
+OFFLINE_ANSWER_MARGIN = float(os.getenv("OFFLINE_ANSWER_MARGIN", 0.1))
+# Потоковые ответы /api/chat (SSE) по запросу клиента; false — всегда один JSON
+CHAT_STREAMING = os.getenv("CHAT_STREAMING", "true").lower() == "true"
 
 # Logging
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Ёмкость журнала шагов одного запроса (ранние шаги вытесняются)
+LOG_BUFFER_SIZE = int(os.getenv("LOG_BUFFER_SIZE", 256))
+# Доля запросов, для которых ведётся журнал шагов (1 — все, 0 — ни одного)
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", 1.0))
@@ -0,0 +1,199 @@
+"""
+Пакетный запуск конвейера для массового анализа ситуаций.
+
+Ситуации распределяются по пулу процессов; каждый воркер один раз
+создаёт собственный Pipeline (с предзагруженным KnowledgeSearch,
+открытым из сохранённого индекса через memory-map) и обрабатывает
+ситуации по очереди, поэтому логи каждого отчёта изолированы.
+
+Запуск:
+    python -m coordinator.batch situations.jsonl -o reports.jsonl --workers 8
+    cat situations.jsonl | python -m coordinator.batch - --unordered
+    python -m coordinator.batch situations.jsonl --metrics-port 9108
+
+Формат входа (JSONL): строка JSON или объект {"id": ..., "situation": ...}.
+Формат выхода (JSONL): {"index": ..., "id": ..., "report": {...}}.
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import sys
+from collections import deque
+
+from coordinator.pipeline import Pipeline
+from knowledge_base.search import get_search
+from utils.profiling import get_stage_metrics, start_metrics_server
+
+# Pipeline воркера (создаётся в инициализаторе пула)
+_worker_pipeline = None
+
+# Порций в работе на воркер: вход читается не дальше этого окна вперёд
+PREFETCH_CHUNKS = 4
+
+
+def _init_worker():
+    """Инициализатор процесса пула: один Pipeline на воркер."""
+    global _worker_pipeline
+    _worker_pipeline = Pipeline()
+
+
+def _run_one(item: tuple) -> tuple:
+    """Обработать одну ситуацию; ошибка не прерывает пакет."""
+    index, item_id, situation = item
+    try:
+        report = _worker_pipeline.run(situation)
+    except Exception as e:
+        report = {"status": "error", "situation": situation, "message": str(e)}
+    return index, item_id, report
+
+
+def _run_chunk(chunk: list) -> list:
+    """Обработать порцию ситуаций в воркере."""
+    return [_run_one(item) for item in chunk]
+
+
+def _chunks(items, size: int):
+    """Порции по size элементов (последняя — короче)."""
+    while chunk := list(itertools.islice(items, size)):
+        yield chunk
+
+
+def _map_bounded(pool, chunks, limit: int, ordered: bool):
+    """
+    Результаты _run_chunk по порциям, как pool.imap, но в работе не больше
+    limit порций: следующая порция читается со входа, только когда готова
+    одна из отправленных (pool.imap вычитывает вход целиком заранее).
+    """
+    if ordered:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(_run_chunk, (chunk,)))
+            if len(pending) >= limit:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+        return
+
+    done = queue.Queue()
+    in_flight = 0
+    for chunk in chunks:
+        pool.apply_async(_run_chunk, (chunk,), callback=done.put, error_callback=done.put)
+        in_flight += 1
+        if in_flight >= limit:
+            in_flight -= 1
+            yield _completed(done)
+    while in_flight:
+        in_flight -= 1
+        yield _completed(done)
+
+
+def _completed(done: queue.Queue) -> list:
+    """Следующий готовый результат (ошибка воркера — исключением)."""
+    result = done.get()
+    if isinstance(result, BaseException):
+        raise result
+    return result
+
+
+def _iter_items(situations):
+    """Нормализовать вход в кортежи (index, id, situation)."""
+    for index, item in enumerate(situations):
+        if isinstance(item, dict):
+            yield index, item.get("id", index), item.get("situation", "")
+        else:
+            yield index, index, str(item)
+
+
+def iter_jsonl_situations(path: str):
+    """Ситуации из JSONL-файла ("-" — stdin)."""
+    stream = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def run_batch(situations, workers: int | None = None, ordered: bool = True,
+              chunksize: int = 16):
+    """
+    Прогнать конвейер по множеству ситуаций.
+
+    Args:
+        situations: итерируемое строк или словарей {"id", "situation"}
+        workers: число процессов (None — по числу ядер, 1 — в текущем процессе)
+        ordered: True — отчёты в порядке входа, False — по мере готовности
+        chunksize: размер порции задач, передаваемой воркеру за раз;
+                   вход читается не дальше workers * PREFETCH_CHUNKS порций вперёд
+
+    Yields:
+        (index, id, report)
+    """
+    workers = workers or os.cpu_count() or 1
+    items = _iter_items(situations)
+
+    if workers <= 1:
+        _init_worker()
+        for item in items:
+            yield _run_one(item)
+        return
+
+    # Индекс строится (и сохраняется на диск) один раз до запуска воркеров
+    get_search()
+
+    metrics = get_stage_metrics()
+    with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+        chunks = _chunks(items, max(int(chunksize), 1))
+        for results in _map_bounded(pool, chunks, workers * PREFETCH_CHUNKS, ordered):
+            for index, item_id, report in results:
+                # Метрики воркеров живут в их процессах — учитываем этапы из отчёта
+                stages = report.get("meta", {}).get("stages")
+                if stages is not None:
+                    metrics.observe(stages)
+                yield index, item_id, report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Пакетный анализ ситуаций конвейером агентов.")
+    parser.add_argument("input", help="JSONL-файл с ситуациями (\"-\" — stdin)")
+    parser.add_argument("-o", "--output", default="-", help="JSONL-файл для отчётов (по умолчанию stdout)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="число процессов (по умолчанию — число ядер)")
+    parser.add_argument("--unordered", action="store_true", help="выводить отчёты по мере готовности")
+    parser.add_argument("--chunksize", type=int, default=16)
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="отдавать метрики этапов на http://127.0.0.1:PORT/metrics")
+    args = parser.parse_args(argv)
+
+    if args.metrics_port is not None:
+        start_metrics_server(args.metrics_port)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    processed = errors = 0
+    try:
+        for index, item_id, report in run_batch(
+            iter_jsonl_situations(args.input),
+            workers=args.workers,
+            ordered=not args.unordered,
+            chunksize=args.chunksize,
+        ):
+            out.write(json.dumps({"index": index, "id": item_id, "report": report},
+                                 ensure_ascii=False, default=str) + "\n")
+            processed += 1
+            errors += report.get("status") == "error"
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"Обработано: {processed}, ошибок: {errors}", file=sys.stderr)
+    return 0 if not errors else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,13 +6,24 @@
   2. Агент-Интерпретатор Ценностей → находит релевантные источники
   3. Агент-Рефлексии → генерирует вопросы для размышления
   4. Собирает итоговый отчёт с дисклеймером
+
+Конвейер можно запускать синхронно (run) или из asyncio (arun):
+каждый запуск получает собственный контекст логирования и профиля,
+поэтому параллельные анализы в одном процессе не влияют друг на друга.
+Длительности этапов (подготовка, агенты, подэтапы поиска) попадают
+в meta.stages отчёта и в метрики процесса (utils.profiling).
 """
 
+import asyncio
+import contextvars
+import functools
 from datetime import datetime, timezone
 from agents.analyst import AnalystAgent
+from agents.situation import PreparedSituation
 from agents.values_interpreter import ValuesInterpreterAgent
 from agents.reflection import ReflectionAgent
 from utils.logger import get_logger
+from utils.profiling import current_profile, get_stage_metrics, profile, span
 
 
 class Pipeline:
@@ -34,33 +45,105 @@ class Pipeline:
         Returns:
             Полный структурированный отчёт
         """
-        self.logger.clear()
-        self.logger.log("Координатор", "Запуск конвейера", situation)
-        start_time = datetime.now(timezone.utc)
+        steps = self._steps(situation)
+        try:
+            step = next(steps)
+            while True:
+                fn, input_data = step
+                try:
+                    result = fn(input_data)
+                except BaseException as e:
+                    step = steps.throw(e)
+                else:
+                    step = steps.send(result)
+        except StopIteration as done:
+            return done.value
 
-        # ─── Шаг 1: Анализ ──────────────────────────────────────────
-        self.logger.log("Координатор", "Шаг 1 → Агент-Аналитик")
-        analyst_result = self.analyst.process({
-            "situation": situation,
-        })
+    async def arun(self, situation: str, executor=None) -> dict:
+        """
+        Асинхронный запуск конвейера — тот же отчёт, что и run().
 
-        # ─── Шаг 2: Интерпретация ценностей ─────────────────────────
-        self.logger.log("Координатор", "Шаг 2 → Агент-Интерпретатор Ценностей")
-        values_result = self.values.process({
-            "situation": situation,
-            "analyst_result": analyst_result,
-        })
+        Шаги агентов (CPU-bound) выполняются в executor (по умолчанию —
+        пул потоков цикла событий), цикл событий при этом не блокируется.
+        Запуск идёт в отдельной задаче со своим контекстом логирования.
 
-        # ─── Шаг 3: Рефлексия ───────────────────────────────────────
-        self.logger.log("Координатор", "Шаг 3 → Агент-Рефлексии")
-        reflection_result = self.reflection.process({
-            "situation": situation,
-            "analyst_result": analyst_result,
-            "values_result": values_result,
-        })
+        Args:
+            situation: описание ситуации на естественном языке
+            executor: concurrent.futures.Executor для шагов агентов
+        """
+        return await asyncio.create_task(self._arun(situation, executor))
+
+    async def _arun(self, situation: str, executor) -> dict:
+        steps = self._steps(situation)
+        try:
+            step = next(steps)
+            while True:
+                fn, input_data = step
+                try:
+                    result = await _offload(executor, fn, input_data)
+                except BaseException as e:
+                    step = steps.throw(e)
+                else:
+                    step = steps.send(result)
+        except StopIteration as done:
+            return done.value
+
+    def _steps(self, situation: str):
+        """
+        Последовательность шагов конвейера, общая для run() и arun().
+
+        Генератор отдаёт шаги (agent.process, input_data) и получает
+        их результаты (ошибка шага пробрасывается в генератор через
+        throw); возвращает итоговый отчёт.
+        """
+        with profile():
+            self.logger.clear()
+            self.logger.log("Координатор", "Запуск конвейера", situation)
+            start_time = datetime.now(timezone.utc)
 
+            # Текст разбирается один раз и передаётся всем агентам
+            with span("prepare"):
+                prepared = PreparedSituation(situation)
+            self.logger.log("Координатор", "Ситуация подготовлена", output_data=prepared.stats())
+
+            # ─── Шаг 1: Анализ ──────────────────────────────────────────
+            self.logger.log("Координатор", "Шаг 1 → Агент-Аналитик")
+            analyst_result = yield self.analyst.process, {
+                "situation": situation,
+                "prepared": prepared,
+            }
+
+            # ─── Шаг 2: Интерпретация ценностей ─────────────────────────
+            self.logger.log("Координатор", "Шаг 2 → Агент-Интерпретатор Ценностей")
+            values_result = yield self.values.process, {
+                "situation": situation,
+                "analyst_result": analyst_result,
+                "prepared": prepared,
+            }
+
+            # ─── Шаг 3: Рефлексия ───────────────────────────────────────
+            self.logger.log("Координатор", "Шаг 3 → Агент-Рефлексии")
+            reflection_result = yield self.reflection.process, {
+                "situation": situation,
+                "analyst_result": analyst_result,
+                "values_result": values_result,
+                "prepared": prepared,
+            }
+
+            return self._build_report(situation, start_time, analyst_result,
+                                      values_result, reflection_result)
+
+    def _build_report(self, situation: str, start_time: datetime, analyst_result: dict,
+                      values_result: dict, reflection_result: dict) -> dict:
+        """Собрать итоговый отчёт из результатов агентов."""
         end_time = datetime.now(timezone.utc)
         processing_time = (end_time - start_time).total_seconds()
+        self.logger.log("Координатор", "Конвейер завершён",
+                        output_data=f"Время: {processing_time:.3f}с")
+
+        # Этапы профиля: в отчёт и в метрики процесса (см. utils.profiling)
+        stages = current_profile().stages()
+        get_stage_metrics().observe(stages)
 
         # ─── Итоговый отчёт ──────────────────────────────────────────
         report = {
@@ -71,6 +154,7 @@ class Pipeline:
             "reflection": reflection_result,
             "meta": {
                 "processing_time_seconds": round(processing_time, 3),
+                "stages": stages,
                 "timestamp": start_time.isoformat(),
                 "agents_used": [
                     self.analyst.name,
@@ -86,7 +170,11 @@ class Pipeline:
             ),
             "logs": self.logger.get_logs(),
         }
-
-        self.logger.log("Координатор", "Конвейер завершён",
-                        output_data=f"Время: {processing_time:.3f}с")
         return report
+
+
+async def _offload(executor, fn, *args):
+    """Выполнить fn в executor, сохранив контекст запроса (журнал логов)."""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(executor, functools.partial(ctx.run, fn, *args))
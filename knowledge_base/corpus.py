@@ -159,14 +159,5 @@ ETHICAL_PRINCIPLES = [
 
 def get_all_principle_entries():
     """Возвращает все этические принципы в формате для поисковой системы."""
-    entries = []
-    for p in ETHICAL_PRINCIPLES:
-        entries.append({
-            "id": p["id"],
-            "source_type": "principle",
-            "title": f"{p['tradition']}: {p['principle']}",
-            "content": p["description"],
-            "tags": p["topic_tags"],
-            "reference": p["source"]
-        })
-    return entries
+    from knowledge_base.loader import principle_to_entry
+    return [principle_to_entry(p) for p in ETHICAL_PRINCIPLES]
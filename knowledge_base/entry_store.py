@@ -0,0 +1,185 @@
+"""
+Компактное колоночное хранилище записей базы знаний.
+
+Вместо списка словарей (по объекту на запись и на каждую строку)
+хранит:
+  - строковые поля — UTF-8 блобом на поле и массивом смещений
+  - source_type — кодом в интернированной таблице типов
+  - tags — одной строкой с разделителем \\x1f
+  - прочие (нестандартные) поля — в словаре только для таких записей
+
+Словари создаются только для запрошенных записей (top-k результатов).
+Хранилище сохраняется в .npy-файлы и может открываться через memory-map.
+"""
+
+import json
+import os
+import sys
+from array import array
+
+import numpy as np
+
+# Порядок ключей совпадает с форматом записей поисковой системы
+STRING_FIELDS = ("id", "title", "content", "arabic", "reference", "authenticity")
+FIELD_ORDER = ("id", "source_type", "title", "content", "arabic", "tags", "reference", "authenticity")
+# Поля, которые опускаются в записи, если пусты
+OPTIONAL_FIELDS = frozenset(("arabic", "authenticity"))
+
+_TAG_SEPARATOR = "\x1f"
+_BLOB_FIELDS = STRING_FIELDS + ("tags",)
+_KNOWN_FIELDS = frozenset(FIELD_ORDER)
+
+
+class EntryStore:
+    """Колоночное хранилище записей с материализацией по требованию."""
+
+    def __init__(self, entries=None):
+        self._blobs = {field: bytearray() for field in _BLOB_FIELDS}
+        self._offsets = {field: array("q", [0]) for field in _BLOB_FIELDS}
+        self._types: list[str] = []
+        self._type_index: dict[str, int] = {}
+        # Коды типов — 32-битные: число разных source_type не ограничено 256
+        self._type_codes = array("I")
+        self._extras: dict[int, dict] = {}
+        self._size = 0
+        if entries is not None:
+            self.extend(entries)
+
+    # ─── Запись ─────────────────────────────────────────────────────
+
+    def append(self, entry: dict):
+        """Добавить запись."""
+        self._ensure_mutable()
+        for field in STRING_FIELDS:
+            value = entry.get(field)
+            self._append_value(field, "" if value is None else str(value))
+        self._append_value("tags", _TAG_SEPARATOR.join(str(tag) for tag in entry.get("tags") or []))
+
+        source_type = entry.get("source_type", "unknown")
+        code = self._type_index.get(source_type)
+        if code is None:
+            code = len(self._types)
+            self._types.append(source_type)
+            self._type_index[source_type] = code
+        self._type_codes.append(code)
+
+        extras = {k: v for k, v in entry.items() if k not in _KNOWN_FIELDS}
+        if extras:
+            self._extras[self._size] = extras
+        self._size += 1
+
+    def extend(self, entries):
+        """Добавить записи из итерируемого источника."""
+        for entry in entries:
+            self.append(entry)
+
+    def select(self, keep: np.ndarray) -> "EntryStore":
+        """Новое хранилище только с записями, отмеченными в маске keep."""
+        return EntryStore(self[idx] for idx in np.flatnonzero(keep))
+
+    def _append_value(self, field: str, value: str):
+        blob = self._blobs[field]
+        blob += value.encode("utf-8")
+        self._offsets[field].append(len(blob))
+
+    def _ensure_mutable(self):
+        """Перевести массивы, открытые через memory-map, в изменяемые буферы."""
+        for field in _BLOB_FIELDS:
+            if isinstance(self._blobs[field], np.ndarray):
+                self._blobs[field] = bytearray(self._blobs[field])
+                self._offsets[field] = array("q", self._offsets[field].tolist())
+        if isinstance(self._type_codes, np.ndarray):
+            self._type_codes = array("I", self._type_codes.tolist())
+
+    # ─── Чтение ─────────────────────────────────────────────────────
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, idx) -> dict:
+        """Материализовать запись в словарь."""
+        idx = int(idx)
+        if idx < 0:
+            idx += self._size
+        if not 0 <= idx < self._size:
+            raise IndexError(idx)
+
+        entry = {}
+        for field in FIELD_ORDER:
+            if field == "source_type":
+                entry[field] = self.source_type(idx)
+            elif field == "tags":
+                tags = self.get(idx, "tags")
+                entry[field] = tags.split(_TAG_SEPARATOR) if tags else []
+            else:
+                value = self.get(idx, field)
+                if value or field not in OPTIONAL_FIELDS:
+                    entry[field] = value
+        if idx in self._extras:
+            entry.update(self._extras[idx])
+        return entry
+
+    def __iter__(self):
+        for idx in range(self._size):
+            yield self[idx]
+
+    def get(self, idx: int, field: str) -> str:
+        """Значение одного строкового поля без материализации записи."""
+        offsets = self._offsets[field]
+        return str(self._blobs[field][offsets[idx]:offsets[idx + 1]], "utf-8")
+
+    def source_type(self, idx: int) -> str:
+        return self._types[self._type_codes[idx]]
+
+    def ids(self):
+        """id всех записей по порядку."""
+        for idx in range(self._size):
+            yield self.get(idx, "id")
+
+    def counts_by_type(self) -> dict:
+        """Число записей по source_type."""
+        counts = np.bincount(np.asarray(self._type_codes, dtype=np.intp),
+                             minlength=len(self._types))
+        return {t: int(c) for t, c in zip(self._types, counts) if c}
+
+    def memory_bytes(self) -> int:
+        """Приблизительный объём памяти хранилища в байтах."""
+        total = sum(len(self._blobs[f]) + len(self._offsets[f]) * 8 for f in _BLOB_FIELDS)
+        total += len(self._type_codes) * self._type_codes.itemsize
+        total += sum(sys.getsizeof(json.dumps(e, ensure_ascii=False)) for e in self._extras.values())
+        return total
+
+    # ─── Персистентность ────────────────────────────────────────────
+
+    def save(self, path: str):
+        """Сохранить хранилище в каталог path (файлы entries.*)."""
+        for field in _BLOB_FIELDS:
+            np.save(os.path.join(path, f"entries.{field}.blob.npy"),
+                    np.frombuffer(bytes(self._blobs[field]), dtype=np.uint8))
+            np.save(os.path.join(path, f"entries.{field}.offsets.npy"),
+                    np.asarray(self._offsets[field], dtype=np.int64))
+        np.save(os.path.join(path, "entries.types.npy"),
+                np.asarray(self._type_codes, dtype=np.uint32))
+        with open(os.path.join(path, "entries.meta.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "size": self._size,
+                "types": self._types,
+                "extras": {str(k): v for k, v in self._extras.items()},
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "EntryStore":
+        """Открыть сохранённое хранилище (по умолчанию через memory-map)."""
+        mode = "r" if mmap else None
+        store = cls()
+        with open(os.path.join(path, "entries.meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        for field in _BLOB_FIELDS:
+            store._blobs[field] = np.load(os.path.join(path, f"entries.{field}.blob.npy"), mmap_mode=mode)
+            store._offsets[field] = np.load(os.path.join(path, f"entries.{field}.offsets.npy"), mmap_mode=mode)
+        store._type_codes = np.load(os.path.join(path, "entries.types.npy"), mmap_mode=mode)
+        store._types = meta["types"]
+        store._type_index = {t: i for i, t in enumerate(store._types)}
+        store._extras = {int(k): v for k, v in meta["extras"].items()}
+        store._size = meta["size"]
+        return store
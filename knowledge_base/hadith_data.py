@@ -238,16 +238,5 @@ HADITHS = [
 
 def get_all_hadith_entries():
     """Возвращает все хадисы в формате для поисковой системы."""
-    entries = []
-    for h in HADITHS:
-        entries.append({
-            "id": h["id"],
-            "source_type": "hadith",
-            "title": f"Хадис — {h['collection']}, №{h['hadith_number']} (передал {h['narrator']})",
-            "content": h["translation_ru"],
-            "arabic": h["arabic_text"],
-            "tags": h["topic_tags"],
-            "reference": f"{h['collection']}, №{h['hadith_number']}",
-            "authenticity": h["authenticity_grade"]
-        })
-    return entries
+    from knowledge_base.loader import hadith_to_entry
+    return [hadith_to_entry(h) for h in HADITHS]
@@ -0,0 +1,152 @@
+"""
+Персистентный TF-IDF индекс базы знаний.
+
+Индекс строится один раз и сохраняется на диск:
+  - meta.json     — версия формата, отпечаток корпуса, размеры матрицы
+  - terms.json    — словарь (термины в порядке столбцов матрицы)
+  - entries.*     — колоночное хранилище записей (см. knowledge_base.entry_store)
+  - idf.npy, data.npy, indices.npy, indptr.npy — IDF-вектор и массивы CSR
+
+Массивы открываются через memory-map, поэтому N процессов-воркеров
+разделяют одну копию матрицы в page cache, а холодный старт занимает
+миллисекунды. Индекс перестраивается только при изменении отпечатка
+корпуса (файлов источников или модулей ETHICAL_PRINCIPLES, QURAN_AYAHS,
+HADITHS — см. knowledge_base.loader) или параметров векторизатора.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from knowledge_base.entry_store import EntryStore
+from knowledge_base.loader import update_fingerprint
+
+# Увеличивать при любом несовместимом изменении формата на диске
+FORMAT_VERSION = 2
+
+_ARRAYS = ("idf", "data", "indices", "indptr")
+
+
+def corpus_fingerprint(vectorizer_params: dict, data_dir: str | None = None) -> str:
+    """Отпечаток содержимого корпуса и параметров индексации (sha256)."""
+    digest = hashlib.sha256()
+    digest.update(f"format={FORMAT_VERSION}\n".encode("utf-8"))
+    digest.update(json.dumps(vectorizer_params, sort_keys=True, default=str).encode("utf-8"))
+    update_fingerprint(digest, data_dir)
+    return digest.hexdigest()
+
+
+def save_index(index_dir: str, fingerprint: str, vectorizer: TfidfVectorizer,
+               matrix: csr_matrix, entries: EntryStore) -> str:
+    """
+    Сохранить индекс в index_dir/<fingerprint>/.
+
+    Запись атомарна: файлы пишутся во временный каталог, который затем
+    переименовывается. Если параллельный процесс успел сохранить тот же
+    индекс раньше, его копия остаётся на месте.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    target = os.path.join(index_dir, fingerprint)
+    if os.path.isdir(target):
+        return target
+
+    tmp_dir = tempfile.mkdtemp(prefix=".build-", dir=index_dir)
+    try:
+        terms = [None] * len(vectorizer.vocabulary_)
+        for term, col in vectorizer.vocabulary_.items():
+            terms[col] = term
+
+        arrays = {
+            "idf": np.asarray(vectorizer.idf_, dtype=np.float64),
+            "data": matrix.data,
+            "indices": matrix.indices,
+            "indptr": matrix.indptr,
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+
+        _write_json(os.path.join(tmp_dir, "terms.json"), terms)
+        entries.save(tmp_dir)
+        _write_json(os.path.join(tmp_dir, "meta.json"), {
+            "format_version": FORMAT_VERSION,
+            "fingerprint": fingerprint,
+            "shape": list(matrix.shape),
+            "nnz": int(matrix.nnz),
+        })
+
+        try:
+            os.rename(tmp_dir, target)
+        except OSError:
+            # Другой процесс уже сохранил индекс с тем же отпечатком
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    _remove_stale(index_dir, keep=fingerprint)
+    return target
+
+
+def load_index(index_dir: str, fingerprint: str, vectorizer: TfidfVectorizer):
+    """
+    Загрузить индекс с данным отпечатком.
+
+    Args:
+        vectorizer: необученный векторизатор с параметрами индекса —
+                    в него записываются сохранённые словарь и IDF
+
+    Returns:
+        (vectorizer, matrix, entries) или None, если индекс отсутствует
+        или повреждён.
+    """
+    path = os.path.join(index_dir, fingerprint)
+    try:
+        meta = _read_json(os.path.join(path, "meta.json"))
+        if meta.get("format_version") != FORMAT_VERSION or meta.get("fingerprint") != fingerprint:
+            return None
+
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in _ARRAYS
+        }
+        terms = _read_json(os.path.join(path, "terms.json"))
+        entries = EntryStore.load(path, mmap=True)
+    except (OSError, ValueError, KeyError):
+        return None
+
+    matrix = csr_matrix(
+        (arrays["data"], arrays["indices"], arrays["indptr"]),
+        shape=tuple(meta["shape"]),
+        copy=False,
+    )
+
+    vectorizer.vocabulary_ = {term: col for col, term in enumerate(terms)}
+    vectorizer.idf_ = arrays["idf"]
+
+    return vectorizer, matrix, entries
+
+
+def _remove_stale(index_dir: str, keep: str):
+    """Удалить индексы с устаревшими отпечатками."""
+    for name in os.listdir(index_dir):
+        if name == keep or name.startswith("."):
+            continue
+        path = os.path.join(index_dir, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _write_json(path: str, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def _read_json(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
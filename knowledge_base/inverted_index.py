@@ -0,0 +1,168 @@
+"""
+Инвертированный индекс с отсечением кандидатов по алгоритму MaxScore.
+
+Для каждого термина хранится список документов (posting list),
+упорядоченный по номеру документа, веса TF-IDF и верхняя граница веса.
+Термины запроса обрабатываются по убыванию вклада; как только сумма
+верхних границ оставшихся терминов становится меньше текущего k-го
+результата, новые документы в кандидаты больше не добавляются —
+оставшиеся термины лишь досчитывают оценки уже найденных кандидатов.
+
+Оценки совпадают с полным перебором (скалярное произведение
+L2-нормированных TF-IDF векторов), поэтому top-k идентичен.
+
+Индекс не меняется после построения: with_documents/without_documents
+возвращают новый индекс, и читатель, взявший ссылку на старый,
+досчитывает запрос по согласованным массивам.
+"""
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+class InvertedIndex:
+    """Posting lists по столбцам TF-IDF матрицы с границами MaxScore."""
+
+    def __init__(self, matrix: csr_matrix):
+        csc = matrix.tocsc()
+        csc.sort_indices()
+        self.n_docs = matrix.shape[0]
+        self._docs = csc.indices
+        self._weights = csc.data
+        self._offsets = csc.indptr
+
+        # Максимальный вес каждого термина (0 для пустых столбцов)
+        self._max_weights = _column_max(self._weights, self._offsets)
+
+    @classmethod
+    def _from_arrays(cls, n_docs: int, docs: np.ndarray, weights: np.ndarray,
+                     offsets: np.ndarray, max_weights: np.ndarray) -> "InvertedIndex":
+        index = cls.__new__(cls)
+        index.n_docs = n_docs
+        index._docs, index._weights, index._offsets = docs, weights, offsets
+        index._max_weights = max_weights
+        return index
+
+    def with_documents(self, rows: csr_matrix) -> "InvertedIndex":
+        """
+        Новый индекс с документами (строками TF-IDF), дописанными в конец.
+
+        Номера новых документов больше существующих, поэтому их postings
+        просто добавляются в конец списка каждого термина — без сортировки.
+        """
+        new = rows.tocsc()
+        new.sort_indices()
+        old_counts = np.diff(self._offsets)
+        new_counts = np.diff(new.indptr)
+        offsets = np.zeros_like(self._offsets)
+        np.cumsum(old_counts + new_counts, out=offsets[1:])
+
+        # Позиции старых и новых элементов в объединённых массивах
+        old_pos = np.arange(self._docs.size) + np.repeat(offsets[:-1] - self._offsets[:-1], old_counts)
+        new_pos = np.arange(new.indices.size) + np.repeat(offsets[:-1] + old_counts - new.indptr[:-1], new_counts)
+
+        docs = np.empty(offsets[-1], dtype=np.int64)
+        weights = np.empty(offsets[-1], dtype=np.float64)
+        docs[old_pos], weights[old_pos] = self._docs, self._weights
+        docs[new_pos], weights[new_pos] = new.indices + self.n_docs, new.data
+
+        max_weights = np.maximum(self._max_weights, _column_max(new.data, new.indptr))
+        return self._from_arrays(self.n_docs + rows.shape[0], docs, weights, offsets, max_weights)
+
+    def without_documents(self, keep: np.ndarray) -> "InvertedIndex":
+        """
+        Новый индекс без документов, не отмеченных в маске keep (True —
+        оставить); оставшиеся перенумерованы так же, как при удалении
+        строк матрицы.
+        """
+        counts = np.diff(self._offsets)
+        terms = np.repeat(np.arange(counts.size), counts)
+        alive = keep[self._docs]
+        new_ids = np.cumsum(keep) - 1
+
+        docs = new_ids[self._docs[alive]]
+        weights = self._weights[alive]
+        offsets = np.zeros_like(self._offsets)
+        np.cumsum(np.bincount(terms[alive], minlength=counts.size), out=offsets[1:])
+        return self._from_arrays(int(keep.sum()), docs, weights, offsets, _column_max(weights, offsets))
+
+    def postings(self, term: int) -> tuple[np.ndarray, np.ndarray]:
+        """Документы и веса термина."""
+        start, end = self._offsets[term], self._offsets[term + 1]
+        return self._docs[start:end], self._weights[start:end]
+
+    def top_k(self, query_vec: csr_matrix, top_k: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Найти top_k документов для L2-нормированного вектора запроса.
+
+        Returns:
+            (индексы документов по убыванию оценки, их оценки);
+            документы с нулевой оценкой не возвращаются.
+        """
+        terms = query_vec.indices
+        query_weights = query_vec.data.astype(np.float64)
+        empty = np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float64)
+        if top_k <= 0 or terms.size == 0:
+            return empty
+
+        bounds = query_weights * self._max_weights[terms]
+        order = np.argsort(-bounds, kind="stable")
+        terms, query_weights, bounds = terms[order], query_weights[order], bounds[order]
+        # remaining[i] — максимально возможная оценка по терминам i, i+1, ...
+        remaining = np.append(np.cumsum(bounds[::-1])[::-1], 0.0)
+
+        cand_docs = np.empty(0, dtype=np.int64)
+        cand_scores = np.empty(0, dtype=np.float64)
+        threshold = 0.0
+
+        # ─── Существенные термины: могут ввести новых кандидатов ─────
+        i = 0
+        while i < terms.size:
+            if cand_docs.size >= top_k:
+                threshold = _kth_largest(cand_scores, top_k)
+                if remaining[i] < threshold:
+                    break
+            docs, weights = self.postings(terms[i])
+            all_docs = np.concatenate((cand_docs, docs))
+            all_scores = np.concatenate((cand_scores, weights * query_weights[i]))
+            cand_docs, inverse = np.unique(all_docs, return_inverse=True)
+            cand_scores = np.bincount(inverse, weights=all_scores, minlength=cand_docs.size)
+            i += 1
+
+        # ─── Несущественные термины: только досчёт кандидатов ────────
+        for j in range(i, terms.size):
+            docs, weights = self.postings(terms[j])
+            if docs.size and cand_docs.size:
+                pos = np.searchsorted(docs, cand_docs)
+                pos[pos == docs.size] = 0
+                hit = docs[pos] == cand_docs
+                cand_scores[hit] += weights[pos[hit]] * query_weights[j]
+
+            # Отбросить кандидатов, которые уже не догонят k-й результат
+            threshold = _kth_largest(cand_scores, top_k)
+            keep = cand_scores + remaining[j + 1] >= threshold
+            cand_docs, cand_scores = cand_docs[keep], cand_scores[keep]
+
+        positive = cand_scores > 0.0
+        cand_docs, cand_scores = cand_docs[positive], cand_scores[positive]
+        if cand_docs.size > top_k:
+            best = np.argpartition(-cand_scores, top_k - 1)[:top_k]
+            cand_docs, cand_scores = cand_docs[best], cand_scores[best]
+        ranking = np.lexsort((cand_docs, -cand_scores))
+        return cand_docs[ranking].astype(np.intp), cand_scores[ranking]
+
+
+def _column_max(weights: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Максимальный вес в каждом столбце CSC (0 для пустых столбцов)."""
+    result = np.zeros(offsets.size - 1, dtype=np.float64)
+    nonempty = np.flatnonzero(np.diff(offsets))
+    if nonempty.size:
+        result[nonempty] = np.maximum.reduceat(weights, offsets[nonempty])
+    return result
+
+
+def _kth_largest(scores: np.ndarray, k: int) -> float:
+    """k-я по величине оценка (0, если оценок меньше k)."""
+    if scores.size < k:
+        return 0.0
+    return float(np.partition(scores, scores.size - k)[scores.size - k])
@@ -0,0 +1,175 @@
+"""
+Потоковая загрузка корпуса знаний.
+
+Каждый источник (принципы, аяты, хадисы) читается из файла
+<data_dir>/<source>.jsonl (по одной записи на строку) или
+<data_dir>/<source>.parquet (нужен pyarrow) генератором — без
+материализации всего корпуса в памяти. Если файла нет, используется
+встроенный Python-модуль (corpus.py, quran_data.py, hadith_data.py);
+он импортируется только в этом случае.
+
+Экспорт встроенных модулей в JSONL:
+    python -m knowledge_base.loader export [data_dir]
+"""
+
+import importlib
+import importlib.util
+import json
+import os
+import sys
+
+import config
+
+
+def principle_to_entry(p: dict) -> dict:
+    """Этический принцип в формате поисковой системы."""
+    return {
+        "id": p["id"],
+        "source_type": "principle",
+        "title": f"{p['tradition']}: {p['principle']}",
+        "content": p["description"],
+        "tags": p["topic_tags"],
+        "reference": p["source"]
+    }
+
+
+def ayah_to_entry(ayah: dict) -> dict:
+    """Аят Корана в формате поисковой системы."""
+    return {
+        "id": ayah["id"],
+        "source_type": "quran",
+        "title": f"Коран, сура {ayah['surah_number']} «{ayah['surah_name']}», аят {ayah['ayah_number']}",
+        "content": ayah["translation_ru"],
+        "arabic": ayah["arabic_text"],
+        "tags": ayah["topic_tags"],
+        "reference": f"Сура {ayah['surah_number']}:{ayah['ayah_number']}"
+    }
+
+
+def hadith_to_entry(h: dict) -> dict:
+    """Хадис в формате поисковой системы."""
+    return {
+        "id": h["id"],
+        "source_type": "hadith",
+        "title": f"Хадис — {h['collection']}, №{h['hadith_number']} (передал {h['narrator']})",
+        "content": h["translation_ru"],
+        "arabic": h["arabic_text"],
+        "tags": h["topic_tags"],
+        "reference": f"{h['collection']}, №{h['hadith_number']}",
+        "authenticity": h["authenticity_grade"]
+    }
+
+
+# Источник → (модуль-фолбэк, имя списка в модуле, преобразование в запись поиска)
+SOURCES = {
+    "principles": ("knowledge_base.corpus", "ETHICAL_PRINCIPLES", principle_to_entry),
+    "quran": ("knowledge_base.quran_data", "QURAN_AYAHS", ayah_to_entry),
+    "hadith": ("knowledge_base.hadith_data", "HADITHS", hadith_to_entry),
+}
+
+_CHUNK_SIZE = 1 << 20
+
+
+def iter_jsonl(path: str):
+    """Записи из файла JSON Lines (пустые строки пропускаются)."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_no}: некорректный JSON ({e.msg})") from e
+
+
+def iter_parquet(path: str):
+    """Записи из Parquet-файла, по батчам (требуется pyarrow)."""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError(f"Для чтения {path} требуется пакет pyarrow") from e
+
+    for batch in pq.ParquetFile(path).iter_batches():
+        yield from batch.to_pylist()
+
+
+def _source_file(name: str, data_dir: str | None) -> str | None:
+    """Путь к файлу источника или None, если используется модуль."""
+    if not data_dir:
+        return None
+    for ext in (".jsonl", ".parquet"):
+        path = os.path.join(data_dir, name + ext)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def _module_records(name: str) -> list[dict]:
+    module_name, attr, _ = SOURCES[name]
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def _module_file(name: str) -> str:
+    """Путь к исходнику модуля-фолбэка источника (модуль не импортируется)."""
+    module_name = SOURCES[name][0]
+    spec = importlib.util.find_spec(module_name)
+    if spec is None or not spec.origin:
+        raise FileNotFoundError(f"Модуль {module_name} не найден")
+    return spec.origin
+
+
+def iter_source_records(name: str, data_dir: str | None = config.KNOWLEDGE_DATA_DIR):
+    """Исходные записи источника: из файла, если он есть, иначе из модуля."""
+    path = _source_file(name, data_dir)
+    if path is None:
+        yield from _module_records(name)
+    elif path.endswith(".parquet"):
+        yield from iter_parquet(path)
+    else:
+        yield from iter_jsonl(path)
+
+
+def iter_entries(data_dir: str | None = config.KNOWLEDGE_DATA_DIR):
+    """Все записи корпуса в формате поисковой системы (генератор)."""
+    for name, (_, _, convert) in SOURCES.items():
+        for record in iter_source_records(name, data_dir):
+            yield convert(record)
+
+
+def update_fingerprint(digest, data_dir: str | None = config.KNOWLEDGE_DATA_DIR):
+    """
+    Добавить в hashlib-дайджест содержимое всех источников.
+
+    Хэшируются байты файлов — данных или, если их нет, исходника
+    модуля-фолбэка (найденного без импорта), без разбора записей.
+    """
+    for name in SOURCES:
+        path = _source_file(name, data_dir) or _module_file(name)
+        digest.update(f"source={name}\n".encode("utf-8"))
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+                digest.update(chunk)
+
+
+def export_jsonl(data_dir: str) -> dict:
+    """Выгрузить встроенные модули в <data_dir>/<source>.jsonl."""
+    os.makedirs(data_dir, exist_ok=True)
+    counts = {}
+    for name in SOURCES:
+        path = os.path.join(data_dir, name + ".jsonl")
+        records = _module_records(name)
+        with open(path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        counts[name] = len(records)
+    return counts
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "export":
+        print("Использование: python -m knowledge_base.loader export [data_dir]")
+        sys.exit(2)
+    target = sys.argv[2] if len(sys.argv) > 2 else config.KNOWLEDGE_DATA_DIR
+    for source, count in export_jsonl(target).items():
+        print(f"  {source}: {count} записей → {os.path.join(target, source + '.jsonl')}")
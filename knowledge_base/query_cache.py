@@ -0,0 +1,93 @@
+"""
+Кэш результатов поиска с вытеснением LRU и необязательным TTL.
+
+Ключ — нормализованный запрос (нижний регистр, схлопнутые пробелы)
+плюс top_k. Нормализация не меняет токенизацию TF-IDF, поэтому
+результат из кэша совпадает с результатом полного поиска.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class QueryCache:
+    """Ограниченный потокобезопасный LRU-кэш со счётчиками попаданий."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 0.0, clock=time.monotonic, on_evict=None):
+        """
+        Args:
+            maxsize: максимальное число запросов в кэше
+            ttl: время жизни записи в секундах (0 — без ограничения)
+            clock: источник монотонного времени
+            on_evict: вызывается с ключом записи, вытесненной или истёкшей
+                      (под блокировкой кэша — должен быть быстрым)
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._on_evict = on_evict
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(query: str, top_k: int) -> tuple:
+        """Ключ кэша для запроса."""
+        return " ".join(query.lower().split()), top_k
+
+    def get(self, key):
+        """Вернуть значение или None (промах, в том числе по истечении TTL)."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            value, stored_at = item
+            if self.ttl > 0 and self._clock() - stored_at > self.ttl:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                if self._on_evict is not None:
+                    self._on_evict(key)
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Сохранить значение, вытеснив самые давние записи при переполнении."""
+        with self._lock:
+            self._data[key] = (value, self._clock())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                evicted, _ = self._data.popitem(last=False)
+                self.evictions += 1
+                if self._on_evict is not None:
+                    self._on_evict(evicted)
+
+    def clear(self):
+        """Сбросить кэш (например, после перестроения индекса)."""
+        with self._lock:
+            self._data.clear()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        """Счётчики кэша."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
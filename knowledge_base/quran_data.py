@@ -268,15 +268,5 @@ QURAN_AYAHS = [
 
 def get_all_quran_entries():
     """Возвращает все аяты Корана в формате для поисковой системы."""
-    entries = []
-    for ayah in QURAN_AYAHS:
-        entries.append({
-            "id": ayah["id"],
-            "source_type": "quran",
-            "title": f"Коран, сура {ayah['surah_number']} «{ayah['surah_name']}», аят {ayah['ayah_number']}",
-            "content": ayah["translation_ru"],
-            "arabic": ayah["arabic_text"],
-            "tags": ayah["topic_tags"],
-            "reference": f"Сура {ayah['surah_number']}:{ayah['ayah_number']}"
-        })
-    return entries
+    from knowledge_base.loader import ayah_to_entry
+    return [ayah_to_entry(ayah) for ayah in QURAN_AYAHS]
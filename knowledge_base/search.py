@@ -5,85 +5,444 @@
   - хадисы Пророка
 
 Используется TF-IDF + косинусное сходство для ранжирования.
+Индекс сохраняется на диск (см. knowledge_base.index_store) и при следующем
+запуске открывается через memory-map без повторного обучения векторизатора.
+
+Записи можно добавлять и удалять на лету (add_entries / remove_entries):
+строки матрицы и posting lists обновляются без переобучения, а IDF
+пересчитывается лениво — при накоплении изменений или по вызову refresh().
 """
 
 import re
+import threading
+from collections import Counter
+
+import numpy as np
+from scipy.sparse import csr_matrix, vstack
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+
+import config
+from knowledge_base.entry_store import EntryStore
+from knowledge_base.index_store import corpus_fingerprint, load_index, save_index
+from knowledge_base.inverted_index import InvertedIndex
+from knowledge_base.loader import iter_entries
+from knowledge_base.query_cache import QueryCache
+from utils.profiling import span
+from utils.stemmer import get_normalizer, normalizer_version
+
+# Движки ранжирования: полный перебор по матрице или инвертированный индекс
+ENGINES = ("tfidf", "inverted")
+
+# Параметры векторизатора входят в отпечаток индекса
+VECTORIZER_PARAMS = {
+    "lowercase": True,
+    "token_pattern": r"(?u)\b\w[\w-]*\b",
+    "max_df": 0.95,
+    "min_df": 1,
+    "ngram_range": (1, 2),
+}
+
+_TOKEN_RE = re.compile(VECTORIZER_PARAMS["token_pattern"])
+
+
+class _Tokenizer:
+    """Токенизатор векторизатора: токены по token_pattern, затем нормализация словоформ."""
+
+    def __init__(self, normalizer: str):
+        self.normalizer = normalizer
+        self._normalize = get_normalizer(normalizer)
+
+    def __call__(self, text: str) -> list[str]:
+        normalize = self._normalize
+        return [normalize(token) for token in _TOKEN_RE.findall(text)]
 
-from knowledge_base.corpus import get_all_principle_entries
-from knowledge_base.quran_data import get_all_quran_entries
-from knowledge_base.hadith_data import get_all_hadith_entries
+    def __getstate__(self):
+        return {"normalizer": self.normalizer}
+
+    def __setstate__(self, state):
+        self.__init__(state["normalizer"])
+
+
+def _make_vectorizer(normalizer: str) -> TfidfVectorizer:
+    """Необученный векторизатор с параметрами индекса."""
+    params = {k: v for k, v in VECTORIZER_PARAMS.items() if k != "token_pattern"}
+    return TfidfVectorizer(tokenizer=_Tokenizer(normalizer), token_pattern=None, **params)
 
 
 class KnowledgeSearch:
     """Семантический поиск по базе знаний."""
 
-    def __init__(self):
-        self.entries = []
+    def __init__(self, index_dir: str | None = config.SEARCH_INDEX_DIR,
+                 entries: list[dict] | None = None,
+                 data_dir: str | None = config.KNOWLEDGE_DATA_DIR,
+                 engine: str = config.SEARCH_ENGINE,
+                 cache_size: int = config.SEARCH_CACHE_SIZE,
+                 cache_ttl: float = config.SEARCH_CACHE_TTL,
+                 normalizer: str = config.TEXT_NORMALIZER):
+        """
+        Args:
+            index_dir: каталог сохранённого индекса (None — только в памяти)
+            entries: собственный набор записей вместо встроенного корпуса
+                     (индекс строится в памяти и не сохраняется)
+            data_dir: каталог JSONL/Parquet-файлов корпуса (см. knowledge_base.loader)
+            engine: "tfidf" — полный перебор, "inverted" — инвертированный
+                    индекс с отсечением MaxScore (тот же top-k)
+            cache_size: размер кэша результатов (0 — без кэша)
+            cache_ttl: время жизни результата в кэше, секунды (0 — без TTL)
+            normalizer: нормализация словоформ при индексации и поиске
+                        (см. utils.stemmer: "snowball" или "none")
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Неизвестный движок поиска: {engine!r} (допустимо: {', '.join(ENGINES)})")
+        get_normalizer(normalizer)
+        self.normalizer = normalizer
+        self.entries = EntryStore()
         self.vectorizer = None
         self.tfidf_matrix = None
+        self.inverted_index = None
+        self.engine = engine
+        self.index_dir = index_dir or None
+        self.data_dir = data_dir or None
+        self.loaded_from_disk = False
+        self.cache = None
+        # Изменения корпуса после последнего обучения векторизатора (для пересчёта IDF)
+        self.pending_changes = 0
+        self._generation = 0
+        self._lock = threading.RLock()
+        # Источник корпуса (None — встроенный корпус или файлы data_dir);
+        # инкрементальные изменения меняют только self.entries
+        self._custom_entries = entries
         self._build_index()
+        if cache_size > 0:
+            self.cache = QueryCache(cache_size, cache_ttl)
 
     def _build_index(self):
-        """Построить TF-IDF индекс по всем источникам."""
-        self.entries = (
-            get_all_principle_entries()
-            + get_all_quran_entries()
-            + get_all_hadith_entries()
-        )
+        """Построить индекс из источника корпуса и производные структуры, сбросить кэш запросов."""
+        with self._lock:
+            self._load_or_fit_index()
+            self._index_rebuilt()
 
-        # Собираем тексты для индексации: content + tags
-        documents = []
-        for entry in self.entries:
-            text_parts = [entry.get("content", "")]
-            text_parts.extend(entry.get("tags", []))
-            documents.append(" ".join(text_parts))
-
-        self.vectorizer = TfidfVectorizer(
-            lowercase=True,
-            token_pattern=r"(?u)\b\w[\w-]*\b",
-            max_df=0.95,
-            min_df=1,
-            ngram_range=(1, 2),
+    def _index_rebuilt(self):
+        """Пересоздать производные структуры после (пере)обучения векторизатора."""
+        self.inverted_index = (
+            InvertedIndex(self.tfidf_matrix) if self.engine == "inverted" else None
         )
-        self.tfidf_matrix = self.vectorizer.fit_transform(documents)
+        self._index_changed()
+
+    def _load_or_fit_index(self):
+        """Загрузить сохранённый индекс или построить его заново."""
+        if self._custom_entries is not None:
+            self._fit_index(self._custom_entries)
+            return
+
+        index_params = dict(VECTORIZER_PARAMS, normalizer=normalizer_version(self.normalizer))
+        fingerprint = corpus_fingerprint(index_params, self.data_dir)
+
+        if self.index_dir:
+            loaded = load_index(self.index_dir, fingerprint, _make_vectorizer(self.normalizer))
+            if loaded is not None:
+                self.vectorizer, self.tfidf_matrix, self.entries = loaded
+                self.loaded_from_disk = True
+                return
+
+        self._fit_index(iter_entries(self.data_dir))
+        self.loaded_from_disk = False
+
+        if self.index_dir:
+            try:
+                save_index(self.index_dir, fingerprint, self.vectorizer,
+                           self.tfidf_matrix, self.entries)
+            except OSError:
+                # Каталог недоступен для записи — работаем с индексом в памяти
+                pass
+
+    def _fit_index(self, entries):
+        """
+        Построить TF-IDF индекс по записям.
+
+        entries может быть генератором: записи складываются в колоночное
+        хранилище по ходу единственного прохода векторизатора по документам.
+        """
+        collected = EntryStore()
+
+        def documents():
+            for entry in entries:
+                collected.append(entry)
+                yield _document_text(entry)
+
+        vectorizer = _make_vectorizer(self.normalizer)
+        matrix = vectorizer.fit_transform(documents())
+        self.entries, self.vectorizer, self.tfidf_matrix = collected, vectorizer, matrix
+        self.pending_changes = 0
+
+    def _index_changed(self):
+        """Инвалидировать кэш после любого изменения индекса."""
+        self._generation += 1
+        if self.cache is not None:
+            self.cache.clear()
+
+    def _snapshot(self) -> tuple:
+        """Согласованный набор структур индекса для одного запроса."""
+        with self._lock:
+            return self.entries, self.vectorizer, self.tfidf_matrix, self.inverted_index
+
+    # ─── Инкрементальные обновления ─────────────────────────────────
+
+    def add_entries(self, entries: list[dict]) -> int:
+        """
+        Добавить записи без переобучения векторизатора.
+
+        Новые строки векторизуются текущим словарём и IDF: термины, которых
+        нет в словаре, начнут учитываться после пересчёта (refresh()).
+
+        Returns:
+            число добавленных записей
+        """
+        entries = list(entries)
+        if not entries:
+            return 0
+
+        with self._lock:
+            known = set(self.entries.ids())
+            for entry in entries:
+                if "id" not in entry:
+                    raise ValueError("Запись без поля 'id'")
+                if entry["id"] in known:
+                    raise ValueError(f"Запись с id {entry['id']!r} уже существует")
+                known.add(entry["id"])
+
+            rows = self.vectorizer.transform([_document_text(e) for e in entries])
+            self.tfidf_matrix = vstack([self.tfidf_matrix, rows], format="csr")
+            # Снимки у читателей видят только первые len(старых) записей
+            self.entries.extend(entries)
+            if self.inverted_index is not None:
+                # Новый индекс целиком: читатели со снимком досчитывают по старому
+                self.inverted_index = self.inverted_index.with_documents(rows)
+
+            self.pending_changes += len(entries)
+            self._after_update()
+        return len(entries)
+
+    def remove_entries(self, ids) -> int:
+        """
+        Удалить записи по id (неизвестные id игнорируются).
 
-    def search(self, query: str, top_k: int = 8) -> list[dict]:
+        Returns:
+            число удалённых записей
+        """
+        ids = set(ids)
+        with self._lock:
+            keep = np.fromiter(
+                (entry_id not in ids for entry_id in self.entries.ids()),
+                dtype=bool, count=len(self.entries),
+            )
+            removed = int(keep.size - keep.sum())
+            if not removed:
+                return 0
+
+            self.tfidf_matrix = self.tfidf_matrix[keep]
+            self.entries = self.entries.select(keep)
+            if self.inverted_index is not None:
+                self.inverted_index = self.inverted_index.without_documents(keep)
+
+            self.pending_changes += removed
+            self._after_update()
+        return removed
+
+    def refresh(self) -> bool:
+        """
+        Переобучить векторизатор на текущих записях (пересчёт словаря и IDF).
+
+        Источник корпуса не меняется: индекс на диске описывает корпус
+        без инкрементальных изменений и не перезаписывается.
+
+        Returns:
+            True, если были накопленные изменения и индекс перестроен
+        """
+        with self._lock:
+            if not self.pending_changes:
+                return False
+            self._fit_index(self.entries)
+            self.loaded_from_disk = False
+            self._index_rebuilt()
+            return True
+
+    def reload(self):
+        """
+        Перестроить индекс из источника корпуса (сохранённый индекс, файлы
+        или встроенный корпус; записи из конструктора), отбросив
+        инкрементальные изменения.
+        """
+        self._build_index()
+
+    def _after_update(self):
+        """Сбросить кэш; переобучить, если изменений накопилось слишком много."""
+        ratio = self.pending_changes / max(len(self.entries), 1)
+        if config.SEARCH_REFIT_RATIO > 0 and ratio >= config.SEARCH_REFIT_RATIO:
+            self.refresh()
+        else:
+            self._index_changed()
+
+    # ─── Поиск ──────────────────────────────────────────────────────
+
+    def search(self, query: str, top_k: int = 8, terms: list[str] | None = None) -> list[dict]:
         """
         Найти top_k наиболее релевантных записей для запроса.
 
         Возвращает список словарей:
           {id, source_type, title, content, reference, score, ...}
+
+        Повторные запросы (с точностью до регистра и пробелов) отдаются
+        из кэша без векторизации и ранжирования.
+
+        terms — уже выделенные термины запроса (см. analyze_terms,
+        QueryTerms): текст запроса тогда не токенизируется повторно и служит
+        только ключом кэша. Термины, нормализованные не тем нормализатором,
+        которым построен индекс, отбрасываются — запрос разбирается заново.
         """
-        query_vec = self.vectorizer.transform([query.lower()])
-        similarities = cosine_similarity(query_vec, self.tfidf_matrix).flatten()
+        if terms is not None and getattr(terms, "normalizer", config.TEXT_NORMALIZER) != self.normalizer:
+            terms = None
+        with span("search"):
+            if self.cache is None:
+                return self._search_uncached(query, top_k, terms)
 
-        # Индексы top_k по убыванию
-        top_indices = similarities.argsort()[-top_k:][::-1]
+            key = (self._generation,) + QueryCache.make_key(query, top_k)
+            results = self.cache.get(key)
+            if results is None:
+                results = self._search_uncached(query, top_k, terms)
+                self.cache.put(key, results)
+            # Копии, чтобы изменения у вызывающего не портили кэш
+            return [dict(r) for r in results]
 
-        results = []
-        for idx in top_indices:
-            score = float(similarities[idx])
-            if score > 0.0:
-                entry = dict(self.entries[idx])
-                entry["relevance_score"] = round(score, 4)
-                results.append(entry)
+    def _search_uncached(self, query: str, top_k: int, terms: list[str] | None = None) -> list[dict]:
+        """Векторизация и ранжирование запроса."""
+        entries, vectorizer, matrix, inverted_index = self._snapshot()
+        with span("search.vectorize"):
+            if terms is None:
+                query_vec = vectorizer.transform([query.lower()])
+            else:
+                query_vec = _vectorize_terms(vectorizer, terms)
+
+        if inverted_index is not None:
+            # Отбор top-k встроен в обход posting lists
+            with span("search.score"):
+                top_indices, scores = inverted_index.top_k(query_vec, top_k)
+        else:
+            with span("search.score"):
+                # Векторы TF-IDF L2-нормированы: скалярное произведение = косинус,
+                # повторная нормировка (cosine_similarity) не нужна
+                similarities = matrix @ query_vec.toarray().ravel()
+
+            with span("search.select"):
+                # Частичный отбор top_k вместо полной сортировки
+                top_indices = _top_k_indices(similarities, top_k)
+                scores = similarities[top_indices]
 
+        with span("search.materialize"):
+            return _collect_results(entries, top_indices, scores)
+
+    def search_many(self, queries: list[str], top_k: int = 8,
+                    batch_size: int = 256) -> list[list[dict]]:
+        """
+        Пакетный поиск: результаты для каждого запроса в том же формате, что search().
+
+        Все запросы пакета векторизуются разом и оцениваются одним
+        разреженным матричным произведением (независимо от движка).
+        batch_size ограничивает размер плотной матрицы оценок
+        (batch_size × число записей).
+        """
+        entries, vectorizer, matrix, _ = self._snapshot()
+        results = []
+        for start in range(0, len(queries), batch_size):
+            batch = [q.lower() for q in queries[start:start + batch_size]]
+            query_matrix = vectorizer.transform(batch)
+            # Векторы TF-IDF L2-нормированы: скалярное произведение = косинус
+            scores = (query_matrix @ matrix.T).toarray()
+            for row in scores:
+                top_indices = _top_k_indices(row, top_k)
+                results.append(_collect_results(entries, top_indices, row[top_indices]))
         return results
 
     def get_stats(self) -> dict:
         """Статистика базы знаний."""
-        counts = {}
-        for e in self.entries:
-            t = e.get("source_type", "unknown")
-            counts[t] = counts.get(t, 0) + 1
+        memory = self.entries.memory_bytes()
         return {
             "total_entries": len(self.entries),
-            "by_type": counts,
+            "by_type": self.entries.counts_by_type(),
+            "entry_store_bytes": memory,
+            "bytes_per_entry": round(memory / len(self.entries), 1) if len(self.entries) else 0.0,
+            "loaded_from_disk": self.loaded_from_disk,
+            "engine": self.engine,
+            "normalizer": self.normalizer,
+            "vocabulary_size": len(self.vectorizer.vocabulary_),
+            "pending_changes": self.pending_changes,
+            "cache": self.cache.stats() if self.cache is not None else None,
         }
 
 
+def tokenize(text: str) -> list[str]:
+    """Токены текста по правилам векторизатора (текст в нижнем регистре)."""
+    return _TOKEN_RE.findall(text)
+
+
+class QueryTerms(list):
+    """Термины запроса с именем нормализатора, которым получены их токены."""
+
+    def __init__(self, terms=(), normalizer: str = config.TEXT_NORMALIZER):
+        super().__init__(terms)
+        self.normalizer = normalizer
+
+
+def analyze_terms(tokens: list[str]) -> list[str]:
+    """Термины векторизатора (униграммы и биграммы) по нормализованным токенам."""
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+def _vectorize_terms(vectorizer: TfidfVectorizer, terms: list[str]):
+    """TF-IDF вектор по готовым терминам — то же, что vectorizer.transform."""
+    vocabulary = vectorizer.vocabulary_
+    counts = Counter(vocabulary[t] for t in terms if t in vocabulary)
+    columns = np.array(sorted(counts), dtype=np.int64)
+    values = np.array([counts[c] for c in columns], dtype=np.float64)
+    if columns.size:
+        values *= vectorizer.idf_[columns]
+    row = csr_matrix((values, columns, [0, columns.size]), shape=(1, len(vocabulary)))
+    return normalize(row, norm="l2", copy=False)
+
+
+def _document_text(entry: dict) -> str:
+    """Текст для индексации: content + tags."""
+    text_parts = [entry.get("content", "")]
+    text_parts.extend(entry.get("tags", []))
+    return " ".join(text_parts)
+
+
+def _collect_results(entries, indices, scores) -> list[dict]:
+    """Собрать записи по индексам и их оценкам, отбросив нулевые оценки."""
+    results = []
+    for idx, score in zip(indices, scores):
+        score = float(score)
+        if score > 0.0:
+            entry = entries[idx]
+            entry["relevance_score"] = round(score, 4)
+            results.append(entry)
+    return results
+
+
+def _top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Индексы top_k наибольших оценок по убыванию (при равенстве — по индексу)."""
+    n = scores.shape[0]
+    if top_k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+    if top_k < n:
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        candidates = np.arange(n)
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order]
+
+
 # Singleton
 _search_instance = None
 
@@ -3,18 +3,32 @@
 
 Endpoints:
   GET  /           — Главная страница (чат)
-  POST /api/chat   — Отправка вопроса в AI
+  POST /api/chat   — Отправка вопроса в AI (JSON или поток SSE при "stream": true
+                     либо Accept: text/event-stream)
+  GET  /api/status — Статус сервера, ключа и соединений с моделью
+
+Асинхронный (ASGI) вариант API чата — asgi_server.py.
 """
 
+import atexit
 import os
 import json
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from flask import Flask, Response, request, jsonify, render_template, send_from_directory
+
+import config
+from chat.coalesce import SingleFlight, prompt_fingerprint
+from chat.history import HistoryCompactor
+from chat.offline_answers import OfflineAnswers
+from chat.rate_limit import RateLimitDropped, RateLimiter
+from chat.response_cache import ResponseCache
+from chat.sessions import SessionStore
+from chat.upstream import UpstreamClient, UpstreamError
 
 app = Flask(__name__, static_folder="static", template_folder="templates")
 
 # ── Groq API ────────────────────────────────────────────────────
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
-GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
+GROQ_URL = config.GROQ_URL
 GROQ_MODEL = "llama-3.3-70b-versatile"
 
 SYSTEM_PROMPT = """Ты — учёный-факих (специалист по исламскому праву / фикху). Твоя задача — отвечать на вопросы пользователей по исламскому праву (фикху).
@@ -44,8 +58,9 @@ SYSTEM_PROMPT = """Ты — учёный-факих (специалист по 
 
 8. В конце ответа давай ссылки на авторитетные источники: islamqa.info, islamweb.net"""
 
-# Хранение истории для контекста (в памяти, по session)
-conversations = {}
+NO_KEY_MESSAGE = "🔑 API-ключ не настроен. Создайте файл .env с GROQ_API_KEY=ваш_ключ"
+EMPTY_MESSAGE = "Пустое сообщение"
+HISTORY_REQUIRED_MESSAGE = "История чата не найдена на сервере — повторите запрос с history"
 
 
 def load_key():
@@ -68,41 +83,234 @@ def load_key():
                     return
 
 
-def call_groq(messages):
-    """Вызов Groq API (без внешних зависимостей, через urllib)."""
-    import urllib.request
-    import urllib.error
-    
-    payload = json.dumps({
+_groq_client = None
+
+
+def get_groq_client():
+    """Клиент Groq с пулом keep-alive соединений и ограничителем частоты по квотам (singleton)."""
+    global _groq_client
+    if _groq_client is None:
+        _groq_client = UpstreamClient(GROQ_URL, limiter=RateLimiter())
+    return _groq_client
+
+
+_single_flight = None
+
+
+def get_single_flight():
+    """Объединение одинаковых одновременных вызовов модели (singleton; None, если CHAT_COALESCE=false)."""
+    global _single_flight
+    if _single_flight is None and config.CHAT_COALESCE:
+        _single_flight = SingleFlight()
+    return _single_flight
+
+
+_offline_answers = None
+
+
+def get_offline_answers():
+    """Индекс встроенной базы фикха (singleton; None, если OFFLINE_ANSWERS=false)."""
+    global _offline_answers
+    if _offline_answers is None and config.OFFLINE_ANSWERS:
+        _offline_answers = OfflineAnswers()
+    return _offline_answers
+
+
+def offline_answer(user_message):
+    """Уверенный ответ из базы фикха или None (вопрос уходит в модель)."""
+    offline = get_offline_answers()
+    return offline.answer(user_message) if offline is not None else None
+
+
+_response_cache = None
+
+
+def get_response_cache():
+    """Кэш ответов модели (singleton; None, если CHAT_CACHE_SIZE=0)."""
+    global _response_cache
+    if _response_cache is None and config.CHAT_CACHE_SIZE > 0:
+        _response_cache = ResponseCache()
+    return _response_cache
+
+
+def cached_answer(user_message, history):
+    """(ключ кэша, ответ из кэша или None); ключ None — кэш отключён."""
+    cache = get_response_cache()
+    if cache is None:
+        return None, None
+    key = cache.make_key(SYSTEM_PROMPT, GROQ_MODEL, user_message, history)
+    hit = cache.get(key)
+    return key, hit[0] if hit else None
+
+
+def remember_answer(key, answer):
+    """Сохранить успешный ответ модели в кэше."""
+    if key is not None and answer:
+        get_response_cache().put(key, answer)
+
+
+_session_store = None
+
+
+def get_session_store():
+    """Серверные истории чатов (singleton; None, если CHAT_SESSION_MAX=0)."""
+    global _session_store
+    if _session_store is None and config.CHAT_SESSION_MAX > 0:
+        _session_store = SessionStore()
+        atexit.register(_session_store.close)
+    return _session_store
+
+
+def load_history(data):
+    """
+    Сессия и история чата для запроса: (session_id, history).
+
+    session_id — выданный сервером идентификатор: присланный клиентом,
+    если сервер его знает, иначе новый (незнакомые идентификаторы
+    не принимаются); None — хранилище сессий отключено. Присланная
+    клиентом history заменяет серверную; без неё история берётся
+    из хранилища. history = None — у сервера не столько сообщений,
+    сколько ожидает клиент (session_messages), и ему нужно повторить
+    запрос с history.
+    """
+    history = data.get("history")
+    store = get_session_store()
+    if store is None:
+        return None, history if isinstance(history, list) else []
+    session_id = data.get("session_id")
+    known = isinstance(session_id, str) and store.exists(session_id)
+    expected = data.get("session_messages")
+    if isinstance(history, list):
+        if known:
+            store.replace(session_id, history)
+        else:
+            session_id = store.create(history)
+        return session_id, store.history(session_id)
+    if not known:
+        # Клиент ждёт историю, которой у сервера нет, — пусть пришлёт её
+        if expected:
+            return None, None
+        return store.create(), []
+    stored = store.history(session_id)
+    if expected is not None and expected != len(stored):
+        return session_id, None
+    return session_id, stored
+
+
+def remember_turn(session_id, user_message, answer):
+    """Дописать вопрос и ответ в историю сессии; поля для ответа клиенту."""
+    store = get_session_store()
+    if store is None or session_id is None:
+        return {}
+    count = store.append(session_id, [{"role": "user", "text": user_message}, {"role": "assistant", "text": answer}])
+    return {"session_id": session_id, "session_messages": count}
+
+
+_history_compactor = None
+
+
+def get_history_compactor():
+    """Сборщик промпта в пределах бюджета токенов (singleton)."""
+    global _history_compactor
+    if _history_compactor is None:
+        _history_compactor = HistoryCompactor()
+    return _history_compactor
+
+
+def build_messages(user_message, history, session_id=None):
+    """
+    Сообщения для модели (системный промпт, история, текущий вопрос)
+    в пределах CHAT_PROMPT_BUDGET и сведения о промпте (prompt_tokens и др.).
+    """
+    return get_history_compactor().build(SYSTEM_PROMPT, user_message, history, session_id)
+
+
+def wants_stream(data, accept):
+    """Клиент просит потоковый ответ (SSE) и он не отключён в настройках."""
+    return config.CHAT_STREAMING and bool(data.get("stream") or "text/event-stream" in accept)
+
+
+def groq_payload(messages, stream=False):
+    payload = {
         "model": GROQ_MODEL,
         "messages": messages,
         "temperature": 0.7,
         "max_tokens": 2048,
-    })
-    
-    req = urllib.request.Request(
-        GROQ_URL,
-        data=payload.encode("utf-8"),
-        headers={
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {GROQ_API_KEY}",
-        },
-        method="POST"
-    )
-    
-    try:
-        with urllib.request.urlopen(req, timeout=30) as resp:
-            data = json.loads(resp.read().decode("utf-8"))
-            return data["choices"][0]["message"]["content"]
-    except urllib.error.HTTPError as e:
-        body = e.read().decode("utf-8", errors="ignore")
-        if e.code == 429:
+    }
+    if stream:
+        payload["stream"] = True
+    return payload
+
+
+def groq_error_message(e):
+    """Текст ошибки вызова Groq для пользователя."""
+    if isinstance(e, RateLimitDropped):
+        return f"⏳ Много вопросов одновременно — AI не успевает ответить всем. Повторите через {max(round(e.retry_after), 1)} с."
+    if isinstance(e, UpstreamError):
+        if e.status == 429:
             return "⏳ Слишком много запросов. Подождите минуту и попробуйте снова."
-        if e.code in (401, 403):
-            return f"🔑 Неверный API-ключ Groq. Проверьте файл .env\n\nОшибка: {body[:200]}"
-        return f"❌ Ошибка API ({e.code}): {body[:200]}"
+        if e.status in (401, 403):
+            return f"🔑 Неверный API-ключ Groq. Проверьте файл .env\n\nОшибка: {e.body[:200]}"
+        return f"❌ Ошибка API ({e.status}): {e.body[:200]}"
+    return f"❌ Ошибка: {str(e)}"
+
+
+def complete_groq(messages):
+    """
+    Ответ Groq API (без внешних зависимостей, через пул соединений http.client);
+    ошибки — исключением. Одинаковые одновременные запросы делят один вызов.
+    """
+    payload = groq_payload(messages)
+
+    def call():
+        data = get_groq_client().post_json(payload, headers={"Authorization": f"Bearer {GROQ_API_KEY}"})
+        get_history_compactor().observe_usage(data.get("usage"))
+        return data
+
+    flight = get_single_flight()
+    data = flight.do(prompt_fingerprint(payload), call) if flight is not None else call()
+    return data["choices"][0]["message"]["content"]
+
+
+def open_groq_stream(messages):
+    """
+    Потоковый вызов Groq (stream: true); ошибки до начала ответа — исключением.
+    Одинаковые одновременные запросы читают один общий поток.
+    """
+    payload = groq_payload(messages, stream=True)
+
+    def open_stream():
+        return get_groq_client().stream_json(payload, headers={"Authorization": f"Bearer {GROQ_API_KEY}"})
+
+    flight = get_single_flight()
+    return flight.stream(prompt_fingerprint(payload), open_stream) if flight is not None else open_stream()
+
+
+def sse_event(data, event=None):
+    """Событие Server-Sent Events."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def relay_stream(stream, on_done=None, meta=None):
+    """
+    Пересылка потока модели в браузер: события {"delta"} по мере генерации,
+    затем done с полным ответом (или error, если поток оборвался).
+    on_done(ответ) вызывается, если поток завершился успешно, и может
+    вернуть дополнительные поля события done (как и meta, например prompt_tokens).
+    """
+    parts = []
+    try:
+        for delta in stream.deltas():
+            parts.append(delta)
+            yield sse_event({"delta": delta})
+        message = "".join(parts)
+        extra = on_done(message) if on_done is not None else None
+        yield sse_event({"status": "ok", "message": message, **(meta or {}), **(extra or {})}, event="done")
     except Exception as e:
-        return f"❌ Ошибка: {str(e)}"
+        yield sse_event({"status": "error", "message": groq_error_message(e), "partial": "".join(parts)}, event="error")
+    finally:
+        stream.close()
 
 
 @app.route("/")
@@ -114,37 +322,63 @@ def index():
 @app.route("/api/chat", methods=["POST"])
 def chat():
     """Обработка сообщения чата."""
-    if not GROQ_API_KEY:
-        return jsonify({
-            "status": "error",
-            "message": "🔑 API-ключ не настроен. Создайте файл .env с GROQ_API_KEY=ваш_ключ"
-        }), 400
-    
     data = request.get_json()
     if not data or not data.get("message"):
-        return jsonify({"status": "error", "message": "Пустое сообщение"}), 400
+        return jsonify({"status": "error", "message": EMPTY_MESSAGE}), 400
     
     user_message = data["message"].strip()
-    session_id = data.get("session_id", "default")
-    history = data.get("history", [])
+    # История — из хранилища сессий (клиент присылает её, только если сервер её не знает)
+    session_id, history = load_history(data)
+    if history is None:
+        return jsonify({"status": "error", "message": HISTORY_REQUIRED_MESSAGE, "history_required": True}), 409
     
-    # Собираем сообщения для отправки
-    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    # Частый вопрос — ответ из базы фикха без обращения к модели (работает и без ключа)
+    offline = offline_answer(user_message)
+    if offline is not None:
+        return jsonify({"status": "ok", "message": offline, "source": "offline",
+                        **remember_turn(session_id, user_message, offline)})
     
-    # Добавляем историю (последние 20 сообщений)
-    for msg in history[-20:]:
-        role = "user" if msg.get("role") == "user" else "assistant"
-        messages.append({"role": role, "content": msg.get("text", "")})
+    if not GROQ_API_KEY:
+        return jsonify({"status": "error", "message": NO_KEY_MESSAGE}), 400
+    
+    # Повторный вопрос — ответ из кэша без обращения к модели
+    cache_key, cached = cached_answer(user_message, history)
+    if cached is not None:
+        return jsonify({"status": "ok", "message": cached, "source": "cache",
+                        **remember_turn(session_id, user_message, cached)})
     
-    # Текущее сообщение
-    messages.append({"role": "user", "content": user_message})
+    messages, prompt = build_messages(user_message, history, session_id)
     
+    # Потоковый ответ (SSE), если клиент его принимает
+    if wants_stream(data, request.headers.get("Accept", "")):
+        try:
+            stream = open_groq_stream(messages)
+        except Exception as e:
+            # Поток не начался — ответ обычным JSON, как без стриминга
+            return jsonify({"status": "ok", "message": groq_error_message(e)})
+        def on_done(text):
+            remember_answer(cache_key, text)
+            return remember_turn(session_id, user_message, text)
+
+        return Response(relay_stream(stream, on_done=on_done, meta={"prompt_tokens": prompt["prompt_tokens"]}),
+                        mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
     # Вызов AI
-    response_text = call_groq(messages)
+    session = {}
+    try:
+        response_text = complete_groq(messages)
+    except Exception as e:
+        response_text = groq_error_message(e)
+    else:
+        remember_answer(cache_key, response_text)
+        session = remember_turn(session_id, user_message, response_text)
     
     return jsonify({
         "status": "ok",
-        "message": response_text
+        "message": response_text,
+        "prompt_tokens": prompt["prompt_tokens"],
+        **session,
     })
 
 
@@ -155,7 +389,14 @@ def status():
     return jsonify({
         "status": "ok",
         "has_key": has_key,
-        "model": GROQ_MODEL
+        "model": GROQ_MODEL,
+        "upstream": get_groq_client().stats(),
+        "rate_limit": get_groq_client().limiter.stats(),
+        "cache": get_response_cache().stats() if get_response_cache() is not None else None,
+        "offline": get_offline_answers().stats() if get_offline_answers() is not None else None,
+        "prompt": get_history_compactor().stats(),
+        "sessions": get_session_store().stats() if get_session_store() is not None else None,
+        "coalesce": get_single_flight().stats() if get_single_flight() is not None else None,
     })
 
 
@@ -169,6 +410,8 @@ if __name__ == "__main__":
     print("  ☪️  Фикх-Помощник")
     print(f"  🌐  http://{host}:{port}")
     print(f"  🤖  Модель: {GROQ_MODEL}")
+    if get_offline_answers() is not None:
+        print(f"  📚  База фикха: {len(get_offline_answers().entries)} ответов без AI")
     if GROQ_API_KEY:
         print(f"  🔑  API-ключ: {GROQ_API_KEY[:8]}...")
     else:
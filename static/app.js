@@ -5,6 +5,11 @@ let currentChatId = null;
 let providers = [];
 let selectedProvider = null;
 
+// Сколько последних сообщений чата уходит на сервер; в бюджет токенов
+// промпта их укладывает сервер (config.CHAT_PROMPT_BUDGET): последние —
+// целиком, ранние — кратким содержанием
+const HISTORY_LIMIT = 40;
+
 document.addEventListener("DOMContentLoaded", () => {
     loadChats();
     setupInput();
@@ -128,7 +133,9 @@ function saveChats() {
     localStorage.setItem("fiqh_chats_v2", JSON.stringify(allChats));
     localStorage.setItem("fiqh_current_v2", currentChatId || "");
 }
-function genId() { return Date.now().toString(36) + Math.random().toString(36).slice(2, 6); }
+function genId() {
+    return crypto.randomUUID ? crypto.randomUUID() : Date.now().toString(36) + Math.random().toString(36).slice(2, 6);
+}
 
 // ── Chat Management ─────────────────────────────────────────
 function startNewChat() {
@@ -226,13 +233,24 @@ async function sendMessage() {
     addMessage("user", text);
     showTyping();
 
-    const reply = await callBackend(text);
+    // При потоковом ответе текст появляется по мере генерации
+    let live = null;
+    const reply = await callBackend(text, partial => {
+        if (!live) { hideTyping(); live = appendMsgUI("bot", "", true); }
+        live.querySelector(".message-bubble").innerHTML = md2html(partial);
+        scrollToBottom();
+    });
     hideTyping();
 
-    addMessage("bot", reply);
+    if (live) {
+        live.querySelector(".message-bubble").innerHTML = md2html(reply);
+        addMessage("bot", reply, false);
+    } else {
+        addMessage("bot", reply);
+    }
 }
 
-function addMessage(role, content) {
+function addMessage(role, content, render = true) {
     if (!allChats[currentChatId]) return;
     allChats[currentChatId].messages.push({ role, text: content });
 
@@ -241,7 +259,7 @@ function addMessage(role, content) {
         renderHistoryList();
     }
 
-    appendMsgUI(role, role === "user" ? `<div class="user-text">${esc(content)}</div>` : md2html(content), true);
+    if (render) appendMsgUI(role, role === "user" ? `<div class="user-text">${esc(content)}</div>` : md2html(content), true);
     saveChats();
 }
 
@@ -253,6 +271,7 @@ function appendMsgUI(role, html, anim) {
     div.innerHTML = `<div class="message-bubble">${html}</div>`;
     el.appendChild(div);
     scrollToBottom();
+    return div;
 }
 
 function showTyping() { document.getElementById("typing-indicator").style.display = "block"; scrollToBottom(); }
@@ -263,23 +282,78 @@ function scrollToBottom() {
 }
 
 // ── Backend Call ───────────────────────────────────────────────
-async function callBackend(userMessage) {
+// История чата хранится и на сервере: после ответа сервер сообщает выданный им
+// идентификатор сессии (session_id) и сколько сообщений у него есть
+// (session_messages), и дальше уходит только новый вопрос. Если сервер историю
+// потерял (409) или хранилища нет (session_messages не пришло) — история
+// отправляется целиком.
+async function callBackend(userMessage, onDelta) {
     try {
         const chat = allChats[currentChatId];
-        const history = (chat?.messages || []).slice(-10).map(m => ({ role: m.role, text: m.text }));
-
-        const r = await fetch("/api/chat", {
-            method: "POST",
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({ message: userMessage, history })
-        });
-        const d = await r.json();
+        // Последнее сообщение чата — сам вопрос, он уходит отдельно
+        const history = (chat?.messages || []).slice(0, -1).slice(-HISTORY_LIMIT)
+            .map(m => ({ role: m.role, text: m.text }));
+        const body = { message: userMessage, stream: true };
+        if (chat?.sessionId) body.session_id = chat.sessionId;
+        if (chat?.serverMessages !== undefined) body.session_messages = chat.serverMessages;
+        else if (history.length) body.history = history;
+
+        let r = await postChat(body);
+        if (r.status === 409) {
+            delete body.session_messages;
+            r = await postChat({ ...body, history });
+        }
+        // Сервер без поддержки потока (или ошибка до его начала) отвечает обычным JSON
+        const d = (r.headers.get("Content-Type") || "").startsWith("text/event-stream")
+            ? await readEventStream(r, onDelta)
+            : await r.json();
+        if (d.status === "ok" && chat) {
+            if (d.session_messages !== undefined) {
+                chat.sessionId = d.session_id;
+                chat.serverMessages = d.session_messages;
+            } else {
+                delete chat.sessionId;
+                delete chat.serverMessages;
+            }
+        }
         return d.message || "Ошибка получения ответа";
     } catch (e) {
         return "❌ Ошибка соединения";
     }
 }
 
+function postChat(body) {
+    return fetch("/api/chat", {
+        method: "POST",
+        headers: { "Content-Type": "application/json", "Accept": "text/event-stream, application/json" },
+        body: JSON.stringify(body)
+    });
+}
+
+// Чтение ответа SSE: события {delta}, затем done (полный ответ) или error;
+// возвращает данные последнего события
+async function readEventStream(r, onDelta) {
+    const reader = r.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "", text = "";
+    for (;;) {
+        const { value, done } = await reader.read();
+        if (done) return { status: "error", message: text || "Ошибка получения ответа" };
+        buffer += decoder.decode(value, { stream: true });
+        let sep;
+        while ((sep = buffer.indexOf("\n\n")) >= 0) {
+            const block = buffer.slice(0, sep);
+            buffer = buffer.slice(sep + 2);
+            const event = (block.match(/^event: (.*)$/m) || [])[1] || "message";
+            const data = JSON.parse(block.split("\n").filter(l => l.startsWith("data: ")).map(l => l.slice(6)).join("\n"));
+            if (event === "done") return data;
+            if (event === "error") return { ...data, message: (data.partial ? data.partial + "\n\n" : "") + data.message };
+            text += data.delta;
+            onDelta(text);
+        }
+    }
+}
+
 // ── Markdown → HTML ────────────────────────────────────────────
 function md2html(text) {
     if (!text) return "";
@@ -0,0 +1,75 @@
+"""Сжатие истории чата в пределах бюджета (chat.history)."""
+
+import chat.history as history_module
+from chat.history import SUMMARY_HEADER, HistoryCompactor, count_tokens, summary_line
+
+SYSTEM = "Ты помощник по вопросам поста."
+
+
+def _history(count: int, start: int = 0) -> list[dict]:
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant",
+         "text": f"Сообщение номер {i}: можно ли пить воду во время поста и почему."}
+        for i in range(start, start + count)
+    ]
+
+
+def test_count_tokens_counts_words_numbers_and_punctuation():
+    assert count_tokens("") == 0
+    assert count_tokens("abcd") == 1
+    assert count_tokens("абвг") == 2
+    assert count_tokens("1234") == 2
+    assert count_tokens("да, нет.") == 4
+
+
+def test_short_history_is_kept_whole():
+    compactor = HistoryCompactor(budget=3000, max_messages=20, summary_tokens=400)
+    history = _history(4)
+    messages, info = compactor.build(SYSTEM, "Вопрос?", history, "s1")
+    assert info["kept"] == 4 and info["summarized"] == 0
+    assert [m["content"] for m in messages[1:-1]] == [m["text"] for m in history]
+    assert info["prompt_tokens"] == info["full_prompt_tokens"]
+
+
+def test_long_history_fits_budget_with_summary():
+    compactor = HistoryCompactor(budget=300, max_messages=20, summary_tokens=100)
+    messages, info = compactor.build(SYSTEM, "Вопрос?", _history(30), "s1")
+    assert info["prompt_tokens"] <= 300
+    assert info["summarized"] == 30 - info["kept"]
+    assert messages[1]["role"] == "system" and messages[1]["content"].startswith(SUMMARY_HEADER)
+    assert messages[-1] == {"role": "user", "content": "Вопрос?"}
+    assert compactor.stats()["trimmed_requests"] == 1
+
+
+def test_summary_is_extended_not_rebuilt_for_appended_history(monkeypatch):
+    compactor = HistoryCompactor(budget=300, max_messages=20, summary_tokens=100)
+    history = _history(30)
+    compactor.build(SYSTEM, "Вопрос?", history, "s1")
+
+    summarized = []
+    monkeypatch.setattr(history_module, "summary_line",
+                        lambda msg: summarized.append(msg) or summary_line(msg))
+    compactor.build(SYSTEM, "Вопрос?", history + _history(2, start=30), "s1")
+
+    stats = compactor.stats()
+    assert stats["summaries_rebuilt"] == 1 and stats["summaries_reused"] == 1
+    # Дописаны только выпавшие за ход сообщения
+    assert len(summarized) == 2
+
+
+def test_summary_is_rebuilt_when_history_is_replaced():
+    compactor = HistoryCompactor(budget=300, max_messages=20, summary_tokens=100)
+    compactor.build(SYSTEM, "Вопрос?", _history(30), "s1")
+    replaced = [dict(msg, text=msg["text"].replace("воду", "чай")) for msg in _history(32)]
+    messages, _ = compactor.build(SYSTEM, "Вопрос?", replaced, "s1")
+    assert compactor.stats()["summaries_rebuilt"] == 2
+    assert "воду" not in messages[1]["content"]
+
+
+def test_summary_cache_is_per_session():
+    compactor = HistoryCompactor(budget=300, max_messages=20, summary_tokens=100)
+    compactor.build(SYSTEM, "Вопрос?", _history(30), "s1")
+    compactor.build(SYSTEM, "Вопрос?", _history(30), "s2")
+    compactor.build(SYSTEM, "Вопрос?", _history(30), None)
+    assert compactor.stats()["summaries_rebuilt"] == 2
+    assert compactor.stats()["summaries_reused"] == 0
@@ -0,0 +1,60 @@
+"""Инвертированный индекс против полного перебора (knowledge_base.inverted_index)."""
+
+import numpy as np
+import pytest
+from scipy.sparse import csr_matrix, vstack
+from scipy.sparse import random as sparse_random
+from sklearn.preprocessing import normalize
+
+from knowledge_base.inverted_index import InvertedIndex
+
+
+def _matrix(rows: int, seed: int):
+    return normalize(sparse_random(rows, 60, density=0.08, format="csr", random_state=seed))
+
+
+def _brute_force(matrix, query, top_k):
+    scores = (matrix @ query.T).toarray().ravel()
+    order = np.lexsort((np.arange(scores.size), -scores))
+    order = order[scores[order] > 0][:top_k]
+    return order, scores[order]
+
+
+def _assert_same(index, matrix, seed, top_k=5):
+    queries = _matrix(20, seed)
+    for i in range(queries.shape[0]):
+        query = queries[i]
+        docs, scores = index.top_k(query, top_k)
+        expected_docs, expected_scores = _brute_force(matrix, query, top_k)
+        np.testing.assert_allclose(scores, expected_scores)
+        np.testing.assert_array_equal(docs, expected_docs)
+
+
+@pytest.mark.parametrize("top_k", [1, 5, 50])
+def test_matches_brute_force(top_k):
+    matrix = _matrix(300, 1)
+    _assert_same(InvertedIndex(matrix), matrix, seed=2, top_k=top_k)
+
+
+def test_with_documents_returns_new_index():
+    matrix, extra = _matrix(200, 3), _matrix(50, 4)
+    index = InvertedIndex(matrix)
+    grown = index.with_documents(extra)
+    assert index.n_docs == 200 and grown.n_docs == 250
+    _assert_same(index, matrix, seed=5)
+    _assert_same(grown, vstack([matrix, extra], format="csr"), seed=5)
+
+
+def test_without_documents_returns_new_index():
+    matrix = _matrix(200, 6)
+    keep = np.random.default_rng(7).random(200) > 0.3
+    index = InvertedIndex(matrix)
+    shrunk = index.without_documents(keep)
+    assert index.n_docs == 200 and shrunk.n_docs == int(keep.sum())
+    _assert_same(index, matrix, seed=8)
+    _assert_same(shrunk, matrix[keep], seed=8)
+
+
+def test_empty_query():
+    docs, scores = InvertedIndex(_matrix(10, 9)).top_k(csr_matrix((1, 60)), 5)
+    assert docs.size == 0 and scores.size == 0
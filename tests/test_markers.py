@@ -0,0 +1,43 @@
+"""Участники ситуации по таблице словоформ (agents.markers)."""
+
+import pytest
+
+from agents.analyst import AnalystAgent
+from agents.markers import STAKEHOLDER_FORMS, STAKEHOLDER_MARKERS, find_markers
+
+
+def _stakeholders(situation: str) -> list[str]:
+    result = AnalystAgent().process({"situation": situation})["result"]
+    return [s["name"] for s in result["stakeholders"]]
+
+
+@pytest.mark.parametrize("situation, wrong", [
+    ("Я хочу брать деньги у компании", "Брат"),
+    ("Мой друг собирается жениться", "Жена"),
+    ("Другой вариант — промолчать", "Друг"),
+    ("Семь раз отмерь", "Семья"),
+])
+def test_no_false_stakeholders(situation, wrong):
+    assert wrong not in _stakeholders(situation)
+
+
+@pytest.mark.parametrize("situation, expected", [
+    ("Я не сказал матери правду", "Мать"),
+    ("Я скрыл от отца долг", "Отец"),
+    ("Коллеге предложили взятку", "Коллега"),
+    ("Не хочу расстраивать родителям праздник", "Родители"),
+    ("Партнер обманул", "Партнёр"),
+    ("Мой брат попросил денег", "Брат"),
+])
+def test_inflected_stakeholders(situation, expected):
+    assert expected in _stakeholders(situation)
+
+
+def test_forms_table_covers_markers():
+    assert list(STAKEHOLDER_FORMS) == STAKEHOLDER_MARKERS
+    for marker, forms in STAKEHOLDER_FORMS.items():
+        assert marker in forms
+
+
+def test_whole_words_only():
+    assert not find_markers("братство и сестринство").has("stakeholder")
@@ -0,0 +1,43 @@
+"""Синхронный и асинхронный запуск конвейера (coordinator.pipeline)."""
+
+import asyncio
+
+import pytest
+
+from coordinator.pipeline import Pipeline
+from utils.profiling import current_profile
+
+SITUATION = "Коллега попросил меня скрыть от начальника ошибку, но я не уверен, стоит ли молчать."
+
+
+def _stable(report: dict) -> dict:
+    """Отчёт без времени и журнала."""
+    return {key: value for key, value in report.items() if key not in ("meta", "logs")}
+
+
+def test_run_and_arun_agree():
+    pipeline = Pipeline()
+    sync_report = pipeline.run(SITUATION)
+    async_report = asyncio.run(pipeline.arun(SITUATION))
+    assert _stable(sync_report) == _stable(async_report)
+    for report in (sync_report, async_report):
+        assert report["status"] == "success"
+        assert report["meta"]["agents_used"] == [pipeline.analyst.name, pipeline.values.name,
+                                                 pipeline.reflection.name]
+        assert report["meta"]["stages"]
+
+
+@pytest.mark.parametrize("mode", ["run", "arun"])
+def test_step_error_propagates(mode, monkeypatch):
+    pipeline = Pipeline()
+
+    def fail(input_data):
+        raise RuntimeError("сбой агента")
+
+    monkeypatch.setattr(pipeline.values, "process", fail)
+    with pytest.raises(RuntimeError, match="сбой агента"):
+        if mode == "run":
+            pipeline.run(SITUATION)
+        else:
+            asyncio.run(pipeline.arun(SITUATION))
+    assert current_profile() is None
@@ -0,0 +1,51 @@
+"""LRU-кэш с TTL (knowledge_base.query_cache)."""
+
+from knowledge_base.query_cache import QueryCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_make_key_normalizes_case_and_spaces():
+    assert QueryCache.make_key("  Можно   ли ПИТЬ воду ", 5) == QueryCache.make_key("можно ли пить воду", 5)
+    assert QueryCache.make_key("вода", 5) != QueryCache.make_key("вода", 10)
+
+
+def test_lru_eviction_keeps_recently_used():
+    evicted = []
+    cache = QueryCache(maxsize=2, on_evict=evicted.append)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert evicted == ["b"]
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["hits"] == 3 and stats["misses"] == 1
+
+
+def test_ttl_expires_entries():
+    clock = Clock()
+    evicted = []
+    cache = QueryCache(maxsize=10, ttl=60, clock=clock, on_evict=evicted.append)
+    cache.put("a", 1)
+    clock.now = 60
+    assert cache.get("a") == 1
+    clock.now = 61
+    assert cache.get("a") is None
+    assert evicted == ["a"]
+    assert cache.stats()["expirations"] == 1 and cache.stats()["size"] == 0
+
+
+def test_clear_drops_everything():
+    cache = QueryCache(maxsize=10)
+    cache.put("a", 1)
+    cache.clear()
+    assert cache.get("a") is None
+    assert cache.stats()["invalidations"] == 1
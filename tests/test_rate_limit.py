@@ -0,0 +1,117 @@
+"""Ограничитель квот RPM/TPM (chat.rate_limit) и учёт стоимости потоков."""
+
+import asyncio
+
+import pytest
+
+from benchmarks.stub_llm import AsyncStubLLM, StubLLM
+from chat.async_upstream import AsyncUpstreamClient
+from chat.rate_limit import AsyncRateLimiter, RateLimitDropped, RateLimiter, _Limits
+from chat.upstream import UpstreamClient
+
+PAYLOAD = {"model": "stub", "messages": [{"role": "user", "content": "Что нарушает пост?"}], "stream": True}
+ANSWER = "пост нарушают еда питьё и намеренная рвота"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _tokens(limiter) -> float:
+    return limiter._tokens.level
+
+
+def test_limits_is_abstract():
+    with pytest.raises(TypeError):
+        _Limits(60, 0, 1, 10, 1, Clock())
+
+
+def test_burst_then_drop():
+    clock = Clock()
+    limiter = RateLimiter(rpm=60, tpm=0, burst=2 / 60, queue_size=0, max_wait=1, clock=clock)
+    limiter.acquire(0)
+    limiter.acquire(0)
+    with pytest.raises(RateLimitDropped):
+        limiter.acquire(0)
+    clock.now += 1.0
+    limiter.acquire(0)
+    assert limiter.stats()["admitted"] == 3
+
+
+def test_deadline_drop():
+    limiter = RateLimiter(rpm=1, tpm=0, burst=1, queue_size=10, max_wait=5, clock=Clock())
+    limiter.acquire(0)
+    with pytest.raises(RateLimitDropped) as error:
+        limiter.acquire(0)
+    assert error.value.retry_after > 5
+
+
+def test_settle_refunds_estimate():
+    limiter = RateLimiter(rpm=0, tpm=600, burst=1, clock=Clock())
+    limiter.acquire(500)
+    assert _tokens(limiter) == 100
+    limiter.settle(500, {"prompt_tokens": 60, "completion_tokens": 40, "total_tokens": 100})
+    assert _tokens(limiter) == 500
+
+
+def test_partial_stream_usage_keeps_completion_average():
+    limiter = RateLimiter(rpm=0, tpm=6000, burst=1, clock=Clock())
+    before = limiter.stats()["expected_completion_tokens"]
+    usage = limiter.stream_usage(PAYLOAD, "обрыв", complete=False)
+    assert "completion_tokens" not in usage
+    limiter.settle(0, usage)
+    assert limiter.stats()["expected_completion_tokens"] == before
+    assert "completion_tokens" in limiter.stream_usage(PAYLOAD, "ответ", complete=True)
+
+
+def test_429_pauses_everyone():
+    clock = Clock()
+    limiter = RateLimiter(rpm=600, tpm=0, burst=1, queue_size=0, max_wait=10, clock=clock)
+    limiter.observe(429, {"retry-after": "2"})
+    with pytest.raises(RateLimitDropped):
+        limiter.acquire(0)
+    clock.now += 2.5
+    limiter.acquire(0)
+
+
+def test_sync_stream_settles():
+    limiter = RateLimiter(rpm=0, tpm=60000, burst=1, clock=Clock())
+    capacity = _tokens(limiter)
+    with StubLLM(answer=ANSWER) as stub:
+        client = UpstreamClient(stub.url, limiter=limiter)
+        text = "".join(client.stream_json(PAYLOAD).deltas())
+        assert text == ANSWER
+        assert _tokens(limiter) == capacity - limiter.stream_usage(PAYLOAD, ANSWER, True)["total_tokens"]
+
+        # Оборванный поток уточняется по полученной части
+        level = _tokens(limiter)
+        stream = client.stream_json(PAYLOAD)
+        first = next(stream.deltas())
+        stream.close()
+        assert _tokens(limiter) == level - limiter.stream_usage(PAYLOAD, first, False)["total_tokens"]
+        client.close()
+
+
+def test_async_stream_settles():
+    limiter = AsyncRateLimiter(rpm=0, tpm=60000, burst=1, clock=Clock())
+    capacity = _tokens(limiter)
+
+    async def run(url):
+        client = AsyncUpstreamClient(url, limiter=limiter)
+        parts = [delta async for delta in client.stream_deltas(PAYLOAD)]
+        deltas = client.stream_deltas(PAYLOAD)
+        first = await deltas.__anext__()
+        await deltas.aclose()
+        await client.aclose()
+        return "".join(parts), first
+
+    with AsyncStubLLM(answer=ANSWER) as stub:
+        text, first = asyncio.run(run(stub.url))
+    assert text == ANSWER
+    spent = (limiter.stream_usage(PAYLOAD, ANSWER, True)["total_tokens"]
+             + limiter.stream_usage(PAYLOAD, first, False)["total_tokens"])
+    assert _tokens(limiter) == capacity - spent
@@ -0,0 +1,48 @@
+"""Инкрементальные обновления KnowledgeSearch и сохранённый индекс."""
+
+import pytest
+
+import config
+from knowledge_base.search import KnowledgeSearch
+
+NEW_ENTRY = {"id": "test-1", "source_type": "principle", "title": "Проверка",
+             "content": "Уникальное слово квазиэтика для проверки поиска", "tags": ["тест"]}
+
+
+@pytest.fixture
+def no_auto_refit(monkeypatch):
+    monkeypatch.setattr(config, "SEARCH_REFIT_RATIO", 0)
+
+
+@pytest.mark.parametrize("engine", ["tfidf", "inverted"])
+def test_add_refresh_remove(engine, no_auto_refit):
+    entries = [{"id": f"e{i}", "source_type": "principle", "title": f"Запись {i}",
+                "content": f"честность правдивость текст номер {i}", "tags": []} for i in range(20)]
+    search = KnowledgeSearch(index_dir=None, entries=entries, engine=engine, cache_size=0)
+    assert search.add_entries([NEW_ENTRY]) == 1
+    # Слова нет в словаре до пересчёта
+    assert not any(r["id"] == "test-1" for r in search.search("квазиэтика"))
+    assert search.refresh()
+    assert search.search("квазиэтика")[0]["id"] == "test-1"
+    assert search.remove_entries(["test-1", "нет-такого"]) == 1
+    assert not any(r["id"] == "test-1" for r in search.search("квазиэтика"))
+    with pytest.raises(ValueError):
+        search.add_entries([{"id": "e1", "content": "дубликат"}])
+
+
+def test_refresh_keeps_disk_index(tmp_path, no_auto_refit):
+    index_dir = str(tmp_path)
+    search = KnowledgeSearch(index_dir=index_dir, data_dir=None, cache_size=0)
+    corpus_size = len(search.entries)
+    assert not search.loaded_from_disk
+
+    search.add_entries([NEW_ENTRY])
+    assert search.refresh()
+    assert not search.loaded_from_disk
+    assert len(search.entries) == corpus_size + 1
+
+    # Источник корпуса прежний: перезагрузка поднимает сохранённый индекс без изменений
+    search.reload()
+    assert search.loaded_from_disk
+    assert len(search.entries) == corpus_size
+    assert KnowledgeSearch(index_dir=index_dir, data_dir=None, cache_size=0).loaded_from_disk
@@ -0,0 +1,105 @@
+"""Хранилище историй чатов (chat.sessions)."""
+
+from chat.sessions import SessionStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _store(**kwargs) -> SessionStore:
+    options = {"max_sessions": 100, "ttl": 0, "max_bytes": 1 << 30, "max_messages": 40, "db_path": None}
+    options.update(kwargs)
+    return SessionStore(**options)
+
+
+def _turn(i: int) -> list[dict]:
+    return [{"role": "user", "text": f"вопрос {i}"}, {"role": "assistant", "text": f"ответ {i}"}]
+
+
+def test_create_issues_unknown_ids():
+    store = _store()
+    first, second = store.create(), store.create(_turn(0))
+    assert first != second and len(first) >= 40
+    assert store.exists(first) and store.exists(second)
+    assert not store.exists("придуманный-клиентом")
+    assert store.history(second) == _turn(0)
+
+
+def test_append_cleans_messages_and_trims_by_quarter():
+    store = _store(max_messages=8)
+    session_id = store.create()
+    store.append(session_id, [{"role": "system", "text": 5}, "мусор"])
+    assert store.history(session_id) == [{"role": "assistant", "text": "5"}]
+    for i in range(4):
+        count = store.append(session_id, _turn(i))
+    # 9 сообщений > 8: остаётся 8 - 8 // 4 = 6 последних
+    assert count == 6
+    assert store.history(session_id)[-2:] == _turn(3)
+
+
+def test_lru_evicts_least_recently_used():
+    store = _store(max_sessions=2)
+    a, b = store.create(_turn(0)), store.create(_turn(1))
+    store.history(a)
+    c = store.create(_turn(2))
+    assert store.exists(a) and store.exists(c)
+    assert not store.exists(b)
+    assert store.stats()["evictions"] == 1
+
+
+def test_ttl_counts_from_last_access():
+    clock = Clock()
+    store = _store(ttl=60, clock=clock)
+    session_id = store.create(_turn(0))
+    clock.now += 50
+    assert store.exists(session_id)
+    clock.now += 50
+    assert store.exists(session_id)
+    clock.now += 61
+    assert not store.exists(session_id)
+    assert store.stats()["expirations"] == 1
+
+
+def test_evicted_sessions_spill_to_disk_and_restore(tmp_path):
+    db = str(tmp_path / "sessions.db")
+    store = _store(max_sessions=1, db_path=db)
+    a = store.create(_turn(0))
+    b = store.create(_turn(1))
+    assert store.stats()["on_disk"] == 1
+    assert store.history(a) == _turn(0)
+    stats = store.stats()
+    assert stats["spilled"] == 2 and stats["restored"] == 1
+
+    store.close()
+    reopened = _store(max_sessions=10, db_path=db)
+    assert reopened.history(b) == _turn(1)
+    assert reopened.history(a) == _turn(0)
+    reopened.close()
+
+
+def test_expired_sessions_are_not_restored_from_disk(tmp_path):
+    clock = Clock()
+    db = str(tmp_path / "sessions.db")
+    store = _store(ttl=60, db_path=db, clock=clock)
+    session_id = store.create(_turn(0))
+    store.close()
+    clock.now += 61
+    reopened = _store(ttl=60, db_path=db, clock=clock)
+    assert not reopened.exists(session_id)
+    assert reopened.stats()["on_disk"] == 0
+    reopened.close()
+
+
+def test_delete_removes_from_memory_and_disk(tmp_path):
+    store = _store(max_sessions=1, db_path=str(tmp_path / "sessions.db"))
+    a = store.create(_turn(0))
+    store.create(_turn(1))
+    store.delete(a)
+    assert not store.exists(a)
+    assert store.stats()["on_disk"] == 0
+    store.close()
@@ -0,0 +1,30 @@
+"""Стеммер Snowball и словарь исключений (utils.stemmer)."""
+
+import pytest
+
+from utils.stemmer import RussianStemmer, get_normalizer, normalizer_version
+
+
+@pytest.mark.parametrize("form", ["обман", "обмана", "обманул", "обманывать"])
+def test_exceptions_share_stem(form):
+    assert RussianStemmer().stem(form) == "обман"
+
+
+@pytest.mark.parametrize("word, stem", [
+    ("скрыня", "скрын"),
+    ("скрытность", "скрытност"),
+    ("скрыть", "скрыт"),
+    ("обманщик", "обманщик"),
+    ("коллеге", "коллег"),
+    ("ёлка", "елк"),
+])
+def test_other_words_follow_snowball(word, stem):
+    assert RussianStemmer().stem(word) == stem
+
+
+def test_normalizers():
+    assert get_normalizer("none")("Обмана") == "Обмана"
+    assert get_normalizer("snowball")("обманула") == "обман"
+    assert normalizer_version("snowball") == RussianStemmer.version
+    with pytest.raises(ValueError):
+        get_normalizer("pymorphy")
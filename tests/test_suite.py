@@ -0,0 +1,17 @@
+"""Запуск набора бенчмарков (benchmarks.suite) без базовых результатов."""
+
+from benchmarks import suite
+
+
+def test_compare_without_baseline_fails_clearly(tmp_path, capsys):
+    missing = tmp_path / "baseline.json"
+    code = suite.main(["--compare", "--baseline", str(missing), "--filter", "нет-такого"])
+    assert code == 2
+    assert "--save-baseline" in capsys.readouterr().err
+
+
+def test_compare_against_saved_baseline(tmp_path):
+    baseline = str(tmp_path / "baseline.json")
+    options = ["--baseline", baseline, "--filter", "analyst:short", "--iterations", "5", "--situations", "3"]
+    assert suite.main(options + ["--save-baseline"]) == 0
+    assert suite.main(options + ["--compare", "--max-regression", "100"]) == 0
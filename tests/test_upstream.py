@@ -0,0 +1,112 @@
+"""Политика повторов клиентов модели (chat.upstream, chat.async_upstream)."""
+
+import asyncio
+import socket
+import socketserver
+import threading
+import time
+
+import pytest
+
+from benchmarks.stub_llm import StubLLM
+from chat.async_upstream import AsyncUpstreamClient
+from chat.upstream import ConnectTimeout, UpstreamClient
+
+PAYLOAD = {"model": "stub", "messages": [{"role": "user", "content": "вопрос"}]}
+
+
+class _Dropping(socketserver.ThreadingTCPServer):
+    """Сервер, который читает запрос и обрывает соединение (или молчит hang секунд)."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, hang: float = 0.0):
+        self.requests = 0
+        self.hang = hang
+        super().__init__(("127.0.0.1", 0), _DropHandler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1/chat"
+
+
+class _DropHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        data = b""
+        while b"\r\n\r\n" not in data:
+            chunk = self.request.recv(65536)
+            if not chunk:
+                return
+            data += chunk
+        self.server.requests += 1
+        time.sleep(self.server.hang)
+        self.request.close()
+
+
+@pytest.fixture
+def dropping():
+    server = _Dropping()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_connect_timeout_is_retried():
+    with StubLLM() as stub:
+        client = UpstreamClient(stub.url, max_retries=2, backoff_max=0.01)
+        connect = client.pool._connect
+        failures = [ConnectTimeout("t"), ConnectTimeout("t")]
+
+        def flaky():
+            if failures:
+                raise failures.pop()
+            return connect()
+
+        client.pool._connect = flaky
+        assert client.post_json(PAYLOAD)["choices"]
+        assert client.stats()["retries"] == 2
+        client.close()
+
+
+def test_refused_connection_is_retried():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    client = UpstreamClient(f"http://127.0.0.1:{port}/", max_retries=2, backoff_max=0.01)
+    with pytest.raises(ConnectionRefusedError):
+        client.post_json(PAYLOAD)
+    assert client.stats()["retries"] == 2
+
+
+def test_drop_after_send_is_not_retried(dropping):
+    client = UpstreamClient(dropping.url, max_retries=3, backoff_max=0.01)
+    with pytest.raises(OSError):
+        client.post_json(PAYLOAD)
+    assert dropping.requests == 1
+
+
+def test_timeout_after_send_is_not_retried():
+    server = _Dropping(hang=1.0)
+    try:
+        client = UpstreamClient(server.url, max_retries=3, backoff_max=0.01, read_timeout=0.2)
+        with pytest.raises(TimeoutError):
+            client.post_json(PAYLOAD)
+        assert server.requests == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_async_drop_after_send_is_not_retried(dropping):
+    async def run():
+        client = AsyncUpstreamClient(dropping.url, max_retries=3, backoff_max=0.01)
+        try:
+            await client.post_json(PAYLOAD)
+        finally:
+            await client.aclose()
+
+    with pytest.raises((OSError, asyncio.IncompleteReadError)):
+        asyncio.run(run())
+    assert dropping.requests == 1
@@ -1,29 +1,95 @@
 """
 Утилита логирования — прозрачная запись каждого шага работы агентов.
+
+Журнал привязан к контексту запроса (contextvars): у каждого потока
+и каждой asyncio-задачи свой журнал, поэтому параллельные запуски
+конвейера не перемешивают и не стирают логи друг друга.
+
+Запись шага дешёвая: в кольцевой буфер фиксированной ёмкости кладутся
+монотонная метка времени и ссылки на данные. Сериализация, усечение
+и ISO-время вычисляются только при чтении журнала (get_logs()), поэтому
+записанные данные не должны изменяться после записи. При переполнении
+буфера вытесняются самые ранние шаги. Под нагрузкой журнал шагов можно
+отключить уровнем (LOG_LEVEL=WARNING) или вести лишь для доли запросов
+(LOG_SAMPLE_RATE).
 """
 
+import contextvars
 import json
+import random
 import time
+from collections import deque
 from datetime import datetime, timezone
 
+import config
+
+# Уровни как в модуле logging; шаги агентов пишутся уровнем INFO
+_LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+STEP_LEVEL = _LEVELS["INFO"]
+
+# Журнал текущего запроса (создаётся при первой записи в контексте)
+_request_logs: contextvars.ContextVar = contextvars.ContextVar("request_logs", default=None)
+
+
+class _Journal:
+    """Кольцевой буфер шагов одного запроса."""
+
+    __slots__ = ("entries", "enabled", "dropped", "wall_ns", "mono_ns")
+
+    def __init__(self, capacity: int, enabled: bool):
+        self.entries = deque(maxlen=capacity)
+        self.enabled = enabled
+        # Шаги, вытесненные из буфера при переполнении
+        self.dropped = 0
+        # Опорная пара для перевода монотонного времени в календарное
+        self.wall_ns = time.time_ns()
+        self.mono_ns = time.monotonic_ns()
+
 
 class TransparentLogger:
     """Записывает каждый шаг агента с timestamp, agent_name, input, output."""
 
-    def __init__(self):
-        self.logs: list[dict] = []
+    def __init__(self, capacity: int = config.LOG_BUFFER_SIZE,
+                 level: str = config.LOG_LEVEL,
+                 sample_rate: float = config.LOG_SAMPLE_RATE):
+        """
+        Args:
+            capacity: максимум шагов в журнале одного запроса
+            level: уровень логирования; выше INFO — шаги не записываются
+            sample_rate: доля запросов (0..1), для которых ведётся журнал шагов
+        """
+        self.capacity = max(int(capacity), 1)
+        self.level = _LEVELS.get(str(level).upper(), STEP_LEVEL)
+        self.sample_rate = sample_rate
+
+    def _journal(self) -> _Journal:
+        """Журнал текущего контекста запроса."""
+        journal = _request_logs.get()
+        if journal is None:
+            journal = self._new_journal()
+            _request_logs.set(journal)
+        return journal
+
+    def _new_journal(self) -> _Journal:
+        enabled = self.level <= STEP_LEVEL and (
+            self.sample_rate >= 1.0 or random.random() < self.sample_rate
+        )
+        return _Journal(self.capacity, enabled)
+
+    @property
+    def enabled(self) -> bool:
+        """Ведётся ли журнал шагов в текущем запросе."""
+        return self._journal().enabled
 
     def log(self, agent_name: str, action: str, input_data: any = None, output_data: any = None):
-        """Записать шаг."""
-        entry = {
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "agent": agent_name,
-            "action": action,
-            "input_summary": self._summarize(input_data),
-            "output_summary": self._summarize(output_data),
-        }
-        self.logs.append(entry)
-        return entry
+        """Записать шаг (данные сохраняются по ссылке и сериализуются при чтении)."""
+        journal = self._journal()
+        if not journal.enabled:
+            return
+        entries = journal.entries
+        if len(entries) == entries.maxlen:
+            journal.dropped += 1
+        entries.append((time.monotonic_ns(), agent_name, action, input_data, output_data))
 
     def _summarize(self, data) -> str:
         """Краткое описание данных для лога."""
@@ -38,12 +104,36 @@ class TransparentLogger:
         return str(data)[:200]
 
     def get_logs(self) -> list[dict]:
-        """Получить все логи."""
-        return self.logs
+        """Получить все логи текущего запроса (сериализуются при каждом вызове)."""
+        journal = self._journal()
+        logs = []
+        if journal.dropped:
+            logs.append({
+                "timestamp": _isoformat(journal, journal.entries[0][0]),
+                "agent": "Журнал",
+                "action": "Ранние шаги вытеснены из буфера",
+                "input_summary": "",
+                "output_summary": f"Пропущено шагов: {journal.dropped}",
+            })
+        for mono_ns, agent_name, action, input_data, output_data in journal.entries:
+            logs.append({
+                "timestamp": _isoformat(journal, mono_ns),
+                "agent": agent_name,
+                "action": action,
+                "input_summary": self._summarize(input_data),
+                "output_summary": self._summarize(output_data),
+            })
+        return logs
 
     def clear(self):
-        """Очистить логи."""
-        self.logs = []
+        """Начать новый журнал в текущем контексте (журналы других запросов не затрагиваются)."""
+        _request_logs.set(self._new_journal())
+
+
+def _isoformat(journal: _Journal, mono_ns: int) -> str:
+    """Календарное время (UTC, ISO 8601) для монотонной метки журнала."""
+    wall_ns = journal.wall_ns + (mono_ns - journal.mono_ns)
+    return datetime.fromtimestamp(wall_ns / 1e9, timezone.utc).isoformat()
 
 
 # Singleton
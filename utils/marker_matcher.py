@@ -0,0 +1,188 @@
+"""
+Многошаблонный поиск маркеров за один проход (автомат Ахо–Корасик).
+
+Все маркеры всех категорий компилируются в один детерминированный
+автомат; текст просматривается один раз, время не зависит от размера
+словаря маркеров. Режимы сопоставления маркера:
+  - "substring" — подстрока текста
+  - "word"      — целые слова (аналог \\b...\\b в регулярных выражениях)
+  - "lemma"     — целые слова с точностью до словоформы: сравниваются
+                  нормальные формы (см. utils.stemmer), «коллеге» → «коллега»
+"""
+
+import re
+from collections import deque
+
+MODES = ("substring", "word", "lemma")
+
+_WORD_RE = re.compile(r"\w+")
+
+
+class MarkerHit:
+    """Одно вхождение маркера в текст."""
+
+    __slots__ = ("marker", "category", "start", "end")
+
+    def __init__(self, marker: str, category: str, start: int, end: int):
+        self.marker = marker
+        self.category = category
+        self.start = start
+        self.end = end
+
+    def to_dict(self) -> dict:
+        return {"marker": self.marker, "category": self.category,
+                "start": self.start, "end": self.end}
+
+    def __repr__(self):
+        return f"MarkerHit({self.marker!r}, {self.category!r}, {self.start}, {self.end})"
+
+
+class MarkerHits:
+    """Результат поиска: все вхождения с индексом по категориям."""
+
+    def __init__(self, hits: list[MarkerHit]):
+        self.hits = hits
+        self._by_category: dict[str, dict[str, None]] = {}
+        for hit in hits:
+            self._by_category.setdefault(hit.category, {})[hit.marker] = None
+
+    def has(self, category: str) -> bool:
+        """Есть ли хотя бы одно вхождение категории."""
+        return category in self._by_category
+
+    def markers(self, category: str) -> list[str]:
+        """Различные маркеры категории в порядке первого вхождения."""
+        return list(self._by_category.get(category, ()))
+
+    def categories(self) -> list[str]:
+        return list(self._by_category)
+
+    def __len__(self) -> int:
+        return len(self.hits)
+
+    def __iter__(self):
+        return iter(self.hits)
+
+
+class MarkerMatcher:
+    """Автомат Ахо–Корасик по маркерам с категориями."""
+
+    def __init__(self, patterns, normalizer=None):
+        """
+        Args:
+            patterns: итерируемое (marker, category, mode); маркеры задаются
+                      в нижнем регистре, текст — тоже
+            normalizer: функция слово → нормальная форма для режима "lemma"
+                        (None — режим "lemma" работает как "word")
+        """
+        # outputs[marker] — список (category, whole_word) для строки маркера в автомате
+        self._outputs: dict[str, list[tuple[str, bool]]] = {}
+        # Маркеры режима "lemma": кортеж нормальных форм слов → [(marker, category)]
+        self._lemmas: dict[tuple, list[tuple[str, str]]] = {}
+        self._normalize = normalizer
+        for marker, category, mode in patterns:
+            if mode not in MODES:
+                raise ValueError(f"Неизвестный режим маркера: {mode!r}")
+            if mode == "lemma" and normalizer is not None:
+                key = tuple(normalizer(word) for word in _WORD_RE.findall(marker))
+                _add_unique(self._lemmas.setdefault(key, []), (marker, category))
+            else:
+                _add_unique(self._outputs.setdefault(marker, []), (category, mode != "substring"))
+        self._max_lemma_words = max(map(len, self._lemmas), default=0)
+        self._build()
+
+    def _build(self):
+        goto: list[dict[str, int]] = [{}]
+        terminal: list[list[str]] = [[]]
+        for marker in self._outputs:
+            state = 0
+            for ch in marker:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    terminal.append([])
+                state = nxt
+            terminal[state].append(marker)
+
+        # Суффиксные ссылки (BFS) и слияние выходов
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        order = []
+        while queue:
+            state = queue.popleft()
+            order.append(state)
+            for ch, nxt in goto[state].items():
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                terminal[nxt] = terminal[nxt] + terminal[fail[nxt]]
+                queue.append(nxt)
+
+        # Полная таблица переходов (ДКА): один dict.get на символ текста
+        delta = [dict(goto[0])] + [None] * (len(goto) - 1)
+        for state in order:
+            transitions = dict(delta[fail[state]])
+            transitions.update(goto[state])
+            delta[state] = transitions
+
+        self._delta = delta
+        self._terminal = [tuple(t) for t in terminal]
+
+    def find(self, text: str) -> MarkerHits:
+        """Найти все вхождения маркеров в тексте (текст в нижнем регистре)."""
+        hits = self._find_substrings(text)
+        if self._lemmas:
+            hits.extend(self._find_lemmas(text))
+            hits.sort(key=lambda hit: (hit.end, hit.start))
+        return MarkerHits(hits)
+
+    def _find_substrings(self, text: str) -> list[MarkerHit]:
+        """Проход автомата по символам текста."""
+        delta, terminal, outputs = self._delta, self._terminal, self._outputs
+        hits = []
+        state = 0
+        for i, ch in enumerate(text):
+            state = delta[state].get(ch, 0)
+            if not terminal[state]:
+                continue
+            end = i + 1
+            for marker in terminal[state]:
+                start = end - len(marker)
+                for category, whole_word in outputs[marker]:
+                    if whole_word and not _is_word_bounded(text, start, end):
+                        continue
+                    hits.append(MarkerHit(marker, category, start, end))
+        return hits
+
+    def _find_lemmas(self, text: str) -> list[MarkerHit]:
+        """Проход по словам текста со сравнением нормальных форм."""
+        normalize, lemmas, max_words = self._normalize, self._lemmas, self._max_lemma_words
+        words = [(m.start(), m.end(), normalize(m.group())) for m in _WORD_RE.finditer(text)]
+        hits = []
+        for i, (start, _, _) in enumerate(words):
+            for n in range(1, min(max_words, len(words) - i) + 1):
+                key = tuple(word[2] for word in words[i:i + n])
+                for marker, category in lemmas.get(key, ()):
+                    hits.append(MarkerHit(marker, category, start, words[i + n - 1][1]))
+        return hits
+
+
+def _add_unique(items: list, item):
+    if item not in items:
+        items.append(item)
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def _is_word_bounded(text: str, start: int, end: int) -> bool:
+    """Совпадение окружено границами слова (как \\b в re)."""
+    if start > 0 and _is_word_char(text[start - 1]):
+        return False
+    if end < len(text) and _is_word_char(text[end]):
+        return False
+    return True
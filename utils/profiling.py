@@ -0,0 +1,205 @@
+"""
+Профилирование этапов конвейера.
+
+Профиль привязан к контексту запроса (contextvars), как и журнал логов:
+span() замеряет длительность участка (perf_counter_ns) и, если включено
+отслеживание tracemalloc, прирост выделенной памяти. Вне профиля span()
+ничего не делает, поэтому замеры можно оставлять в коде горячего пути.
+
+Этапы завершённых запросов агрегируются в StageMetrics, которые отдаются
+в текстовом формате Prometheus / OpenMetrics (start_metrics_server()).
+
+Запуск эндпоинта метрик вместе с пакетным анализом:
+    python -m coordinator.batch situations.jsonl --metrics-port 9108
+    curl http://127.0.0.1:9108/metrics
+"""
+
+import contextvars
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import config
+
+# Профиль текущего запроса (None — замеры не ведутся)
+_current_profile: contextvars.ContextVar = contextvars.ContextVar("profile", default=None)
+
+# Границы корзин гистограммы длительностей, секунды
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Profile:
+    """Замеры участков одного запроса."""
+
+    def __init__(self, trace_alloc: bool = False):
+        self.trace_alloc = trace_alloc
+        # (name, parent, duration_ns, alloc_bytes) в порядке завершения
+        self.spans: list[tuple] = []
+        self._stack: list[str] = []
+        # Этапы в порядке первого запуска
+        self._order: dict[str, None] = {}
+
+    def stages(self) -> list[dict]:
+        """Агрегат по этапам (в порядке первого запуска) для meta.stages отчёта."""
+        stages = {}
+        for name in self._order:
+            stages[name] = {"name": name, "parent": None, "calls": 0, "duration_ms": 0.0}
+            if self.trace_alloc:
+                stages[name]["alloc_bytes"] = 0
+        for name, parent, duration_ns, alloc_bytes in self.spans:
+            stage = stages[name]
+            stage["parent"] = parent
+            stage["calls"] += 1
+            stage["duration_ms"] += duration_ns / 1e6
+            if self.trace_alloc:
+                stage["alloc_bytes"] += alloc_bytes
+        for stage in stages.values():
+            stage["duration_ms"] = round(stage["duration_ms"], 3)
+        return list(stages.values())
+
+
+@contextmanager
+def profile(trace_alloc: bool = config.PROFILE_TRACE_ALLOC):
+    """Начать профиль запроса в текущем контексте."""
+    if trace_alloc and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    current = Profile(trace_alloc)
+    token = _current_profile.set(current)
+    try:
+        yield current
+    finally:
+        _current_profile.reset(token)
+
+
+def current_profile() -> Profile | None:
+    """Профиль текущего запроса (None вне profile())."""
+    return _current_profile.get()
+
+
+@contextmanager
+def span(name: str):
+    """Замерить участок кода как этап name текущего профиля."""
+    current = _current_profile.get()
+    if current is None:
+        yield
+        return
+
+    parent = current._stack[-1] if current._stack else None
+    current._stack.append(name)
+    current._order.setdefault(name, None)
+    alloc_start = tracemalloc.get_traced_memory()[0] if current.trace_alloc else 0
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        duration_ns = time.perf_counter_ns() - start
+        alloc = tracemalloc.get_traced_memory()[0] - alloc_start if current.trace_alloc else 0
+        current._stack.pop()
+        current.spans.append((name, parent, duration_ns, alloc))
+
+
+class StageMetrics:
+    """Накопленные длительности этапов по всем запросам процесса."""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._stages: dict[str, dict] = {}
+        self._runs = 0
+        self._lock = threading.Lock()
+
+    def observe(self, stages: list[dict]):
+        """Учесть этапы завершённого запроса (Profile.stages() / meta.stages отчёта)."""
+        with self._lock:
+            self._runs += 1
+            for stage in stages:
+                totals = self._stages.get(stage["name"])
+                if totals is None:
+                    totals = self._stages[stage["name"]] = {
+                        "counts": [0] * len(self.buckets), "count": 0, "sum": 0.0, "alloc": 0,
+                    }
+                seconds = stage["duration_ms"] / 1000
+                for i, bound in enumerate(self.buckets):
+                    if seconds <= bound:
+                        totals["counts"][i] += 1
+                totals["count"] += 1
+                totals["sum"] += seconds
+                totals["alloc"] += stage.get("alloc_bytes", 0)
+
+    def render(self, openmetrics: bool = False) -> str:
+        """Метрики в текстовом формате Prometheus (или OpenMetrics)."""
+        with self._lock:
+            stages = {name: dict(s, counts=list(s["counts"])) for name, s in self._stages.items()}
+            runs = self._runs
+
+        # Семейство счётчика: в OpenMetrics без суффикса _total, в Prometheus — с ним
+        runs_family = "ethics_pipeline_runs" if openmetrics else "ethics_pipeline_runs_total"
+        alloc_family = "ethics_stage_alloc_bytes" if openmetrics else "ethics_stage_alloc_bytes_total"
+        lines = [
+            f"# HELP {runs_family} Профилированные запуски конвейера.",
+            f"# TYPE {runs_family} counter",
+            f"ethics_pipeline_runs_total {runs}",
+            "# HELP ethics_stage_duration_seconds Длительность этапов конвейера.",
+            "# TYPE ethics_stage_duration_seconds histogram",
+        ]
+        for name, stage in stages.items():
+            label = f'stage="{_escape(name)}"'
+            for bound, count in zip(self.buckets, stage["counts"]):
+                lines.append(f'ethics_stage_duration_seconds_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'ethics_stage_duration_seconds_bucket{{{label},le="+Inf"}} {stage["count"]}')
+            lines.append(f"ethics_stage_duration_seconds_sum{{{label}}} {stage['sum']:.9f}")
+            lines.append(f"ethics_stage_duration_seconds_count{{{label}}} {stage['count']}")
+        lines += [
+            f"# HELP {alloc_family} Прирост памяти за этапы (tracemalloc).",
+            f"# TYPE {alloc_family} counter",
+        ]
+        for name, stage in stages.items():
+            lines.append(f'ethics_stage_alloc_bytes_total{{stage="{_escape(name)}"}} {stage["alloc"]}')
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def start_metrics_server(port: int = config.METRICS_PORT, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Запустить эндпоинт /metrics в фоновом потоке процесса."""
+    metrics = get_stage_metrics()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            openmetrics = "application/openmetrics-text" in self.headers.get("Accept", "")
+            body = metrics.render(openmetrics).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", (
+                "application/openmetrics-text; version=1.0.0; charset=utf-8" if openmetrics
+                else "text/plain; version=0.0.4; charset=utf-8"
+            ))
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+# Singleton
+_metrics_instance = None
+
+
+def get_stage_metrics() -> StageMetrics:
+    """Получить накопитель метрик этапов (singleton)."""
+    global _metrics_instance
+    if _metrics_instance is None:
+        _metrics_instance = StageMetrics()
+    return _metrics_instance
@@ -0,0 +1,209 @@
+"""
+Морфологическая нормализация русских слов без внешних зависимостей.
+
+RussianStemmer — реализация алгоритма Snowball (Porter) для русского
+языка. Словоформы, которые Snowball разводит по разным основам
+(«обман» → «обма», «обманул» → «обманул», «обманывать» → «обманыва»),
+перечислены целиком в словаре исключений STEM_EXCEPTIONS: он проверяется
+до алгоритма, остальные слова стеммируются как обычно. Нормализаторы
+подключаются по имени (config.TEXT_NORMALIZER) и запоминают результат
+для каждого токена в ограниченном LRU-кэше: словарь реального текста
+невелик, поэтому почти все токены нормализуются одним обращением к кэшу.
+"""
+
+from functools import lru_cache
+
+import config
+
+_VOWELS = frozenset("аеиоуыэюя")
+
+_PERFECTIVE_GERUND_1 = ("в", "вши", "вшись")
+_PERFECTIVE_GERUND_2 = ("ив", "ивши", "ившись", "ыв", "ывши", "ывшись")
+_ADJECTIVE = (
+    "ее", "ие", "ые", "ое", "ими", "ыми", "ей", "ий", "ый", "ой", "ем", "им", "ым",
+    "ом", "его", "ого", "ему", "ому", "их", "ых", "ую", "юю", "ая", "яя", "ою", "ею",
+)
+_PARTICIPLE_1 = ("ем", "нн", "вш", "ющ", "щ")
+_PARTICIPLE_2 = ("ивш", "ывш", "ующ")
+_REFLEXIVE = ("ся", "сь")
+_VERB_1 = (
+    "ла", "на", "ете", "йте", "ли", "й", "л", "ем", "н", "ло", "но", "ет", "ют",
+    "ны", "ть", "ешь", "нно",
+)
+_VERB_2 = (
+    "ила", "ыла", "ена", "ейте", "уйте", "ите", "или", "ыли", "ей", "уй", "ил",
+    "ыл", "им", "ым", "ен", "ило", "ыло", "ено", "ят", "ует", "уют", "ит", "ыт",
+    "ены", "ить", "ыть", "ишь", "ую", "ю",
+)
+_NOUN = (
+    "а", "ев", "ов", "ие", "ье", "е", "иями", "ями", "ами", "еи", "ии", "и", "ией",
+    "ей", "ой", "ий", "й", "иям", "ям", "ием", "ем", "ам", "ом", "о", "у", "ах",
+    "иях", "ях", "ы", "ь", "ию", "ью", "ю", "ия", "ья", "я",
+)
+_SUPERLATIVE = ("ейше", "ейш")
+_DERIVATIONAL = ("ость", "ост")
+
+# Исключения: словоформа целиком → основа. Только формы, которые Snowball
+# разводит по разным основам, хотя для поиска и маркеров это одно слово
+STEM_EXCEPTIONS = {
+    form: "обман"
+    for form in (
+        "обман", "обмана", "обману", "обманом", "обмане", "обманы", "обманов",
+        "обмануть", "обманул", "обманула", "обманули", "обманет", "обманут",
+        "обманывать", "обманываю", "обманывает", "обманывают", "обманывал", "обманывала",
+        "обманывали",
+    )
+}
+
+
+class RussianStemmer:
+    """Стеммер Snowball для русского языка."""
+
+    version = "snowball-ru/3"
+
+    def stem(self, word: str) -> str:
+        """Основа слова (слово в нижнем регистре)."""
+        word = word.replace("ё", "е")
+        exception = STEM_EXCEPTIONS.get(word)
+        if exception is not None:
+            return exception
+        rv_start, r2_start = _regions(word)
+        if rv_start >= len(word):
+            return word
+        prefix, rv = word[:rv_start], word[rv_start:]
+
+        # Шаг 1: деепричастие; иначе возвратность + прилагательное/глагол/существительное
+        stripped = _strip_conditional(rv, _PERFECTIVE_GERUND_1, _PERFECTIVE_GERUND_2)
+        if stripped is not None:
+            rv = stripped
+        else:
+            rv = _strip(rv, _REFLEXIVE) or rv
+            for step in (_strip_adjectival, _strip_verb, _strip_noun):
+                stripped = step(rv)
+                if stripped is not None:
+                    rv = stripped
+                    break
+
+        # Шаг 2
+        if rv.endswith("и"):
+            rv = rv[:-1]
+
+        # Шаг 3: словообразовательный суффикс в R2
+        r2 = rv[max(r2_start - rv_start, 0):]
+        for suffix in _DERIVATIONAL:
+            if r2.endswith(suffix):
+                rv = rv[:-len(suffix)]
+                break
+
+        # Шаг 4: нн → н, превосходная степень, мягкий знак
+        if rv.endswith("нн"):
+            rv = rv[:-1]
+        else:
+            stripped = _strip(rv, _SUPERLATIVE)
+            if stripped is not None:
+                rv = stripped[:-1] if stripped.endswith("нн") else stripped
+            elif rv.endswith("ь"):
+                rv = rv[:-1]
+
+        return prefix + rv
+
+
+def _regions(word: str) -> tuple[int, int]:
+    """Начала областей RV и R2 алгоритма Snowball."""
+    rv = r1 = r2 = len(word)
+    for i, ch in enumerate(word):
+        if ch in _VOWELS:
+            rv = i + 1
+            break
+    for i in range(1, len(word)):
+        if word[i] not in _VOWELS and word[i - 1] in _VOWELS:
+            r1 = i + 1
+            break
+    for i in range(r1 + 1, len(word)):
+        if word[i] not in _VOWELS and word[i - 1] in _VOWELS:
+            r2 = i + 1
+            break
+    return rv, r2
+
+
+def _longest(text: str, suffixes) -> str | None:
+    """Самое длинное окончание из suffixes, которым заканчивается text."""
+    lookup, max_len = _suffix_sets(suffixes)
+    for n in range(min(max_len, len(text)), 0, -1):
+        if text[-n:] in lookup:
+            return text[-n:]
+    return None
+
+
+@lru_cache(maxsize=None)
+def _suffix_sets(suffixes: tuple) -> tuple[frozenset, int]:
+    """Множество окончаний группы и длина самого длинного."""
+    return frozenset(suffixes), max(map(len, suffixes))
+
+
+def _strip(text: str, suffixes) -> str | None:
+    suffix = _longest(text, suffixes)
+    return text[:-len(suffix)] if suffix else None
+
+
+def _strip_conditional(text: str, after_a_ya, free) -> str | None:
+    """
+    Удалить самое длинное окончание; окончания первой группы удаляются,
+    только если перед ними стоит «а» или «я» (сама буква остаётся).
+    """
+    suffix = _longest(text, after_a_ya + free)
+    if suffix is None:
+        return None
+    rest = text[:-len(suffix)]
+    if suffix in after_a_ya and suffix not in free and not rest.endswith(("а", "я")):
+        return None
+    return rest
+
+
+def _strip_adjectival(text: str) -> str | None:
+    rest = _strip(text, _ADJECTIVE)
+    if rest is None:
+        return None
+    participle = _strip_conditional(rest, _PARTICIPLE_1, _PARTICIPLE_2)
+    return participle if participle is not None else rest
+
+
+def _strip_verb(text: str) -> str | None:
+    return _strip_conditional(text, _VERB_1, _VERB_2)
+
+
+def _strip_noun(text: str) -> str | None:
+    return _strip(text, _NOUN)
+
+
+def _identity(token: str) -> str:
+    return token
+
+
+# Нормализаторы по имени: "snowball" — стемминг, "none" — словоформы как есть
+NORMALIZERS = ("snowball", "none")
+
+_normalizers = {}
+
+
+def get_normalizer(name: str = config.TEXT_NORMALIZER):
+    """
+    Функция token → нормальная форма с ограниченным кэшем (singleton на имя).
+
+    Размер кэша — config.TEXT_NORMALIZER_CACHE_SIZE.
+    """
+    if name not in NORMALIZERS:
+        raise ValueError(f"Неизвестный нормализатор: {name!r} (допустимо: {', '.join(NORMALIZERS)})")
+    normalizer = _normalizers.get(name)
+    if normalizer is None:
+        if name == "snowball":
+            normalizer = lru_cache(maxsize=config.TEXT_NORMALIZER_CACHE_SIZE)(RussianStemmer().stem)
+        else:
+            normalizer = _identity
+        _normalizers[name] = normalizer
+    return normalizer
+
+
+def normalizer_version(name: str = config.TEXT_NORMALIZER) -> str:
+    """Идентификатор нормализатора для отпечатка индекса."""
+    return RussianStemmer.version if name == "snowball" else name